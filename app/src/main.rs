@@ -4,7 +4,7 @@ use bevy_egui::{egui, EguiContexts, EguiPlugin};
 use log::{info, debug};
 use bevy::log::LogPlugin;
 
-use model::{SimulationTime, Host, polio};
+use model::{SimulationTime, SimRng, Host, polio};
 
 // Resources
 #[derive(Resource)]
@@ -43,6 +43,9 @@ struct ImmunityScale;
 #[derive(Component)]
 struct SheddingScale;
 
+#[derive(Component)]
+struct HostSlot(usize); // Position along the row of hosts; keys the host's draws
+
 // Systems
 fn setup(
     mut commands: Commands,
@@ -61,10 +64,11 @@ fn setup(
 
         let x = (i as f32 + 1.0) * spacing - window.width() / 2.0; // Distribute hosts evenly across the screen
 
-        // Spawn Hosts entities with default Immunity components
+        // Spawn Hosts entities with default HostImmunity components
         commands.spawn((
             Host{birth_sim_day: 0.0},
-            polio::Immunity::default(),
+            polio::HostImmunity::default(),
+            HostSlot(i),
             SpriteBundle {
                     sprite: Sprite {
                         color: Color::GRAY,
@@ -165,38 +169,43 @@ fn simulation_controls_ui(
 
 fn step_loop(
     mut commands: Commands,
-    mut host_query: Query<(Entity, &Host, &mut polio::Immunity, Option<&mut polio::Infection>)>,
+    mut host_query: Query<(Entity, &Host, &mut polio::HostImmunity, Option<&mut polio::Infections>)>,
     mut sim_time: ResMut<SimulationTime>,
     time: Res<Time>,
     speed: Res<SimulationSpeed>,
     polio_params: Res<polio::Params>,
+    sim_rng: Res<SimRng>,
     params: Res<SimParams>,
+    slots: Query<&HostSlot>,
 ) {
     sim_time.timer.tick(time.delta().mul_f32(speed.multiplier));
 
     if sim_time.timer.just_finished() {
         info!("Stepping simulation state from day {}: {} finished this tick", sim_time.day, sim_time.timer.times_finished_this_tick());
+        // Slider values are resolved once per frame, not per host
+        let (strain, serotype) = polio::parse_infection_type("WPV2").unwrap();
+        let exposure = polio::Exposure::from_incidence(params.incidence_rate, params.log10_dose, strain, &[serotype]);
         // For large visualization speed multipliers, the timer may have finished multiple times per tick
         for _ in 0..sim_time.timer.times_finished_this_tick() {
             sim_time.day += 1;
             debug!("...Advancing to day {}", sim_time.day);
-            polio::step_state(&mut commands, &mut host_query, &polio_params, &sim_time);
-            let prob = 1.0 - (-params.incidence_rate).exp();
-            let dose = 10f32.powf(params.log10_dose);
-            polio::challenge(&mut commands, &mut host_query, &polio_params, &sim_time, prob, dose, "WPV2");
+            polio::step_state(&mut host_query, &polio_params, &sim_time);
+            polio::challenge(&mut commands, &mut host_query, &polio_params, &sim_rng, &sim_time,
+                |entity| slots.get(entity).map_or(0, |slot| slot.0), |_| exposure);
         }
     }
 }
 
 fn update_immunity_scales(
-    host_query: Query<(&polio::Immunity, &Children), With<Host>>,
+    host_query: Query<(&polio::HostImmunity, &Children), With<Host>>,
     mut scale_query: Query<(&mut Transform, &mut Sprite), With<ImmunityScale>>,
 ) {
     for (immunity, children) in host_query.iter() {
+        let current_immunity = immunity.max_current_immunity();
         for &child in children.iter() {
             if let Ok((mut transform, mut sprite)) = scale_query.get_mut(child) {
-                sprite.custom_size = Some(Vec2::new(15.0, immunity.current_immunity.log10() * 50.0));
-                transform.translation = Vec3::new(-10.0, 0.5 * immunity.current_immunity.log10() * 50.0 + 5.0, 0.1);
+                sprite.custom_size = Some(Vec2::new(15.0, current_immunity.log10() * 50.0));
+                transform.translation = Vec3::new(-10.0, 0.5 * current_immunity.log10() * 50.0 + 5.0, 0.1);
             }
         }
     }
@@ -204,7 +213,7 @@ fn update_immunity_scales(
 
 fn add_shedding_scales(
     mut commands: Commands,
-    host_query: Query<Entity, (With<Host>, Added<polio::Infection>)>,
+    host_query: Query<Entity, (With<Host>, Added<polio::Infections>)>,
 ) {
     for entity in host_query.iter() {
         commands.entity(entity).with_children(|parent| {
@@ -225,14 +234,15 @@ fn add_shedding_scales(
 }
 
 fn update_shedding_scales(
-    host_query: Query<(&polio::Infection, &Children), With<Host>>,
+    host_query: Query<(&polio::Infections, &Children), With<Host>>,
     mut scale_query: Query<(&mut Transform, &mut Sprite), With<SheddingScale>>,
 ) {
-    for (infection, children) in host_query.iter() {
+    for (infections, children) in host_query.iter() {
+        let viral_shedding: f32 = infections.viral_shedding().into_iter().flatten().sum();
         for &child in children.iter() {
             if let Ok((mut transform, mut sprite)) = scale_query.get_mut(child) {
-                sprite.custom_size = Some(Vec2::new(15.0, infection.viral_shedding.log10() * 20.0));
-                transform.translation = Vec3::new(10.0, 0.5 * infection.viral_shedding.log10() * 20.0 + 5.0, 0.1);
+                sprite.custom_size = Some(Vec2::new(15.0, viral_shedding.log10() * 20.0));
+                transform.translation = Vec3::new(10.0, 0.5 * viral_shedding.log10() * 20.0 + 5.0, 0.1);
             }
         }
     }
@@ -240,7 +250,7 @@ fn update_shedding_scales(
 
 fn remove_shedding_scales(
     mut commands: Commands,
-    mut removals: RemovedComponents<polio::Infection>,
+    mut removals: RemovedComponents<polio::Infections>,
     host_query: Query<(Entity, &Children), With<Host>>,
     mut scale_query: Query<Entity, With<SheddingScale>>,
 ) {
@@ -266,6 +276,7 @@ fn main() {
         .insert_resource(SimulationTime::default())
         .insert_resource(SimulationSpeed::default())
         .insert_resource(polio::Params::default())
+        .insert_resource(SimRng::default())
         .add_plugins(DefaultPlugins.build().disable::<LogPlugin>())
         .add_plugins(EguiPlugin)
         .add_systems(Startup, setup)
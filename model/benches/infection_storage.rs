@@ -0,0 +1,60 @@
+// Daily model loop cost with table vs sparse-set storage for the Infections component
+//
+// Run from model/ once for each storage and compare the reported times:
+//   cargo bench --bench infection_storage                              (sparse set, the default)
+//   cargo bench --bench infection_storage --features table-infections  (archetype tables)
+// Each run times the daily step_state/challenge loop at 100k hosts and incidence_rate 0.2,
+// applying the commands that add and remove Infections each day as the pybevy engine does.
+
+use std::time::{Duration, Instant};
+
+use bevy::ecs::system::SystemState;
+use bevy::prelude::*;
+
+use model::polio::{self, Exposure, ExposureSchedule};
+use model::{Host, SimRng, SimulationTime};
+
+const N_HOSTS: usize = 100_000;
+const N_DAYS: u32 = 100;
+const INCIDENCE_RATE: f32 = 0.2;
+const SEED: u64 = 1;
+
+const STORAGE: &str = if cfg!(feature = "table-infections") { "table" } else { "sparse-set" };
+
+type HostQuery<'w, 's> = Query<'w, 's, (Entity, &'static Host, &'static mut polio::HostImmunity, Option<&'static mut polio::Infections>)>;
+
+/// Fixed row of each host, keying its draws
+#[derive(Component)]
+struct Row(usize);
+
+/// Daily step_state + challenge over a World of hosts, applying commands each day as the app does
+fn model_loop() -> (Duration, usize) {
+    let mut world = World::new();
+    world.spawn_batch((0..N_HOSTS).map(|row| (Host { birth_sim_day: 0.0 }, polio::HostImmunity::default(), Row(row))));
+    let params = polio::Params::default();
+    let rng = SimRng::new(SEED);
+    let (strain, serotype) = polio::parse_infection_type("WPV2").unwrap();
+    let schedule = ExposureSchedule::constant(Exposure::from_incidence(INCIDENCE_RATE, 6.0, strain, &[serotype]));
+    let mut state: SystemState<(Commands, HostQuery, Query<&Row>)> = SystemState::new(&mut world);
+    let mut sim_time = SimulationTime::default();
+
+    let mut n_events = 0;
+    let start = Instant::now();
+    for day in 1..=N_DAYS {
+        sim_time.day = day;
+        {
+            let (mut commands, mut query, rows) = state.get_mut(&mut world);
+            n_events += polio::step_state(&mut query, &params, &sim_time).len();
+            n_events += polio::challenge(&mut commands, &mut query, &params, &rng, &sim_time,
+                |entity| rows.get(entity).map_or(0, |row| row.0), |row| *schedule.host_exposure(day, row)).len();
+        }
+        state.apply(&mut world);
+    }
+    (start.elapsed(), n_events)
+}
+
+fn main() {
+    let (elapsed, n_events) = model_loop();
+    println!("{} Infections, step_state + challenge: {:>8.1} ms ({} events, {} hosts x {} days)",
+        STORAGE, elapsed.as_secs_f64() * 1e3, n_events, N_HOSTS, N_DAYS);
+}
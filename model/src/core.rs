@@ -24,6 +24,15 @@ pub struct Host {
     pub birth_sim_day: f32,
 }
 
+impl Host {
+    /// birth_sim_day of a vacant slot, left by a death until a birth refills it (see Demographics)
+    pub const VACANT: f32 = f32::INFINITY;
+
+    pub fn is_vacant(&self) -> bool {
+        self.birth_sim_day == Self::VACANT
+    }
+}
+
 #[cfg(feature = "pyo3")]
 #[pymethods]
 impl Host {
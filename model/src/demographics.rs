@@ -0,0 +1,159 @@
+// Births, ageing and deaths over a fixed set of host slots
+
+use std::cmp::Reverse;
+use std::collections::BinaryHeap;
+
+use bevy::prelude::*;
+use rand::Rng;
+use crate::core::Host;
+use crate::rng::{Draw, DrawKey};
+
+const DAYS_PER_YEAR: f32 = 365.0;
+
+/// Crude birth rate, age-specific mortality and the initial age pyramid
+///
+/// Hosts live in a fixed number of slots (output rows). A death leaves its slot vacant
+/// (see Host::VACANT) and each day's births refill vacant slots, lowest row first, so host
+/// storage never grows or moves and a slot keeps its row; births with no vacant slot left
+/// are not added. The number of slots is therefore a capacity: a population that starts
+/// with every slot filled can't grow, as births only replace deaths, so growth needs an
+/// initial population smaller than the number of slots. Ageing needs no update, as ages are
+/// counted from birth_sim_day.
+#[derive(Resource, Debug, Clone)]
+pub struct Demographics {
+    crude_birth_rate: f32,
+    mortality_ages: Vec<f32>,
+    daily_death_prob: Vec<f32>,
+    pyramid_edges: Vec<f32>,
+    pyramid_cdf: Vec<f32>,
+    initial_population: Option<usize>,
+}
+
+impl Demographics {
+    /// `crude_birth_rate` is births per 1000 living hosts per year; `mortality_rates` are
+    /// annual death rates in age bins starting at `mortality_ages` (years, from 0 upwards);
+    /// the initial ages are drawn from `pyramid_weights` over bins with `pyramid_edges`
+    /// (years, one more edge than weights), or are all 0 when both are empty; only the first
+    /// `initial_population` slots start occupied (all of them when None)
+    pub fn new(
+        crude_birth_rate: f32,
+        mortality_ages: Vec<f32>,
+        mortality_rates: Vec<f32>,
+        pyramid_edges: Vec<f32>,
+        pyramid_weights: Vec<f32>,
+        initial_population: Option<usize>,
+    ) -> Result<Self, String> {
+        if !(crude_birth_rate >= 0.0) {
+            return Err("crude_birth_rate must be non-negative".to_string());
+        }
+        if mortality_ages.len() != mortality_rates.len() {
+            return Err(format!("{} mortality ages for {} rates", mortality_ages.len(), mortality_rates.len()));
+        }
+        if mortality_ages.first().map_or(false, |&age| age != 0.0) || !is_increasing(&mortality_ages) {
+            return Err("mortality_ages must start at 0 and increase".to_string());
+        }
+        if mortality_rates.iter().any(|&rate| !(rate >= 0.0)) {
+            return Err("mortality_rates must be non-negative".to_string());
+        }
+        if !pyramid_weights.is_empty() || !pyramid_edges.is_empty() {
+            if pyramid_edges.len() != pyramid_weights.len() + 1 {
+                return Err(format!("{} age pyramid edges for {} bins", pyramid_edges.len(), pyramid_weights.len()));
+            }
+            if pyramid_edges[0] < 0.0 || !is_increasing(&pyramid_edges) {
+                return Err("age pyramid edges must be non-negative and increase".to_string());
+            }
+            if pyramid_weights.iter().any(|&w| !(w >= 0.0)) || !(pyramid_weights.iter().sum::<f32>() > 0.0) {
+                return Err("age pyramid weights must be non-negative with a positive sum".to_string());
+            }
+        }
+
+        let daily_death_prob = mortality_rates.iter().map(|&rate| daily_prob(rate)).collect();
+        let total: f32 = pyramid_weights.iter().sum();
+        let pyramid_cdf = pyramid_weights.iter()
+            .scan(0.0, |cumulative, &w| {
+                *cumulative += w / total;
+                Some(*cumulative)
+            })
+            .collect();
+        Ok(Self { crude_birth_rate, mortality_ages, daily_death_prob, pyramid_edges, pyramid_cdf, initial_population })
+    }
+
+    /// Chance that a living host dies on a day at `age_days` (the last bin holds for older ages)
+    pub fn death_prob(&self, age_days: f32) -> f32 {
+        let bin = self.mortality_ages.partition_point(|&age| age * DAYS_PER_YEAR <= age_days);
+        if bin == 0 { 0.0 } else { self.daily_death_prob[bin - 1] }
+    }
+
+    /// Chance that a living host adds a birth on a given day
+    pub fn birth_prob(&self) -> f32 {
+        daily_prob(self.crude_birth_rate / 1000.0)
+    }
+
+    /// Birth day of the host starting in `row` on `day`, with its age drawn from the pyramid,
+    /// or Host::VACANT for slots beyond the initial population
+    pub fn initial_birth_day(&self, seed: u64, row: u64, day: u32) -> f32 {
+        if self.initial_population.is_some_and(|n| row >= n as u64) {
+            return Host::VACANT;
+        }
+        if self.pyramid_cdf.is_empty() {
+            return day as f32;
+        }
+        let mut rng = DrawKey::new(seed, row, day).rng(Draw::Demography);
+        let u: f32 = rng.random();
+        let bin = self.pyramid_cdf.partition_point(|&c| c <= u).min(self.pyramid_cdf.len() - 1);
+        let (lo, hi) = (self.pyramid_edges[bin], self.pyramid_edges[bin + 1]);
+        let age_years = lo + (hi - lo) * rng.random::<f32>();
+        day as f32 - age_years * DAYS_PER_YEAR
+    }
+
+    /// Whether the host in a slot dies on `day`, and whether it adds a birth
+    ///
+    /// Both come from the host's own (seed, row, day) stream, so outcomes don't depend on
+    /// the order or thread in which slots are visited. Vacant slots do neither.
+    pub fn fate(&self, key: &DrawKey, host: &Host) -> (bool, bool) {
+        if host.is_vacant() {
+            return (false, false);
+        }
+        let mut rng = key.rng(Draw::Demography);
+        let dies = rng.random::<f32>() < self.death_prob(key.day as f32 - host.birth_sim_day);
+        let gives_birth = rng.random::<f32>() < self.birth_prob();
+        (dies, gives_birth)
+    }
+}
+
+/// Daily probability from an annual rate
+fn daily_prob(annual_rate: f32) -> f32 {
+    1.0 - (-annual_rate / DAYS_PER_YEAR).exp()
+}
+
+fn is_increasing(values: &[f32]) -> bool {
+    values.windows(2).all(|w| w[0] < w[1])
+}
+
+/// Rows of vacant host slots, handed out lowest first
+#[derive(Resource, Debug, Default)]
+pub struct VacantSlots(BinaryHeap<Reverse<usize>>);
+
+impl VacantSlots {
+    /// Vacant slots among `hosts`, in row order
+    pub fn from_hosts<'a>(hosts: impl IntoIterator<Item = &'a Host>) -> Self {
+        Self(hosts.into_iter().enumerate().filter(|(_, host)| host.is_vacant()).map(|(row, _)| Reverse(row)).collect())
+    }
+
+    pub fn push(&mut self, row: usize) {
+        self.0.push(Reverse(row));
+    }
+
+    /// Takes the lowest vacant row, if any
+    pub fn pop(&mut self) -> Option<usize> {
+        self.0.pop().map(|Reverse(row)| row)
+    }
+
+    pub fn len(&self) -> usize {
+        self.0.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.0.is_empty()
+    }
+}
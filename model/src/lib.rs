@@ -1,5 +1,32 @@
+/// Per-host log lines, compiled in only with the `host-logging` feature
+///
+/// Without it the arguments are still type-checked but the call is removed at compile time,
+/// so inner loops pay neither level checks nor argument captures; runs report daily totals
+/// instead (see polio::log_day_totals).
+macro_rules! host_info {
+    ($($arg:tt)*) => {
+        if cfg!(feature = "host-logging") {
+            log::info!($($arg)*);
+        }
+    };
+}
+
+/// Debug-level counterpart of host_info
+macro_rules! host_debug {
+    ($($arg:tt)*) => {
+        if cfg!(feature = "host-logging") {
+            log::debug!($($arg)*);
+        }
+    };
+}
+
 pub mod core;
+pub mod demographics;
 pub mod polio;
+pub mod rng;
+pub mod stats;
 
 pub use core::*;
-pub use polio::*;
\ No newline at end of file
+pub use demographics::*;
+pub use polio::*;
+pub use rng::*;
\ No newline at end of file
@@ -0,0 +1,265 @@
+// Columnar population state, saved to and restored from a compact binary checkpoint file
+
+use std::fs;
+use std::io::{self, BufWriter, Write};
+use std::path::Path;
+
+use bevy::prelude::*;
+use crate::core::Host;
+use super::disease::*;
+use super::population::Population;
+
+/// File magic; the last byte is the format version
+const MAGIC: [u8; 8] = *b"PBCKPT\0\x02";
+/// Magic, day, reserved, seed and n_hosts
+const HEADER_BYTES: usize = 32;
+/// infection_type of a host without an active infection
+pub const NO_INFECTION: u8 = u8::MAX;
+
+/// Every host's Host, HostImmunity and Infections state as columns indexed by output row,
+/// with the day and seed needed to continue the run
+///
+/// `birth_sim_day` has one value per host; the other columns have one per host and serotype
+/// ((n_hosts x N_SEROTYPES) row-major, see `width`). Optional values are stored as NaN
+/// (`ti_infected`, `peak_cid50`) or NO_INFECTION (`infection_type`, otherwise the infection
+/// type code of that serotype). Random draws are keyed by (seed, row, day), so the seed and
+/// day are the whole RNG state.
+///
+/// The file is a 32-byte header (magic, day as u32, 4 reserved bytes, seed and n_hosts as
+/// u64) followed by the f32 columns in field order and then `infection_type`, all
+/// little-endian, so each column can be memory-mapped in place at a fixed offset
+/// (see pybevy.checkpoint).
+#[derive(Resource, Debug, Clone)]
+pub struct PopulationState {
+    pub day: u32,
+    pub seed: u64,
+    pub birth_sim_day: Vec<f32>,
+    pub prechallenge_immunity: Vec<f32>,
+    pub postchallenge_peak_immunity: Vec<f32>,
+    pub current_immunity: Vec<f32>,
+    pub ti_infected: Vec<f32>,
+    pub shed_duration: Vec<f32>,
+    pub viral_shedding: Vec<f32>,
+    pub peak_cid50: Vec<f32>,
+    pub infection_type: Vec<u8>,
+}
+
+impl PopulationState {
+    /// Naive hosts born on day 0, as spawned at the start of a run
+    pub fn new(n_hosts: usize, day: u32, seed: u64) -> Self {
+        let immunity = Immunity::default();
+        let n_values = n_hosts * N_SEROTYPES;
+        Self {
+            day,
+            seed,
+            birth_sim_day: vec![0.0; n_hosts],
+            prechallenge_immunity: vec![immunity.prechallenge_immunity; n_values],
+            postchallenge_peak_immunity: vec![immunity.postchallenge_peak_immunity; n_values],
+            current_immunity: vec![immunity.current_immunity; n_values],
+            ti_infected: vec![f32::NAN; n_values],
+            shed_duration: vec![0.0; n_values],
+            viral_shedding: vec![0.0; n_values],
+            peak_cid50: vec![f32::NAN; n_values],
+            infection_type: vec![NO_INFECTION; n_values],
+        }
+    }
+
+    pub fn len(&self) -> usize {
+        self.birth_sim_day.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.birth_sim_day.is_empty()
+    }
+
+    /// Values per host in the column `name`: 1 for birth_sim_day, N_SEROTYPES otherwise
+    pub fn width(name: &str) -> usize {
+        if name == "birth_sim_day" { 1 } else { N_SEROTYPES }
+    }
+
+    /// Stores one host's components in row `row`
+    pub fn set_host(&mut self, row: usize, host: &Host, immunity: &HostImmunity, infections: Option<&Infections>) {
+        self.birth_sim_day[row] = host.birth_sim_day;
+        let lanes = row * N_SEROTYPES..(row + 1) * N_SEROTYPES;
+        self.prechallenge_immunity[lanes.clone()].copy_from_slice(&immunity.prechallenge_immunity);
+        self.postchallenge_peak_immunity[lanes.clone()].copy_from_slice(&immunity.postchallenge_peak_immunity);
+        self.current_immunity[lanes.clone()].copy_from_slice(&immunity.current_immunity);
+        self.ti_infected[lanes].copy_from_slice(&immunity.ti_infected);
+        for s in 0..N_SEROTYPES {
+            let i = row * N_SEROTYPES + s;
+            match infections.and_then(|infections| infections.0[s].as_ref()) {
+                Some(inf) => {
+                    self.shed_duration[i] = inf.shed_duration;
+                    self.viral_shedding[i] = inf.viral_shedding;
+                    self.peak_cid50[i] = inf.peak_cid50.unwrap_or(f32::NAN);
+                    self.infection_type[i] = infection_type_code(inf.strain, inf.serotype);
+                }
+                None => {
+                    self.shed_duration[i] = 0.0;
+                    self.viral_shedding[i] = 0.0;
+                    self.peak_cid50[i] = f32::NAN;
+                    self.infection_type[i] = NO_INFECTION;
+                }
+            }
+        }
+    }
+
+    /// Components of the host in row `row`; Infections is None if it has no active infection
+    pub fn host(&self, row: usize) -> (Host, HostImmunity, Option<Infections>) {
+        let host = Host { birth_sim_day: self.birth_sim_day[row] };
+        let lane = |column: &[f32]| -> [f32; N_SEROTYPES] { std::array::from_fn(|s| column[row * N_SEROTYPES + s]) };
+        let immunity = HostImmunity {
+            prechallenge_immunity: lane(&self.prechallenge_immunity),
+            postchallenge_peak_immunity: lane(&self.postchallenge_peak_immunity),
+            current_immunity: lane(&self.current_immunity),
+            ti_infected: lane(&self.ti_infected),
+        };
+        let infections = Infections(std::array::from_fn(|s| {
+            let i = row * N_SEROTYPES + s;
+            infection_type_from_code(self.infection_type[i]).map(|(strain, serotype)| Infection {
+                shed_duration: self.shed_duration[i],
+                viral_shedding: self.viral_shedding[i],
+                strain,
+                serotype,
+                peak_cid50: non_nan(self.peak_cid50[i]),
+            })
+        }));
+        (host, immunity, (!infections.is_empty()).then_some(infections))
+    }
+
+    /// State of a struct-of-arrays population on `day`
+    pub fn from_population(population: &Population, day: u32) -> Self {
+        let mut state = Self::new(population.len(), day, population.seed);
+        for row in 0..population.len() {
+            state.set_host(row, &population.hosts[row], &population.immunity[row], Some(&population.infections[row]));
+        }
+        state
+    }
+
+    /// Struct-of-arrays population with this state, drawing from `seed`
+    pub fn to_population(&self, seed: u64) -> Population {
+        let mut population = Population::new(self.len(), seed);
+        for row in 0..self.len() {
+            let (host, immunity, infections) = self.host(row);
+            population.hosts[row] = host;
+            population.immunity[row] = immunity;
+            population.infections[row] = infections.unwrap_or_default();
+        }
+        population
+    }
+
+    /// The f32 columns by name, in file order
+    pub fn float_columns(&self) -> [(&'static str, &Vec<f32>); 8] {
+        [
+            ("birth_sim_day", &self.birth_sim_day),
+            ("prechallenge_immunity", &self.prechallenge_immunity),
+            ("postchallenge_peak_immunity", &self.postchallenge_peak_immunity),
+            ("current_immunity", &self.current_immunity),
+            ("ti_infected", &self.ti_infected),
+            ("shed_duration", &self.shed_duration),
+            ("viral_shedding", &self.viral_shedding),
+            ("peak_cid50", &self.peak_cid50),
+        ]
+    }
+
+    /// Mutable counterpart of float_columns
+    pub fn float_columns_mut(&mut self) -> [(&'static str, &mut Vec<f32>); 8] {
+        [
+            ("birth_sim_day", &mut self.birth_sim_day),
+            ("prechallenge_immunity", &mut self.prechallenge_immunity),
+            ("postchallenge_peak_immunity", &mut self.postchallenge_peak_immunity),
+            ("current_immunity", &mut self.current_immunity),
+            ("ti_infected", &mut self.ti_infected),
+            ("shed_duration", &mut self.shed_duration),
+            ("viral_shedding", &mut self.viral_shedding),
+            ("peak_cid50", &mut self.peak_cid50),
+        ]
+    }
+
+    /// Checks that infection types are known and match their serotype, and that infected
+    /// hosts have an infection day
+    pub fn validate(&self) -> Result<(), String> {
+        for (i, &code) in self.infection_type.iter().enumerate() {
+            if code == NO_INFECTION {
+                continue;
+            }
+            let (row, s) = (i / N_SEROTYPES, i % N_SEROTYPES);
+            match infection_type_from_code(code) {
+                None => return Err(format!("host {} has unknown infection type code {}", row, code)),
+                Some((_, serotype)) if serotype.index() != s => {
+                    return Err(format!("host {} has infection type code {} in serotype {}'s column", row, code, s + 1));
+                }
+                Some(_) => {}
+            }
+            if self.ti_infected[i].is_nan() {
+                return Err(format!("host {} has an active serotype {} infection but no ti_infected", row, s + 1));
+            }
+        }
+        Ok(())
+    }
+
+    /// Writes the checkpoint file (see the type docs for the layout)
+    pub fn save(&self, path: &Path) -> io::Result<()> {
+        let mut writer = BufWriter::new(fs::File::create(path)?);
+        writer.write_all(&MAGIC)?;
+        writer.write_all(&self.day.to_le_bytes())?;
+        writer.write_all(&[0; 4])?;
+        writer.write_all(&self.seed.to_le_bytes())?;
+        writer.write_all(&(self.len() as u64).to_le_bytes())?;
+        let mut bytes = Vec::with_capacity(self.len() * N_SEROTYPES * 4);
+        for (_, column) in self.float_columns() {
+            bytes.clear();
+            bytes.extend(column.iter().flat_map(|v| v.to_le_bytes()));
+            writer.write_all(&bytes)?;
+        }
+        writer.write_all(&self.infection_type)?;
+        writer.flush()
+    }
+
+    /// Reads a checkpoint file with a single read, copying each column out in bulk
+    pub fn load(path: &Path) -> io::Result<Self> {
+        let bytes = fs::read(path)?;
+        let invalid = |message: &str| io::Error::new(io::ErrorKind::InvalidData, format!("{}: {}", path.display(), message));
+        if bytes.len() < HEADER_BYTES || bytes[..8] != MAGIC {
+            return Err(invalid("not a pybevy checkpoint (or an unsupported version)"));
+        }
+        let day = u32::from_le_bytes(bytes[8..12].try_into().unwrap());
+        let seed = u64::from_le_bytes(bytes[16..24].try_into().unwrap());
+        let n_hosts = u64::from_le_bytes(bytes[24..32].try_into().unwrap()) as usize;
+        // birth_sim_day, 7 f32 columns and infection_type per serotype
+        let host_bytes = 4 + N_SEROTYPES * (7 * 4 + 1);
+        let expected = n_hosts.checked_mul(host_bytes).and_then(|n| n.checked_add(HEADER_BYTES));
+        if expected != Some(bytes.len()) {
+            return Err(invalid("file size does not match its host count"));
+        }
+
+        let mut offset = HEADER_BYTES;
+        let mut f32_column = |width: usize| -> Vec<f32> {
+            let column = bytes[offset..offset + n_hosts * width * 4]
+                .chunks_exact(4)
+                .map(|b| f32::from_le_bytes(b.try_into().unwrap()))
+                .collect();
+            offset += n_hosts * width * 4;
+            column
+        };
+        let state = Self {
+            day,
+            seed,
+            birth_sim_day: f32_column(1),
+            prechallenge_immunity: f32_column(N_SEROTYPES),
+            postchallenge_peak_immunity: f32_column(N_SEROTYPES),
+            current_immunity: f32_column(N_SEROTYPES),
+            ti_infected: f32_column(N_SEROTYPES),
+            shed_duration: f32_column(N_SEROTYPES),
+            viral_shedding: f32_column(N_SEROTYPES),
+            peak_cid50: f32_column(N_SEROTYPES),
+            infection_type: bytes[bytes.len() - n_hosts * N_SEROTYPES..].to_vec(),
+        };
+        state.validate().map_err(|message| invalid(&message))?;
+        Ok(state)
+    }
+}
+
+fn non_nan(value: f32) -> Option<f32> {
+    if value.is_nan() { None } else { Some(value) }
+}
@@ -1,10 +1,14 @@
 // Disease-related enums, components, and systems for polio simulation
 
 use bevy::prelude::*;
+use rand::Rng;
 use rand_distr::{LogNormal, Normal, Distribution};
-use log::{info, debug, error};
 use crate::core::{SimulationTime, Host};
+use crate::rng::{standalone_rng, Draw, DrawKey, SimRng};
+use crate::stats;
 use super::params::*;
+use super::events::{EventKind, HostEvent};
+use super::exposure::Exposure;
 
 #[cfg(feature = "pyo3")]
 use pyo3::prelude::*;
@@ -24,7 +28,17 @@ pub enum InfectionSerotype {
     Type3,
 }
 
+/// Number of serotypes each host keeps immunity to and can be infected with
+pub const N_SEROTYPES: usize = 3;
+
 impl InfectionSerotype {
+    pub const ALL: [InfectionSerotype; N_SEROTYPES] = [InfectionSerotype::Type1, InfectionSerotype::Type2, InfectionSerotype::Type3];
+
+    /// Position of the serotype in per-serotype arrays
+    pub fn index(self) -> usize {
+        self as usize
+    }
+
     pub fn from_num(n: u8) -> Option<Self> {
         match n {
             1 => Some(InfectionSerotype::Type1),
@@ -49,7 +63,95 @@ pub fn parse_infection_type(s: &str) -> Option<(InfectionStrain, InfectionSeroty
     }
 }
 
-#[derive(Component)]
+/// Number of distinct (strain, serotype) infection types
+pub const N_INFECTION_TYPES: usize = 6;
+
+/// Compact integer code for an infection type: WPV1..WPV3 -> 0..2, OPV1..OPV3 -> 3..5
+pub fn infection_type_code(strain: InfectionStrain, serotype: InfectionSerotype) -> u8 {
+    strain as u8 * 3 + serotype as u8
+}
+
+pub fn infection_type_from_code(code: u8) -> Option<(InfectionStrain, InfectionSerotype)> {
+    let strain = match code / 3 {
+        0 => InfectionStrain::WPV,
+        1 => InfectionStrain::OPV,
+        _ => return None,
+    };
+    Some((strain, InfectionSerotype::from_num(code % 3 + 1)?))
+}
+
+/// Name of an infection type code, as accepted by parse_infection_type ("WPV1".."OPV3")
+pub fn infection_type_name(code: u8) -> Option<String> {
+    let (strain, serotype) = infection_type_from_code(code)?;
+    Some(format!("{:?}{}", strain, serotype as u8 + 1))
+}
+
+#[cfg_attr(feature = "pyo3", pyfunction)]
+pub fn parse_infection_code(s: &str) -> Option<u8> {
+    parse_infection_type(s).map(|(strain, serotype)| infection_type_code(strain, serotype))
+}
+
+/// Serotype sets of multi-serotype challenges, as bitmasks with Type1 in bit 0, in code order
+const SEROTYPE_COMBINATIONS: [u8; 4] = [0b011, 0b101, 0b110, 0b111];
+
+/// Number of challenge type codes: the infection type codes (one serotype), then each strain
+/// with each multi-serotype combination (OPV12, OPV13, OPV23, OPV123 for OPV)
+pub const N_CHALLENGE_TYPES: usize = N_INFECTION_TYPES + 2 * SEROTYPE_COMBINATIONS.len();
+
+/// Compact integer code for a challenge with one strain and one or more serotypes; a single
+/// serotype has its infection type code. None if `serotypes` is empty.
+pub fn challenge_type_code(strain: InfectionStrain, serotypes: [bool; N_SEROTYPES]) -> Option<u8> {
+    let mask = serotypes.iter().enumerate().fold(0u8, |mask, (i, &on)| mask | ((on as u8) << i));
+    if mask.count_ones() == 1 {
+        let serotype = InfectionSerotype::ALL[mask.trailing_zeros() as usize];
+        return Some(infection_type_code(strain, serotype));
+    }
+    let combination = SEROTYPE_COMBINATIONS.iter().position(|&m| m == mask)?;
+    Some((N_INFECTION_TYPES + strain as usize * SEROTYPE_COMBINATIONS.len() + combination) as u8)
+}
+
+pub fn challenge_type_from_code(code: u8) -> Option<(InfectionStrain, [bool; N_SEROTYPES])> {
+    if let Some((strain, serotype)) = infection_type_from_code(code) {
+        let mut serotypes = [false; N_SEROTYPES];
+        serotypes[serotype.index()] = true;
+        return Some((strain, serotypes));
+    }
+    let index = (code as usize).checked_sub(N_INFECTION_TYPES)?;
+    let strain = match index / SEROTYPE_COMBINATIONS.len() {
+        0 => InfectionStrain::WPV,
+        1 => InfectionStrain::OPV,
+        _ => return None,
+    };
+    let mask = SEROTYPE_COMBINATIONS[index % SEROTYPE_COMBINATIONS.len()];
+    Some((strain, std::array::from_fn(|i| mask & (1 << i) != 0)))
+}
+
+/// Challenge type code of a name like "WPV2", "OPV13" (one digit per serotype), "tOPV"
+/// (OPV123) or "bOPV" (OPV13)
+#[cfg_attr(feature = "pyo3", pyfunction)]
+pub fn parse_challenge_code(s: &str) -> Option<u8> {
+    let s = s.to_ascii_uppercase();
+    let (strain, digits) = match s.as_str() {
+        "TOPV" => (InfectionStrain::OPV, "123"),
+        "BOPV" => (InfectionStrain::OPV, "13"),
+        _ if s.starts_with("WPV") => (InfectionStrain::WPV, &s[3..]),
+        _ if s.starts_with("OPV") => (InfectionStrain::OPV, &s[3..]),
+        _ => return None,
+    };
+    let mut serotypes = [false; N_SEROTYPES];
+    for digit in digits.chars() {
+        let serotype = InfectionSerotype::from_num(digit.to_digit(10)? as u8)?;
+        if serotypes[serotype.index()] {
+            return None;
+        }
+        serotypes[serotype.index()] = true;
+    }
+    challenge_type_code(strain, serotypes)
+}
+
+/// Neutralizing antibody state against one serotype (see HostImmunity for a host's state
+/// against all of them)
+#[derive(Debug, Clone, Copy)]
 #[cfg_attr(feature = "pyo3", pyclass(get_all, set_all))]
 pub struct Immunity {
     pub prechallenge_immunity: f32,
@@ -69,22 +171,54 @@ impl Default for Immunity {
     }
 }
 
-#[cfg_attr(feature = "pyo3", pymethods)]
+// Sampling with an explicit random stream; the Python-facing methods below use the thread RNG
 impl Immunity {
-    pub fn calculate_theta_nab(&self, theta_nabs: &ThetaNabsParams) -> f32 {
-        let nabs = self.prechallenge_immunity;
-        let mean = theta_nabs.a + theta_nabs.b * nabs.log2();
-        let stdev = (theta_nabs.c + theta_nabs.d * nabs.log2()).max(0.0).sqrt();
+    pub fn sample_theta_nab<R: Rng + ?Sized>(&self, theta_nabs: &ThetaNabsParams, rng: &mut R) -> f32 {
+        let (mean, stdev) = theta_nab_log_params(self.prechallenge_immunity, theta_nabs);
         let normal_dist = Normal::new(mean, stdev).unwrap();
-        normal_dist.sample(&mut rand::rng()).exp()
+        normal_dist.sample(rng).exp()
     }
 
-    pub fn update_peak_immunity(&mut self, theta_nabs: &ThetaNabsParams) {
+    pub fn update_peak_immunity_with<R: Rng + ?Sized>(&mut self, theta_nabs: &ThetaNabsParams, rng: &mut R) {
         self.prechallenge_immunity = self.current_immunity;
-        let theta_nabs_value = self.calculate_theta_nab(theta_nabs);
+        let theta_nabs_value = self.sample_theta_nab(theta_nabs, rng);
         self.postchallenge_peak_immunity = self.prechallenge_immunity * theta_nabs_value.max(1.0);
         self.current_immunity = self.postchallenge_peak_immunity.max(1.0);
-        info!("  Updated current immunity: {}", self.current_immunity);
+        host_info!("  Updated current immunity: {}", self.current_immunity);
+    }
+
+    pub fn sample_shed_duration<R: Rng + ?Sized>(&self, shed_duration: &ShedDurationParams, rng: &mut R) -> f32 {
+        let (mu, std) = shed_duration_log_params(self.prechallenge_immunity, shed_duration);
+        let log_normal_dist = LogNormal::new(mu, std).unwrap();
+        let shed_duration = log_normal_dist.sample(rng);
+        host_info!("  Updated shed duration: {}", shed_duration);
+        shed_duration
+    }
+}
+
+/// Mean and standard deviation of ln(theta NAb), the boost drawn when a host with `nabs` is infected
+fn theta_nab_log_params(nabs: f32, theta_nabs: &ThetaNabsParams) -> (f32, f32) {
+    let mean = theta_nabs.a + theta_nabs.b * nabs.log2();
+    let stdev = (theta_nabs.c + theta_nabs.d * nabs.log2()).max(0.0).sqrt();
+    (mean, stdev)
+}
+
+/// Location and scale of the lognormal shed duration for a host infected with `nabs`
+fn shed_duration_log_params(nabs: f32, shed_duration: &ShedDurationParams) -> (f32, f32) {
+    let mu = shed_duration.u.ln() - shed_duration.delta.ln() * nabs.log2();
+    (mu, shed_duration.sigma.ln())
+}
+
+#[cfg_attr(feature = "pyo3", pymethods)]
+impl Immunity {
+    #[cfg_attr(feature = "pyo3", pyo3(signature = (theta_nabs, seed=None)))]
+    pub fn calculate_theta_nab(&self, theta_nabs: &ThetaNabsParams, seed: Option<u64>) -> f32 {
+        self.sample_theta_nab(theta_nabs, &mut standalone_rng(seed, Draw::ThetaNab))
+    }
+
+    #[cfg_attr(feature = "pyo3", pyo3(signature = (theta_nabs, seed=None)))]
+    pub fn update_peak_immunity(&mut self, theta_nabs: &ThetaNabsParams, seed: Option<u64>) {
+        self.update_peak_immunity_with(theta_nabs, &mut standalone_rng(seed, Draw::ThetaNab))
     }
 
     pub fn calculate_waning(&mut self, t_since_last_exposure: f32, immunity_waning: &ImmunityWaningParams) {
@@ -93,46 +227,91 @@ impl Immunity {
             }
     }
 
-    pub fn calculate_shed_duration(&self, shed_duration: &ShedDurationParams) -> f32 {
-        let u = shed_duration.u;
-        let delta = shed_duration.delta;
-        let sigma = shed_duration.sigma;
-        let mu = u.ln() - delta.ln() * self.prechallenge_immunity.log2();
-        let std = sigma.ln();
-        let log_normal_dist = LogNormal::new(mu, std).unwrap();
-        let shed_duration = log_normal_dist.sample(&mut rand::rng());
-        info!("  Updated shed duration: {}", shed_duration);
-        shed_duration
+    #[cfg_attr(feature = "pyo3", pyo3(signature = (shed_duration, seed=None)))]
+    pub fn calculate_shed_duration(&self, shed_duration: &ShedDurationParams, seed: Option<u64>) -> f32 {
+        self.sample_shed_duration(shed_duration, &mut standalone_rng(seed, Draw::ShedDuration))
     }
 
     pub fn calculate_viral_shedding(&self, age_in_months: f32, days_since_infection: f32, params: &Params) -> f32 {
-        let log10_peak_cid50 = update_log10_peak_cid50(self, age_in_months, &params.peak_cid50);
-        let log_t_inf = days_since_infection.ln();
-        let eta = params.viral_shedding.eta;
-        let v = params.viral_shedding.v;
-        let epsilon = params.viral_shedding.epsilon;
-        let exponent = eta - (0.5 * v.powi(2)) - ((log_t_inf - eta).powi(2)) / (2.0 * (v + epsilon * log_t_inf).powi(2));
-        let predicted_concentration = 10f32.powf(log10_peak_cid50) * exponent.exp() / days_since_infection;
-        predicted_concentration.max(10f32.powf(2.6))
+        let log10_peak_cid50 = log10_peak_cid50(self.prechallenge_immunity, age_in_months, &params.peak_cid50);
+        let predicted_concentration = 10f32.powf(log10_peak_cid50) * shedding_kinetics(days_since_infection, &params.viral_shedding);
+        predicted_concentration.max(min_viral_shedding())
     }
 
-    pub fn calculate_infection_probability(
+    /// Exact P(still shedding) on each day since infection for a challenge at current immunity
+    pub fn shed_duration_survival(
         &self,
-        dose: f32,
+        days: Vec<f32>,
         strain: InfectionStrain,
         serotype: InfectionSerotype,
         params: &Params,
-    ) -> f32 {
+    ) -> Vec<f32> {
+        let (mu, sigma) = shed_duration_log_params(self.current_immunity, params.shed_duration_for(strain, serotype));
+        days.iter()
+            .map(|&t| {
+                if t <= 0.0 {
+                    1.0
+                } else {
+                    (1.0 - stats::normal_cdf(((t as f64).ln() - mu as f64) / sigma as f64)) as f32
+                }
+            })
+            .collect()
+    }
 
-        let (Some(sabin_scale), Some(take_modifier)) = (params.sabin_scale_for(strain, serotype), params.take_modifier_for(strain, serotype)) else {
-            error!("Missing strain parameters for {:?} {:?}", strain, serotype);
-            return 0.0;
-        };
+    /// Exact shed duration quantiles (days) for a challenge at current immunity
+    pub fn shed_duration_quantiles(
+        &self,
+        probs: Vec<f32>,
+        strain: InfectionStrain,
+        serotype: InfectionSerotype,
+        params: &Params,
+    ) -> Vec<f32> {
+        let (mu, sigma) = shed_duration_log_params(self.current_immunity, params.shed_duration_for(strain, serotype));
+        probs.iter()
+            .map(|&p| (mu as f64 + sigma as f64 * stats::normal_quantile(p as f64)).exp() as f32)
+            .collect()
+    }
 
-        let gamma = params.p_transmit.gamma;
-        let alpha = params.p_transmit.alpha;
+    /// Exact quantiles of the post-challenge peak immunity for an infection at current immunity
+    pub fn postchallenge_peak_quantiles(&self, probs: Vec<f32>, theta_nabs: &ThetaNabsParams) -> Vec<f32> {
+        let nabs = self.current_immunity;
+        let (mean, stdev) = theta_nab_log_params(nabs, theta_nabs);
+        probs.iter()
+            .map(|&p| {
+                let theta = (mean as f64 + stdev as f64 * stats::normal_quantile(p as f64)).exp();
+                nabs * (theta as f32).max(1.0)
+            })
+            .collect()
+    }
 
-        (1.0 - (1.0 + dose / sabin_scale).powf(-alpha * self.current_immunity.powf(-gamma))) * take_modifier
+    /// Exact mean post-challenge peak immunity, E[nabs * max(theta, 1)], for an infection at current immunity
+    pub fn postchallenge_peak_mean(&self, theta_nabs: &ThetaNabsParams) -> f32 {
+        let nabs = self.current_immunity;
+        let (mean, stdev) = theta_nab_log_params(nabs, theta_nabs);
+        let (m, s) = (mean as f64, stdev as f64);
+        if s == 0.0 {
+            return nabs * (m.exp() as f32).max(1.0);
+        }
+        // P(theta <= 1) * 1 + E[theta; theta > 1] for lognormal theta
+        let boost = stats::normal_cdf(-m / s) + (m + 0.5 * s * s).exp() * stats::normal_cdf((m + s * s) / s);
+        nabs * boost as f32
+    }
+
+    pub fn calculate_infection_probability(
+        &self,
+        dose: f32,
+        strain: InfectionStrain,
+        serotype: InfectionSerotype,
+        params: &Params,
+    ) -> f32 {
+        let strain_params = params.strain_params_for(strain, serotype);
+        dose_response(
+            self.current_immunity,
+            dose,
+            strain_params.sabin_scale_parameter,
+            strain_params.strain_take_modifier,
+            &params.p_transmit,
+        )
     }
 
     #[cfg(feature = "pyo3")]
@@ -158,13 +337,81 @@ impl Immunity {
     }
 }
 
-#[derive(Component)]
+/// A host's immunity to every serotype, one array lane per serotype (by InfectionSerotype::index)
+///
+/// Each field is a fixed-size array stored inline, so all serotypes wane together in one pass
+/// over contiguous lanes. `ti_infected` is NaN for serotypes the host was never infected with.
+#[derive(Component, Debug, Clone, Copy, PartialEq)]
+pub struct HostImmunity {
+    pub prechallenge_immunity: [f32; N_SEROTYPES],
+    pub postchallenge_peak_immunity: [f32; N_SEROTYPES],
+    pub current_immunity: [f32; N_SEROTYPES],
+    pub ti_infected: [f32; N_SEROTYPES],
+}
+
+impl Default for HostImmunity {
+    fn default() -> Self {
+        Self::uniform(&Immunity::default())
+    }
+}
+
+impl HostImmunity {
+    /// The same state against every serotype
+    pub fn uniform(immunity: &Immunity) -> Self {
+        Self {
+            prechallenge_immunity: [immunity.prechallenge_immunity; N_SEROTYPES],
+            postchallenge_peak_immunity: [immunity.postchallenge_peak_immunity; N_SEROTYPES],
+            current_immunity: [immunity.current_immunity; N_SEROTYPES],
+            ti_infected: [immunity.ti_infected.unwrap_or(f32::NAN); N_SEROTYPES],
+        }
+    }
+
+    /// State against one serotype
+    pub fn serotype(&self, serotype: InfectionSerotype) -> Immunity {
+        let s = serotype.index();
+        Immunity {
+            prechallenge_immunity: self.prechallenge_immunity[s],
+            postchallenge_peak_immunity: self.postchallenge_peak_immunity[s],
+            current_immunity: self.current_immunity[s],
+            ti_infected: Some(self.ti_infected[s]).filter(|t| !t.is_nan()),
+        }
+    }
+
+    pub fn set_serotype(&mut self, serotype: InfectionSerotype, immunity: &Immunity) {
+        let s = serotype.index();
+        self.prechallenge_immunity[s] = immunity.prechallenge_immunity;
+        self.postchallenge_peak_immunity[s] = immunity.postchallenge_peak_immunity;
+        self.current_immunity[s] = immunity.current_immunity;
+        self.ti_infected[s] = immunity.ti_infected.unwrap_or(f32::NAN);
+    }
+
+    /// Wanes every serotype to `day`, as Immunity::calculate_waning does for one
+    pub fn wane(&mut self, day: u32, immunity_waning: &ImmunityWaningParams) {
+        for s in 0..N_SEROTYPES {
+            // NaN (never infected) fails the comparison and leaves the lane unchanged
+            let t_since_last_exposure = day as f32 - self.ti_infected[s];
+            if t_since_last_exposure >= 30.0 {
+                self.current_immunity[s] = (self.postchallenge_peak_immunity[s] * ((t_since_last_exposure / 30.0).powf(-immunity_waning.rate))).max(1.0);
+            }
+        }
+    }
+
+    /// Highest current immunity over the serotypes; in a run challenging a single serotype,
+    /// that serotype's (the others stay at the naive 1.0)
+    pub fn max_current_immunity(&self) -> f32 {
+        self.current_immunity.iter().copied().fold(f32::MIN, f32::max)
+    }
+}
+
+/// Active infection with one serotype
+#[derive(Debug, Clone, Copy)]
 #[cfg_attr(feature = "pyo3", pyclass(get_all, set_all))]
 pub struct Infection {
     pub shed_duration: f32,
     pub viral_shedding: f32,
     pub strain: InfectionStrain,
     pub serotype: InfectionSerotype,
+    pub peak_cid50: Option<f32>,
 }
 
 impl Infection {
@@ -174,8 +421,47 @@ impl Infection {
             viral_shedding: 0.0,
             strain,
             serotype,
+            peak_cid50: None,
         }
     }
+
+    /// Daily shedding from the peak CID50 (cached on first update) and the shared kinetics table
+    pub fn update_viral_shedding(&mut self, prechallenge_immunity: f32, age_in_months: f32, days_since_infection: f32, kinetics: &[f32], params: &Params) {
+        let peak_cid50 = *self.peak_cid50.get_or_insert_with(|| {
+            10f32.powf(log10_peak_cid50(prechallenge_immunity, age_in_months, &params.peak_cid50))
+        });
+        let day = days_since_infection as usize;
+        let kinetics = match kinetics.get(day) {
+            Some(&k) if day as f32 == days_since_infection => k,
+            _ => shedding_kinetics(days_since_infection, &params.viral_shedding),
+        };
+        self.viral_shedding = (peak_cid50 * kinetics).max(min_viral_shedding());
+    }
+}
+
+/// A host's active infections, one slot per serotype (by InfectionSerotype::index), so it can
+/// shed several serotypes at once; added on the first infection and removed once none is active
+///
+/// Stored as a sparse set so adding and removing it doesn't move the host's other
+/// components between archetype tables; the table-infections feature stores it in tables
+/// instead, for comparison (see benches/infection_storage.rs).
+#[derive(Component, Debug, Clone, Copy, Default)]
+#[cfg_attr(not(feature = "table-infections"), component(storage = "SparseSet"))]
+pub struct Infections(pub [Option<Infection>; N_SEROTYPES]);
+
+impl Infections {
+    pub fn is_empty(&self) -> bool {
+        self.0.iter().all(Option::is_none)
+    }
+
+    pub fn get(&self, serotype: InfectionSerotype) -> Option<&Infection> {
+        self.0[serotype.index()].as_ref()
+    }
+
+    /// Viral shedding of each serotype, None where not infected
+    pub fn viral_shedding(&self) -> [Option<f32>; N_SEROTYPES] {
+        self.0.map(|inf| inf.map(|inf| inf.viral_shedding))
+    }
 }
 
 #[cfg_attr(feature = "pyo3", pymethods)]
@@ -194,6 +480,7 @@ impl Infection {
             viral_shedding,
             strain,
             serotype,
+            peak_cid50: None,
         }
     }
 
@@ -201,48 +488,159 @@ impl Infection {
         days_since_infection > self.shed_duration
     }
 
-    pub fn set_prognoses(&mut self, immunity: &mut Immunity, sim_time: f32, params: &Params) {
-        
-        immunity.update_peak_immunity(&params.theta_nabs);
+    #[cfg_attr(feature = "pyo3", pyo3(signature = (immunity, sim_time, params, seed=None)))]
+    pub fn set_prognoses(&mut self, immunity: &mut Immunity, sim_time: f32, params: &Params, seed: Option<u64>) {
+        let key = DrawKey::new(seed.unwrap_or_else(rand::random), 0, sim_time as u32);
+        self.set_prognoses_with(immunity, sim_time, params, &key);
+    }
+}
+
+impl Infection {
+    /// Boosts immunity and samples shed duration from the host's keyed ThetaNab and
+    /// ShedDuration streams for the infection's serotype
+    pub fn set_prognoses_with(&mut self, immunity: &mut Immunity, sim_time: f32, params: &Params, key: &DrawKey) {
+        let s = self.serotype.index();
+        immunity.update_peak_immunity_with(&params.theta_nabs, &mut key.serotype_rng(Draw::ThetaNab, s));
         immunity.ti_infected = Some(sim_time);
 
-        self.shed_duration = if let Some(shed_params) = params.shed_duration_for(self.strain, self.serotype) {
-            immunity.calculate_shed_duration(&shed_params)
+        let shed_params = params.shed_duration_for(self.strain, self.serotype);
+        self.shed_duration = immunity.sample_shed_duration(shed_params, &mut key.serotype_rng(Draw::ShedDuration, s));
+    }
+}
+
+/// Advances one host by a day: wanes its immunity to every serotype in one pass, then updates
+/// the shedding of each active infection; infections that clear today are taken out of
+/// `infections` and returned in their serotype's slot
+pub fn step_host(
+    host: &Host,
+    immunity: &mut HostImmunity,
+    infections: Option<&mut Infections>,
+    day: u32,
+    kinetics: &[f32],
+    params: &Params,
+) -> [Option<Infection>; N_SEROTYPES] {
+    let mut cleared = [None; N_SEROTYPES];
+    immunity.wane(day, &params.immunity_waning);
+
+    let Some(infections) = infections else {
+        return cleared;
+    };
+    let age_in_months = (day as f32 - host.birth_sim_day) * 12.0 / 365.0;
+    for (s, slot) in infections.0.iter_mut().enumerate() {
+        let Some(inf) = slot else { continue };
+        let t_since_last_exposure = day as f32 - immunity.ti_infected[s];
+        if inf.should_clear_infection(t_since_last_exposure) {
+            cleared[s] = slot.take();
         } else {
-            error!("Missing strain parameters for {:?} {:?}", self.strain, self.serotype);
-            30.0
-        };
+            inf.update_viral_shedding(immunity.prechallenge_immunity[s], age_in_months, t_since_last_exposure, kinetics, params);
+        }
     }
+    cleared
 }
 
+/// Exposes a host to a dose of one serotype; returns the new infection (with prognoses set) if
+/// it takes. Draws come from the serotype's own streams.
+pub fn challenge_host(
+    immunity: &mut Immunity,
+    params: &Params,
+    dose: f32,
+    strain: InfectionStrain,
+    serotype: InfectionSerotype,
+    key: &DrawKey,
+) -> Option<Infection> {
+    let p_transmit = immunity.calculate_infection_probability(
+        dose,
+        strain,
+        serotype,
+        params,
+    );
+
+    if key.serotype_rng(Draw::Infection, serotype.index()).random::<f32>() < p_transmit {
+        let mut new_inf = Infection::from(strain, serotype);
+        new_inf.set_prognoses_with(immunity, key.day as f32, params, key);
+        Some(new_inf)
+    } else {
+        None
+    }
+}
+
+/// Challenges an exposed host with each of the exposure's serotypes it isn't already infected
+/// with, in one pass over the serotype lanes; returns the infections that took, in their
+/// serotype's slot
+///
+/// Each serotype draws from its own streams, so its outcome is the same whichever other
+/// serotypes the exposure carries (e.g. the type 2 results of a tOPV run match an OPV2 run).
+pub fn challenge_serotypes(
+    immunity: &mut HostImmunity,
+    infections: Option<&Infections>,
+    params: &Params,
+    exposure: &Exposure,
+    key: &DrawKey,
+) -> [Option<Infection>; N_SEROTYPES] {
+    let mut infected = [None; N_SEROTYPES];
+    for serotype in InfectionSerotype::ALL {
+        let s = serotype.index();
+        if !exposure.serotypes[s] || infections.is_some_and(|infections| infections.0[s].is_some()) {
+            continue;
+        }
+        let mut lane = immunity.serotype(serotype);
+        infected[s] = challenge_host(&mut lane, params, exposure.dose, exposure.strain, serotype, key);
+        if infected[s].is_some() {
+            immunity.set_serotype(serotype, &lane);
+        }
+    }
+    infected
+}
+
+/// Advances all hosts by a day; returns the clearance events that fired
+///
+/// A host whose last infection clears keeps its (now empty) Infections component until
+/// challenge, which runs next, so that the host can be infected again on the clearance day
+/// as in the struct-of-arrays and next-event engines.
 pub fn step_state(
-    commands: &mut Commands,
-    query: &mut Query<(Entity, &Host, &mut Immunity, Option<&mut Infection>)>,
+    query: &mut Query<(Entity, &Host, &mut HostImmunity, Option<&mut Infections>)>,
     params: &Params,
     sim_time: &SimulationTime,
-) {
-    for (entity, host, mut immunity, infection) in query.iter_mut() {
-        if let Some(ti_infected) = immunity.ti_infected {
-
-            let t_since_last_exposure = sim_time.day as f32 - ti_infected;
-            immunity.calculate_waning(t_since_last_exposure, &params.immunity_waning);
-
-            if let Some(mut inf) = infection {
-                
-                if inf.should_clear_infection(t_since_last_exposure) {
-                    info!("Clearing infection for host {:?} at day {}", entity, sim_time.day);
-                    commands.entity(entity).remove::<Infection>();
-                } else {
-                    let age_in_months = (sim_time.day as f32 - host.birth_sim_day) * 12.0 / 365.0;
-                    inf.viral_shedding = immunity.calculate_viral_shedding(age_in_months, t_since_last_exposure, &params);
-                    debug!("  Updating {:?} {:?} viral shedding for host {:?}: {}", inf.strain, inf.serotype, entity, inf.viral_shedding);
-                }
-            }
+) -> Vec<HostEvent<Entity>> {
+    let kinetics = params.shedding_kinetics_table();
+    let mut events = Vec::new();
+    for (entity, host, mut immunity, mut infections) in query.iter_mut() {
+        let cleared = step_host(host, &mut immunity, infections.as_deref_mut(), sim_time.day, &kinetics, params);
+        for inf in cleared.iter().flatten() {
+            host_info!("Clearing {:?} {:?} infection for host {:?} at day {}", inf.strain, inf.serotype, entity, sim_time.day);
+            events.push(HostEvent::new(entity, sim_time.day, EventKind::Clearance, &immunity, inf));
+        }
+        for inf in infections.iter().flat_map(|infections| infections.0.iter().flatten()) {
+            host_debug!("  Updating {:?} {:?} viral shedding for host {:?}: {}", inf.strain, inf.serotype, entity, inf.viral_shedding);
         }
     }
+    events
+}
+
+/// Beta-Poisson dose response scaled by strain-specific take, shared by scalar and batched callers
+pub fn dose_response(current_immunity: f32, dose: f32, sabin_scale: f32, take_modifier: f32, p_transmit: &ProbTransmitParams) -> f32 {
+    let gamma = p_transmit.gamma;
+    let alpha = p_transmit.alpha;
+
+    (1.0 - (1.0 + dose / sabin_scale).powf(-alpha * current_immunity.powf(-gamma))) * take_modifier
+}
+
+/// Floor of detectable viral shedding concentration (CID50)
+pub fn min_viral_shedding() -> f32 {
+    10f32.powf(2.6)
+}
+
+/// Time course of shedding relative to peak, which depends only on days since infection
+pub fn shedding_kinetics(days_since_infection: f32, viral_shedding: &ViralSheddingParams) -> f32 {
+    let log_t_inf = days_since_infection.ln();
+    let eta = viral_shedding.eta;
+    let v = viral_shedding.v;
+    let epsilon = viral_shedding.epsilon;
+    let exponent = eta - (0.5 * v.powi(2)) - ((log_t_inf - eta).powi(2)) / (2.0 * (v + epsilon * log_t_inf).powi(2));
+    exponent.exp() / days_since_infection
 }
 
-fn update_log10_peak_cid50(immunity: &Immunity, age_in_months: f32, peak_cid50_params: &PeakCid50Params) -> f32 {
+pub fn log10_peak_cid50(prechallenge_immunity: f32, age_in_months: f32, peak_cid50_params: &PeakCid50Params) -> f32 {
     let k = peak_cid50_params.k;
     let smax = peak_cid50_params.smax;
     let smin = peak_cid50_params.smin;
@@ -252,40 +650,58 @@ fn update_log10_peak_cid50(immunity: &Immunity, age_in_months: f32, peak_cid50_p
     } else {
         smax
     };
-    peak_cid50_naive * (1.0 - k * (immunity.prechallenge_immunity).log2())
+    peak_cid50_naive * (1.0 - k * prechallenge_immunity.log2())
 }
 
+/// Challenges each exposed host with its `exposure` for the day (see challenge_serotypes);
+/// returns the infection events that fired
+///
+/// `row` gives each host's fixed row, which keys its draws and exposure as in the SoA and
+/// event engines, so results do not depend on the order entities were spawned or reused in.
+///
+/// New infections are written into a host's Infections component if it has one, and
+/// components left empty (by step_state's clearances) are removed afterwards.
 pub fn challenge(
     commands: &mut Commands,
-    query: &mut Query<(Entity, &Host, &mut Immunity, Option<&mut Infection>)>,
+    query: &mut Query<(Entity, &Host, &mut HostImmunity, Option<&mut Infections>)>,
     params: &Params,
+    rng: &SimRng,
     sim_time: &SimulationTime,
-    prob: f32,
-    dose: f32,
-    strain: &str,
-) {
-    let Some((strain, serotype)) = parse_infection_type(strain) else {
-        error!("Unknown strain type: {}", strain);
-        return;
-    };
-
-    for (entity, _host, mut immunity, infection) in query.iter_mut() {
-        if infection.is_none() && rand::random::<f32>() < prob {
-            info!("Challenging host {:?} at day {} with dose {} ({:?}{:?})", entity, sim_time.day, dose, strain, serotype);
-                
-            let p_transmit = immunity.calculate_infection_probability(
-                dose,
-                strain,
-                serotype,
-                params,
-            );
-
-            if rand::random::<f32>() < p_transmit {
-                info!("Spawning infection for host {:?} at day {}", entity, sim_time.day);
-                let mut new_inf = Infection::from(strain, serotype);
-                new_inf.set_prognoses(&mut immunity, sim_time.day as f32, params);
-                commands.entity(entity).insert(new_inf);
+    row: impl Fn(Entity) -> usize,
+    exposure: impl Fn(usize) -> Exposure,
+) -> Vec<HostEvent<Entity>> {
+    let mut events = Vec::new();
+    for (entity, host, mut immunity, mut infections) in query.iter_mut() {
+        let mut infected = [None; N_SEROTYPES];
+        if !host.is_vacant() {
+            let row = row(entity);
+            let exposure = exposure(row);
+            let key = rng.key(row as u64, sim_time.day);
+            if key.rng(Draw::Exposure).random::<f32>() < exposure.prob {
+                host_info!("Challenging host {:?} at day {} with dose {} ({:?} {:?})", entity, sim_time.day, exposure.dose, exposure.strain, exposure.serotypes);
+                infected = challenge_serotypes(&mut immunity, infections.as_deref(), params, &exposure, &key);
+            }
+        }
+        for inf in infected.iter().flatten() {
+            host_info!("Spawning {:?} {:?} infection for host {:?} at day {}", inf.strain, inf.serotype, entity, sim_time.day);
+            events.push(HostEvent::new(entity, sim_time.day, EventKind::Infection, &immunity, inf));
+        }
+        match infections.as_deref_mut() {
+            Some(infections) => {
+                for (slot, inf) in infections.0.iter_mut().zip(infected) {
+                    if inf.is_some() {
+                        *slot = inf;
+                    }
+                }
+                if infections.is_empty() {
+                    commands.entity(entity).remove::<Infections>();
+                }
+            }
+            None if infected.iter().any(Option::is_some) => {
+                commands.entity(entity).insert(Infections(infected));
             }
+            None => {}
         }
     }
+    events
 }
@@ -0,0 +1,146 @@
+// Sparse per-host event records for infection, clearance, death and birth
+
+use log::{info, log_enabled, Level};
+use super::checkpoint::NO_INFECTION;
+use super::disease::{infection_type_code, HostImmunity, Infection, InfectionSerotype, InfectionStrain};
+
+/// What happened to a host
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum EventKind {
+    /// A challenge took: immunity is boosted from pre to post and shedding starts
+    Infection = 0,
+    /// Shedding ended after shed_duration days, or the host died while infected
+    Clearance = 1,
+    /// The host died, leaving its slot vacant (see Demographics)
+    Death = 2,
+    /// A naive host was born into a vacant slot
+    Birth = 3,
+}
+
+impl EventKind {
+    /// Whether the event belongs to an infection, rather than to a slot's occupancy
+    pub fn has_infection(self) -> bool {
+        matches!(self, EventKind::Infection | EventKind::Clearance)
+    }
+}
+
+/// One state transition, identified by the engine's host handle (Entity or population row)
+///
+/// Between events a host's immunity to a serotype and its shedding follow deterministically
+/// from the last infection with that serotype's pre/post immunity, day and shed duration.
+/// Death and Birth events carry no infection: their strain and serotype are unused and their
+/// immunity and shed duration are NaN.
+#[derive(Debug, Clone, Copy)]
+pub struct HostEvent<H> {
+    pub host: H,
+    pub day: u32,
+    pub kind: EventKind,
+    pub strain: InfectionStrain,
+    pub serotype: InfectionSerotype,
+    pub pre_immunity: f32,
+    pub post_immunity: f32,
+    pub shed_duration: f32,
+}
+
+impl<H> HostEvent<H> {
+    /// Event for `infection`, with the host's immunity to the infection's serotype
+    pub fn new(host: H, day: u32, kind: EventKind, immunity: &HostImmunity, infection: &Infection) -> Self {
+        let s = infection.serotype.index();
+        Self {
+            host,
+            day,
+            kind,
+            strain: infection.strain,
+            serotype: infection.serotype,
+            pre_immunity: immunity.prechallenge_immunity[s],
+            post_immunity: immunity.postchallenge_peak_immunity[s],
+            shed_duration: infection.shed_duration,
+        }
+    }
+
+    /// Death or Birth event for the host in a slot
+    pub fn occupancy(host: H, day: u32, kind: EventKind) -> Self {
+        Self {
+            host,
+            day,
+            kind,
+            strain: InfectionStrain::WPV,
+            serotype: InfectionSerotype::Type1,
+            pre_immunity: f32::NAN,
+            post_immunity: f32::NAN,
+            shed_duration: f32::NAN,
+        }
+    }
+}
+
+/// Events stored as columns, in the order they fired
+///
+/// Event types are the EventKind values. Strain codes are 0 = WPV, 1 = OPV; serotype codes
+/// are 0..=2 for Type1..Type3, and NO_INFECTION (255) for Death and Birth events.
+#[derive(Debug, Clone, Default)]
+pub struct EventLog {
+    pub host: Vec<u64>,
+    pub day: Vec<u32>,
+    pub event_type: Vec<u8>,
+    pub strain: Vec<u8>,
+    pub serotype: Vec<u8>,
+    pub pre_immunity: Vec<f32>,
+    pub post_immunity: Vec<f32>,
+    pub shed_duration: Vec<f32>,
+}
+
+impl EventLog {
+    pub fn len(&self) -> usize {
+        self.host.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.host.is_empty()
+    }
+
+    /// Bytes allocated for the columns
+    pub fn memory_bytes(&self) -> usize {
+        self.host.capacity() * 8
+            + self.day.capacity() * 4
+            + (self.event_type.capacity() + self.strain.capacity() + self.serotype.capacity())
+            + (self.pre_immunity.capacity() + self.post_immunity.capacity() + self.shed_duration.capacity()) * 4
+    }
+
+    /// Appends an event under the given output row
+    pub fn push<H>(&mut self, row: u64, event: &HostEvent<H>) {
+        let (strain, serotype) = if event.kind.has_infection() {
+            let code = infection_type_code(event.strain, event.serotype);
+            (code / 3, code % 3)
+        } else {
+            (NO_INFECTION, NO_INFECTION)
+        };
+        self.host.push(row);
+        self.day.push(event.day);
+        self.event_type.push(event.kind as u8);
+        self.strain.push(strain);
+        self.serotype.push(serotype);
+        self.pre_immunity.push(event.pre_immunity);
+        self.post_immunity.push(event.post_immunity);
+        self.shed_duration.push(event.shed_duration);
+    }
+}
+
+/// Number of `events` of the given kind
+pub fn count_events<H>(events: &[HostEvent<H>], kind: EventKind) -> usize {
+    events.iter().filter(|event| event.kind == kind).count()
+}
+
+/// Logs one line of the day's infection and clearance counts and mean current immunity
+///
+/// This replaces per-host log lines in large runs. `current_immunity` is only iterated when
+/// info logging is enabled.
+pub fn log_day_totals<I: Iterator<Item = f32>>(day: u32, n_infections: usize, n_clearances: usize, current_immunity: impl FnOnce() -> I) {
+    if !log_enabled!(Level::Info) {
+        return;
+    }
+    let (sum, n) = current_immunity().fold((0.0f64, 0usize), |(sum, n), titer| (sum + titer as f64, n + 1));
+    info!(
+        "Day {}: {} infections, {} clearances, mean current immunity {:.2}",
+        day, n_infections, n_clearances, sum / n.max(1) as f64
+    );
+}
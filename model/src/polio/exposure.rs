@@ -0,0 +1,151 @@
+// Daily exposure schedules resolved ahead of the simulation loop
+
+use bevy::prelude::*;
+use super::disease::{InfectionSerotype, InfectionStrain, N_SEROTYPES};
+
+/// One day's challenge for a host group: exposure probability, dose, strain and the serotypes
+/// it carries (indexed by InfectionSerotype::index; all three for tOPV)
+///
+/// An exposed host is challenged with every serotype at once, each against its own immunity.
+#[derive(Debug, Clone, Copy, PartialEq)]
+pub struct Exposure {
+    pub prob: f32,
+    pub dose: f32,
+    pub strain: InfectionStrain,
+    pub serotypes: [bool; N_SEROTYPES],
+}
+
+impl Exposure {
+    /// Exposure from a daily incidence rate (new infections per day) and log10 dose
+    pub fn from_incidence(incidence_rate: f32, log10_dose: f32, strain: InfectionStrain, serotypes: &[InfectionSerotype]) -> Self {
+        let mut carried = [false; N_SEROTYPES];
+        for serotype in serotypes {
+            carried[serotype.index()] = true;
+        }
+        Self {
+            prob: 1.0 - (-incidence_rate).exp(),
+            dose: 10f32.powf(log10_dose),
+            strain,
+            serotypes: carried,
+        }
+    }
+
+    /// Daily hazard -ln(1 - prob) of the Bernoulli exposure draw
+    fn hazard(&self) -> f64 {
+        -(1.0 - self.prob as f64).ln()
+    }
+}
+
+/// Exposures for each day (rows) and host group (columns), with each host's group
+///
+/// Row r applies to day first_day + r (challenges start on day 1 unless the schedule is
+/// moved with `starting_on`) and the last row holds for all later days, so a single-row
+/// schedule is constant in time. Everything is resolved once, so the daily loops only index
+/// contiguous tables.
+#[derive(Resource, Debug, Clone)]
+pub struct ExposureSchedule {
+    n_rows: usize,
+    n_groups: usize,
+    first_day: u32,
+    exposures: Vec<Exposure>,
+    host_group: Vec<u32>,
+    /// Per-group hazard summed over rows, (n_rows + 1) x n_groups, for the next-event engine
+    cumulative_hazard: Vec<f64>,
+}
+
+impl ExposureSchedule {
+    /// The same exposure for every host on every day
+    pub fn constant(exposure: Exposure) -> Self {
+        Self::new(1, 1, vec![exposure], Vec::new())
+    }
+
+    /// `exposures` is (n_rows x n_groups) row-major; `host_group` gives each host's column
+    /// and may be empty when there is one group
+    pub fn new(n_rows: usize, n_groups: usize, exposures: Vec<Exposure>, host_group: Vec<u32>) -> Self {
+        assert!(n_rows > 0 && n_groups > 0, "exposure schedule needs at least one day and group");
+        assert_eq!(exposures.len(), n_rows * n_groups, "exposures must be n_rows x n_groups");
+        assert!(host_group.iter().all(|&g| (g as usize) < n_groups), "host group out of range");
+
+        let mut cumulative_hazard = vec![0.0; (n_rows + 1) * n_groups];
+        for row in 0..n_rows {
+            for group in 0..n_groups {
+                cumulative_hazard[(row + 1) * n_groups + group] =
+                    cumulative_hazard[row * n_groups + group] + exposures[row * n_groups + group].hazard();
+            }
+        }
+        Self { n_rows, n_groups, first_day: 1, exposures, host_group, cumulative_hazard }
+    }
+
+    /// The same schedule with its first row applied on `first_day` (at least 1) instead of day 1
+    pub fn starting_on(self, first_day: u32) -> Self {
+        assert!(first_day > 0, "challenges start on day 1 or later");
+        Self { first_day, ..self }
+    }
+
+    pub fn n_groups(&self) -> usize {
+        self.n_groups
+    }
+
+    /// Group of the host in output row `host`
+    pub fn group(&self, host: usize) -> usize {
+        self.host_group.get(host).map_or(0, |&g| g as usize)
+    }
+
+    /// Exposure of `group` on `day` (days before first_day take the first row)
+    pub fn exposure(&self, day: u32, group: usize) -> &Exposure {
+        let row = (day.saturating_sub(self.first_day) as usize).min(self.n_rows - 1);
+        &self.exposures[row * self.n_groups + group]
+    }
+
+    /// Exposure of the host in output row `host` on `day`
+    pub fn host_exposure(&self, day: u32, host: usize) -> &Exposure {
+        self.exposure(day, self.group(host))
+    }
+
+    /// Hazard of `group` summed over days first_day..=day
+    fn hazard_through(&self, day: u32, group: usize) -> f64 {
+        let days = (day + 1).saturating_sub(self.first_day) as usize;
+        let rows = days.min(self.n_rows);
+        let held_days = days - rows;
+        let held = if held_days > 0 { held_days as f64 * self.exposures[(self.n_rows - 1) * self.n_groups + group].hazard() } else { 0.0 };
+        self.cumulative_hazard[rows * self.n_groups + group] + held
+    }
+
+    /// First day on or after `from_day` whose daily exposure draw succeeds, given a unit
+    /// exponential `target`: the day the group's hazard accumulated since `from_day` reaches it
+    ///
+    /// This samples the same distribution as drawing each day's Bernoulli exposure in turn.
+    /// Returns None if the hazard never reaches the target.
+    pub fn next_exposure_day(&self, group: usize, from_day: u32, target: f64) -> Option<u32> {
+        let from_day = from_day.max(self.first_day);
+        // A zero target would otherwise match days with no exposure at all
+        let target = target.max(f64::MIN_POSITIVE);
+        let goal = self.hazard_through(from_day - 1, group) + target;
+        // Day d is row d - first_day, whose cumulative hazard is at index d - offset
+        let offset = self.first_day - 1;
+
+        // Within the table: binary search the non-decreasing cumulative hazard
+        let first = (from_day - offset) as usize;
+        if first <= self.n_rows && self.cumulative_hazard[self.n_rows * self.n_groups + group] >= goal {
+            let (mut lo, mut hi) = (first, self.n_rows);
+            while lo < hi {
+                let mid = (lo + hi) / 2;
+                if self.cumulative_hazard[mid * self.n_groups + group] >= goal { hi = mid } else { lo = mid + 1 }
+            }
+            return Some(lo as u32 + offset);
+        }
+
+        // Past the table the last row's hazard holds
+        let last = self.exposures[(self.n_rows - 1) * self.n_groups + group].hazard();
+        if last <= 0.0 {
+            return None;
+        }
+        let (start, remaining) = if first > self.n_rows {
+            (from_day - 1, target)
+        } else {
+            (self.n_rows as u32 + offset, goal - self.cumulative_hazard[self.n_rows * self.n_groups + group])
+        };
+        let wait = if last.is_infinite() || remaining <= 0.0 { 1.0 } else { (remaining / last).ceil().max(1.0) };
+        Some((start as f64 + wait).min(u32::MAX as f64) as u32)
+    }
+}
@@ -1,5 +1,19 @@
 pub mod params;
 pub mod disease;
+pub mod population;
+pub mod events;
+pub mod exposure;
+pub mod scheduler;
+pub mod summary;
+pub mod trial;
+pub mod checkpoint;
 
 pub use params::*;
 pub use disease::*;
+pub use population::*;
+pub use events::*;
+pub use exposure::*;
+pub use scheduler::*;
+pub use summary::*;
+pub use trial::*;
+pub use checkpoint::*;
@@ -1,43 +1,53 @@
 // Params and related types for polio simulation
 
-use std::collections::HashMap;
+use std::sync::{Arc, RwLock};
 use bevy::prelude::Resource;
-use super::disease::{InfectionStrain, InfectionSerotype};
+use super::disease::{infection_type_code, InfectionStrain, InfectionSerotype, N_INFECTION_TYPES, shedding_kinetics};
 
 #[cfg(feature = "pyo3")]
 use pyo3::prelude::*;
+#[cfg(feature = "pyo3")]
+use super::disease::{infection_type_name, parse_infection_code};
 
 #[derive(Resource)]
-#[cfg_attr(feature = "pyo3", pyclass(get_all, set_all))]
+#[cfg_attr(feature = "pyo3", pyclass)]
 pub struct Params {
+    #[cfg_attr(feature = "pyo3", pyo3(get, set))]
     pub immunity_waning: ImmunityWaningParams,
+    #[cfg_attr(feature = "pyo3", pyo3(get, set))]
     pub theta_nabs: ThetaNabsParams,
+    #[cfg_attr(feature = "pyo3", pyo3(get, set))]
     pub viral_shedding: ViralSheddingParams,
+    #[cfg_attr(feature = "pyo3", pyo3(get, set))]
     pub peak_cid50: PeakCid50Params,
+    #[cfg_attr(feature = "pyo3", pyo3(get, set))]
     pub p_transmit: ProbTransmitParams,
-    // Note: HashMap is complex for PyO3, so we'll handle strain_params via methods
-    pub strain_params: HashMap<(InfectionStrain, InfectionSerotype), StrainParams>,
+    // Indexed by infection_type_code; exposed to Python as a dict keyed by "WPV1".."OPV3"
+    pub strain_params: [StrainParams; N_INFECTION_TYPES],
+    // Derived from viral_shedding on first use, not exposed to Python
+    shedding_kinetics: SheddingKineticsTable,
 }
 
 impl Default for Params {
     fn default() -> Self {
-        use InfectionStrain::*;
-        use InfectionSerotype::*;
-        let mut strain_params = HashMap::new();
         let wpv_duration = ShedDurationParams { u: 43.0, delta: 1.16, sigma: 1.69 };
         let opv_duration = ShedDurationParams { u: 30.3, delta: 1.16, sigma: 1.86 };
         let wpv_sabin_scale = 2.3;
         let wpv_take_mod = 1.0;
-        for sero in [Type1, Type2, Type3] {
-            strain_params.insert((WPV, sero), StrainParams {
-                sabin_scale_parameter: wpv_sabin_scale,
-                strain_take_modifier: wpv_take_mod,
-                shed_duration: wpv_duration.clone(),
-            });
-        }
-        strain_params.insert((OPV, Type1), StrainParams { sabin_scale_parameter: 14.0, strain_take_modifier: 0.79, shed_duration: opv_duration.clone() });
-        strain_params.insert((OPV, Type2), StrainParams { sabin_scale_parameter: 8.0, strain_take_modifier: 0.92, shed_duration: opv_duration.clone() });
-        strain_params.insert((OPV, Type3), StrainParams { sabin_scale_parameter: 18.0, strain_take_modifier: 0.81, shed_duration: opv_duration });
+        let wpv = StrainParams {
+            sabin_scale_parameter: wpv_sabin_scale,
+            strain_take_modifier: wpv_take_mod,
+            shed_duration: wpv_duration,
+        };
+        // Order follows infection_type_code: WPV1..WPV3, OPV1..OPV3
+        let strain_params = [
+            wpv.clone(),
+            wpv.clone(),
+            wpv,
+            StrainParams { sabin_scale_parameter: 14.0, strain_take_modifier: 0.79, shed_duration: opv_duration.clone() },
+            StrainParams { sabin_scale_parameter: 8.0, strain_take_modifier: 0.92, shed_duration: opv_duration.clone() },
+            StrainParams { sabin_scale_parameter: 18.0, strain_take_modifier: 0.81, shed_duration: opv_duration },
+        ];
         Self {
             immunity_waning: ImmunityWaningParams::default(),
             theta_nabs: ThetaNabsParams::default(),
@@ -45,19 +55,57 @@ impl Default for Params {
             peak_cid50: PeakCid50Params::default(),
             p_transmit: ProbTransmitParams::default(),
             strain_params,
+            shedding_kinetics: SheddingKineticsTable::default(),
         }
     }
 }
 
 impl Params {
-    pub fn sabin_scale_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> Option<f32> {
-        self.strain_params.get(&(strain, serotype)).map(|p| p.sabin_scale_parameter)
+    pub fn strain_params_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> &StrainParams {
+        &self.strain_params[infection_type_code(strain, serotype) as usize]
+    }
+    pub fn sabin_scale_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> f32 {
+        self.strain_params_for(strain, serotype).sabin_scale_parameter
+    }
+    pub fn take_modifier_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> f32 {
+        self.strain_params_for(strain, serotype).strain_take_modifier
     }
-    pub fn take_modifier_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> Option<f32> {
-        self.strain_params.get(&(strain, serotype)).map(|p| p.strain_take_modifier)
+    pub fn shed_duration_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> &ShedDurationParams {
+        &self.strain_params_for(strain, serotype).shed_duration
     }
-    pub fn shed_duration_for(&self, strain: InfectionStrain, serotype: InfectionSerotype) -> Option<&ShedDurationParams> {
-        self.strain_params.get(&(strain, serotype)).map(|p| &p.shed_duration)
+    /// Shedding kinetics indexed by whole days since infection, rebuilt if viral_shedding has changed
+    pub fn shedding_kinetics_table(&self) -> Arc<[f32]> {
+        self.shedding_kinetics.get(&self.viral_shedding)
+    }
+}
+
+/// Number of days since infection covered by the precomputed shedding kinetics table
+pub const SHEDDING_KINETICS_DAYS: usize = 366;
+
+/// Lazily built per-day shedding kinetics, keyed by the ViralSheddingParams it was built from
+#[derive(Default)]
+pub struct SheddingKineticsTable {
+    cache: RwLock<Option<(ViralSheddingParams, Arc<[f32]>)>>,
+}
+
+impl SheddingKineticsTable {
+    pub fn get(&self, viral_shedding: &ViralSheddingParams) -> Arc<[f32]> {
+        if let Some((built_from, table)) = self.cache.read().unwrap().as_ref() {
+            if built_from == viral_shedding {
+                return table.clone();
+            }
+        }
+        let table: Arc<[f32]> = (0..SHEDDING_KINETICS_DAYS)
+            .map(|day| shedding_kinetics(day as f32, viral_shedding))
+            .collect();
+        *self.cache.write().unwrap() = Some((viral_shedding.clone(), table.clone()));
+        table
+    }
+}
+
+impl Clone for SheddingKineticsTable {
+    fn clone(&self) -> Self {
+        Self::default()
     }
 }
 
@@ -102,7 +150,7 @@ impl Default for ShedDurationParams {
     }
 }
 
-#[derive(Clone)]
+#[derive(Clone, PartialEq)]
 #[cfg_attr(feature = "pyo3", pyclass(get_all, set_all))]
 pub struct ViralSheddingParams {
     pub eta: f32,
@@ -232,4 +280,149 @@ impl Params {
     pub fn new() -> Self {
         Self::default()
     }
+
+    /// The strain parameters keyed by infection type ("WPV1".."OPV3"), read and written in place
+    #[getter(strain_params)]
+    fn strain_params_map(slf: &Bound<'_, Self>) -> StrainParamsMap {
+        StrainParamsMap { params: slf.clone().unbind() }
+    }
+
+    /// Replaces the strain parameters for each infection type in the mapping; others are unchanged
+    #[setter(strain_params)]
+    fn set_strain_params_map(slf: &Bound<'_, Self>, strain_params: &Bound<'_, PyAny>) -> PyResult<()> {
+        // Read every value before borrowing slf, as they may be views of this Params
+        let mut values = Vec::new();
+        for item in strain_params.call_method0("items")?.iter()? {
+            let (name, value): (String, Bound<'_, PyAny>) = item?.extract()?;
+            values.push((strain_code(&name)?, extract_strain_params(&value)?));
+        }
+        let mut params = slf.borrow_mut();
+        for (code, value) in values {
+            params.strain_params[code] = value;
+        }
+        Ok(())
+    }
+
+    pub fn get_strain_params(&self, infection_type: &str) -> PyResult<StrainParams> {
+        Ok(self.strain_params[strain_code(infection_type)?].clone())
+    }
+
+    pub fn set_strain_params(&mut self, infection_type: &str, value: StrainParams) -> PyResult<()> {
+        self.strain_params[strain_code(infection_type)?] = value;
+        Ok(())
+    }
+}
+
+/// `Params.strain_params` as seen from Python: a mapping from infection type ("WPV1".."OPV3")
+/// to views that read and write the Params it came from, so
+/// `params.strain_params["OPV2"].strain_take_modifier = 0.0` changes `params`
+#[cfg(feature = "pyo3")]
+#[pyclass(mapping)]
+pub struct StrainParamsMap {
+    params: Py<Params>,
+}
+
+#[cfg(feature = "pyo3")]
+#[pymethods]
+impl StrainParamsMap {
+    fn __getitem__(&self, py: Python<'_>, infection_type: &str) -> PyResult<StrainParamsView> {
+        Ok(StrainParamsView { params: self.params.clone_ref(py), code: strain_code(infection_type)? })
+    }
+
+    fn __setitem__(&self, py: Python<'_>, infection_type: &str, value: &Bound<'_, PyAny>) -> PyResult<()> {
+        let code = strain_code(infection_type)?;
+        let value = extract_strain_params(value)?;
+        self.params.borrow_mut(py).strain_params[code] = value;
+        Ok(())
+    }
+
+    fn __len__(&self) -> usize {
+        N_INFECTION_TYPES
+    }
+
+    fn __contains__(&self, infection_type: &str) -> bool {
+        parse_infection_code(infection_type).is_some()
+    }
+
+    fn __iter__<'py>(&self, py: Python<'py>) -> PyResult<Bound<'py, pyo3::types::PyIterator>> {
+        pyo3::types::PyList::new_bound(py, self.keys()).into_any().iter()
+    }
+
+    fn keys(&self) -> Vec<String> {
+        (0..N_INFECTION_TYPES as u8).filter_map(infection_type_name).collect()
+    }
+
+    fn values(&self, py: Python<'_>) -> Vec<StrainParamsView> {
+        (0..N_INFECTION_TYPES)
+            .map(|code| StrainParamsView { params: self.params.clone_ref(py), code })
+            .collect()
+    }
+
+    fn items(&self, py: Python<'_>) -> Vec<(String, StrainParamsView)> {
+        self.keys().into_iter().zip(self.values(py)).collect()
+    }
+}
+
+/// One infection type's entry in `Params.strain_params`; attribute reads and writes go to the Params
+#[cfg(feature = "pyo3")]
+#[pyclass]
+pub struct StrainParamsView {
+    params: Py<Params>,
+    code: usize,
+}
+
+#[cfg(feature = "pyo3")]
+#[pymethods]
+impl StrainParamsView {
+    /// A detached StrainParams with the current values
+    fn copy(&self, py: Python<'_>) -> StrainParams {
+        self.params.borrow(py).strain_params[self.code].clone()
+    }
+
+    #[getter]
+    fn sabin_scale_parameter(&self, py: Python<'_>) -> f32 {
+        self.params.borrow(py).strain_params[self.code].sabin_scale_parameter
+    }
+
+    #[setter]
+    fn set_sabin_scale_parameter(&self, py: Python<'_>, value: f32) {
+        self.params.borrow_mut(py).strain_params[self.code].sabin_scale_parameter = value;
+    }
+
+    #[getter]
+    fn strain_take_modifier(&self, py: Python<'_>) -> f32 {
+        self.params.borrow(py).strain_params[self.code].strain_take_modifier
+    }
+
+    #[setter]
+    fn set_strain_take_modifier(&self, py: Python<'_>, value: f32) {
+        self.params.borrow_mut(py).strain_params[self.code].strain_take_modifier = value;
+    }
+
+    /// A copy, like the other nested parameter structs; assign a whole ShedDurationParams to change it
+    #[getter]
+    fn shed_duration(&self, py: Python<'_>) -> ShedDurationParams {
+        self.params.borrow(py).strain_params[self.code].shed_duration.clone()
+    }
+
+    #[setter]
+    fn set_shed_duration(&self, py: Python<'_>, value: ShedDurationParams) {
+        self.params.borrow_mut(py).strain_params[self.code].shed_duration = value;
+    }
+}
+
+/// A StrainParams, or the current values of a StrainParamsView
+#[cfg(feature = "pyo3")]
+fn extract_strain_params(value: &Bound<'_, PyAny>) -> PyResult<StrainParams> {
+    match value.downcast::<StrainParamsView>() {
+        Ok(view) => Ok(view.borrow().copy(value.py())),
+        Err(_) => value.extract(),
+    }
+}
+
+#[cfg(feature = "pyo3")]
+fn strain_code(infection_type: &str) -> PyResult<usize> {
+    parse_infection_code(infection_type)
+        .map(|code| code as usize)
+        .ok_or_else(|| pyo3::exceptions::PyKeyError::new_err(format!("Unknown strain type: {}", infection_type)))
 }
\ No newline at end of file
@@ -0,0 +1,158 @@
+// Struct-of-arrays population engine for headless runs without the Bevy ECS
+
+use rand::Rng;
+use rayon::prelude::*;
+use crate::core::{SimulationTime, Host};
+use crate::demographics::{Demographics, VacantSlots};
+use crate::rng::{Draw, DrawKey};
+use super::disease::*;
+use super::params::Params;
+use super::summary::HostSample;
+use super::events::{EventKind, HostEvent};
+use super::exposure::ExposureSchedule;
+
+/// Host, HostImmunity and Infections components in one Vec per component, indexed by host row.
+///
+/// Each Vec holds whole structs, not a column per field: a host's HostImmunity lanes sit
+/// together, and every host keeps an Infections value (60 bytes, one slot per serotype) even
+/// while uninfected. There is no separate infected mask; step_state and challenge check the
+/// slots themselves. Infection and clearance fill and empty a slot in place instead of moving
+/// the host between storage tables.
+/// Hosts are stepped in parallel; random draws come from streams keyed by (seed, row, day),
+/// so results are identical for any number of threads.
+pub struct Population {
+    pub hosts: Vec<Host>,
+    pub immunity: Vec<HostImmunity>,
+    pub infections: Vec<Infections>,
+    pub seed: u64,
+}
+
+impl Population {
+    pub fn new(n_hosts: usize, seed: u64) -> Self {
+        Self {
+            hosts: (0..n_hosts).map(|_| Host { birth_sim_day: 0.0 }).collect(),
+            immunity: vec![HostImmunity::default(); n_hosts],
+            infections: vec![Infections::default(); n_hosts],
+            seed,
+        }
+    }
+
+    pub fn len(&self) -> usize {
+        self.hosts.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.hosts.is_empty()
+    }
+
+    /// Each living host's row and state on the given day, for the outputs
+    pub fn samples(&self, day: u32) -> impl Iterator<Item = (usize, HostSample)> + '_ {
+        self.hosts.iter().zip(&self.immunity).zip(&self.infections).enumerate()
+            .filter(|(_, ((host, _), _))| !host.is_vacant())
+            .map(move |(row, ((host, immunity), infections))| (row, HostSample {
+                age_days: day as f32 - host.birth_sim_day,
+                current_immunity: immunity.current_immunity,
+                viral_shedding: infections.viral_shedding(),
+            }))
+    }
+
+    /// Advances all hosts by a day; returns the clearance events that fired, in row order
+    pub fn step_state(&mut self, params: &Params, sim_time: &SimulationTime) -> Vec<HostEvent<usize>> {
+        let kinetics = params.shedding_kinetics_table();
+        let day = sim_time.day;
+
+        self.hosts.par_iter()
+            .zip(self.immunity.par_iter_mut())
+            .zip(self.infections.par_iter_mut())
+            .enumerate()
+            .flat_map_iter(|(row, ((host, immunity), infections))| {
+                let cleared = step_host(host, immunity, Some(infections), day, &kinetics, params);
+                for inf in infections.0.iter().flatten() {
+                    host_debug!("  Updating {:?} {:?} viral shedding for host {}: {}", inf.strain, inf.serotype, row, inf.viral_shedding);
+                }
+                cleared.map(|inf| inf.map(|inf| {
+                    host_info!("Clearing {:?} {:?} infection for host {} at day {}", inf.strain, inf.serotype, row, day);
+                    HostEvent::new(row, day, EventKind::Clearance, immunity, &inf)
+                })).into_iter().flatten()
+            })
+            .collect()
+    }
+
+    /// Challenges exposed hosts with their scheduled exposure (see challenge_serotypes); returns
+    /// the infection events that fired, in row order
+    ///
+    /// Runs after the day's step_state, so hosts that cleared a serotype that day can be
+    /// infected with it again, as in the Bevy and next-event engines.
+    pub fn challenge(
+        &mut self,
+        params: &Params,
+        sim_time: &SimulationTime,
+        schedule: &ExposureSchedule,
+    ) -> Vec<HostEvent<usize>> {
+        let day = sim_time.day;
+        let seed = self.seed;
+
+        self.hosts.par_iter()
+            .zip(self.immunity.par_iter_mut())
+            .zip(self.infections.par_iter_mut())
+            .enumerate()
+            .flat_map_iter(|(row, ((host, immunity), infections))| {
+                let mut events = [None; N_SEROTYPES];
+                if host.is_vacant() {
+                    return events.into_iter().flatten();
+                }
+                let exposure = schedule.host_exposure(day, row);
+                let key = DrawKey::new(seed, row as u64, day);
+                if key.rng(Draw::Exposure).random::<f32>() < exposure.prob {
+                    host_info!("Challenging host {} at day {} with dose {} ({:?} {:?})", row, day, exposure.dose, exposure.strain, exposure.serotypes);
+                    let infected = challenge_serotypes(immunity, Some(infections), params, exposure, &key);
+                    for (s, inf) in infected.into_iter().enumerate() {
+                        let Some(inf) = inf else { continue };
+                        host_info!("Spawning {:?} {:?} infection for host {} at day {}", inf.strain, inf.serotype, row, day);
+                        events[s] = Some(HostEvent::new(row, day, EventKind::Infection, immunity, &inf));
+                        infections.0[s] = Some(inf);
+                    }
+                }
+                events.into_iter().flatten()
+            })
+            .collect()
+    }
+
+    /// Deaths vacate slots, then the day's births refill vacant slots lowest row first;
+    /// returns the events in that order: for each death (by row) a Clearance for every active
+    /// infection and then the Death, and a Birth for each birth that found a slot
+    pub fn step_demographics(&mut self, demographics: &Demographics, vacant: &mut VacantSlots, day: u32) -> Vec<HostEvent<usize>> {
+        let seed = self.seed;
+        let fates: Vec<(bool, bool)> = self.hosts.par_iter()
+            .enumerate()
+            .map(|(row, host)| demographics.fate(&DrawKey::new(seed, row as u64, day), host))
+            .collect();
+
+        let mut events = Vec::new();
+        for (row, &(dies, _)) in fates.iter().enumerate() {
+            if dies {
+                host_info!("Host {} died at day {}", row, day);
+                for inf in self.infections[row].0.iter().flatten() {
+                    events.push(HostEvent::new(row, day, EventKind::Clearance, &self.immunity[row], inf));
+                }
+                events.push(HostEvent::occupancy(row, day, EventKind::Death));
+                self.reset_host(row, Host::VACANT);
+                vacant.push(row);
+            }
+        }
+        for _ in fates.iter().filter(|(_, gives_birth)| *gives_birth) {
+            let Some(row) = vacant.pop() else { break };
+            host_info!("Host {} born at day {}", row, day);
+            self.reset_host(row, day as f32);
+            events.push(HostEvent::occupancy(row, day, EventKind::Birth));
+        }
+        events
+    }
+
+    /// Empties a slot, or fills it with a naive host born on `birth_sim_day`
+    fn reset_host(&mut self, row: usize, birth_sim_day: f32) {
+        self.hosts[row] = Host { birth_sim_day };
+        self.immunity[row] = HostImmunity::default();
+        self.infections[row] = Infections::default();
+    }
+}
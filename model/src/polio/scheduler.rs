@@ -0,0 +1,147 @@
+// Next-event engine: hosts are only touched when they are challenged, clear, or are observed
+
+use std::cmp::Reverse;
+use std::collections::BinaryHeap;
+
+use rand::Rng;
+use crate::core::SimulationTime;
+use crate::rng::{Draw, DrawKey};
+use super::disease::*;
+use super::events::{EventKind, HostEvent};
+use super::exposure::ExposureSchedule;
+use super::params::Params;
+use super::population::Population;
+
+/// Scheduled event kinds, in the order they are handled within a day: clearance of an
+/// infection (the kind is its serotype's index) before challenge, as step_state runs before
+/// challenge in the daily engines
+const CHALLENGE: u8 = N_SEROTYPES as u8;
+
+/// Population advanced by a priority queue of per-host clearance and challenge days
+///
+/// Instead of a daily Bernoulli exposure draw, each host gets its next challenge
+/// day from the distribution those draws imply (geometric when the schedule is constant in
+/// time), and each serotype's clearance is scheduled at
+/// infection from the shed duration. Waning is analytic in days since infection, so it is
+/// only evaluated when a host is challenged or the population is observed.
+pub struct EventPopulation {
+    pub population: Population,
+    schedule: ExposureSchedule,
+    queue: BinaryHeap<Reverse<(u32, u8, usize)>>,
+}
+
+impl EventPopulation {
+    /// Hosts start susceptible with challenges from day 1 following `schedule`
+    pub fn new(n_hosts: usize, seed: u64, schedule: ExposureSchedule) -> Self {
+        Self::from_population(Population::new(n_hosts, seed), schedule, 0)
+    }
+
+    /// Continues `population` from its state on `day`: active infections clear on schedule
+    /// and hosts are challenged from day + 1
+    pub fn from_population(population: Population, schedule: ExposureSchedule, day: u32) -> Self {
+        let n_hosts = population.len();
+        let mut events = Self { population, schedule, queue: BinaryHeap::new() };
+        for row in 0..n_hosts {
+            // Vacant slots (see Demographics) are never challenged
+            if events.population.hosts[row].is_vacant() {
+                continue;
+            }
+            let immunity = &events.population.immunity[row];
+            for (s, inf) in events.population.infections[row].0.iter().enumerate() {
+                let Some(inf) = inf else { continue };
+                // First day with days since infection > shed_duration, as in advance_to
+                let clear_day = (immunity.ti_infected[s] + inf.shed_duration.max(0.0)).floor() as u32 + 1;
+                events.queue.push(Reverse((clear_day.max(day + 1), s as u8, row)));
+            }
+            events.schedule_challenge(row, day + 1);
+        }
+        events
+    }
+
+    pub fn len(&self) -> usize {
+        self.population.len()
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.population.is_empty()
+    }
+
+    /// Day of the next scheduled event, if any
+    pub fn next_event_day(&self) -> Option<u32> {
+        self.queue.peek().map(|Reverse((day, _, _))| *day)
+    }
+
+    /// Queues the host's first exposure on or after `from_day`
+    fn schedule_challenge(&mut self, row: usize, from_day: u32) {
+        let key = DrawKey::new(self.population.seed, row as u64, from_day);
+        let u = 1.0 - key.rng(Draw::Exposure).random::<f64>();
+        if let Some(day) = self.schedule.next_exposure_day(self.schedule.group(row), from_day, -u.ln()) {
+            self.queue.push(Reverse((day, CHALLENGE, row)));
+        }
+    }
+
+    /// Handles every event up to and including `day`; returns them in the order they fired
+    pub fn advance_to(&mut self, day: u32, params: &Params) -> Vec<HostEvent<usize>> {
+        let mut fired = Vec::new();
+        while let Some(&Reverse((event_day, kind, row))) = self.queue.peek() {
+            if event_day > day {
+                break;
+            }
+            self.queue.pop();
+            let population = &mut self.population;
+            let immunity = &mut population.immunity[row];
+            let infections = &mut population.infections[row];
+            immunity.wane(event_day, &params.immunity_waning);
+
+            if kind < CHALLENGE {
+                if let Some(inf) = infections.0[kind as usize].take() {
+                    host_info!("Clearing {:?} {:?} infection for host {} at day {}", inf.strain, inf.serotype, row, event_day);
+                    fired.push(HostEvent::new(row, event_day, EventKind::Clearance, immunity, &inf));
+                }
+                continue;
+            }
+
+            // A host already infected with a serotype isn't challenged with it, as in the daily engines
+            let exposure = self.schedule.host_exposure(event_day, row);
+            host_info!("Challenging host {} at day {} with dose {} ({:?} {:?})", row, event_day, exposure.dose, exposure.strain, exposure.serotypes);
+            let key = DrawKey::new(population.seed, row as u64, event_day);
+            let infected = challenge_serotypes(immunity, Some(infections), params, exposure, &key);
+            for (s, inf) in infected.into_iter().enumerate() {
+                let Some(inf) = inf else { continue };
+                host_info!("Spawning {:?} {:?} infection for host {} at day {}", inf.strain, inf.serotype, row, event_day);
+                // First day with days since infection > shed_duration, as in step_host
+                let clear_day = event_day + inf.shed_duration.max(0.0).floor() as u32 + 1;
+                fired.push(HostEvent::new(row, event_day, EventKind::Infection, immunity, &inf));
+                infections.0[s] = Some(inf);
+                self.queue.push(Reverse((clear_day, s as u8, row)));
+            }
+            self.schedule_challenge(row, event_day + 1);
+        }
+        fired
+    }
+
+    /// Brings every host's immunity and shedding up to the current day, e.g. before reading
+    /// `population.samples`
+    pub fn observe(&mut self, params: &Params, sim_time: &SimulationTime) {
+        let kinetics = params.shedding_kinetics_table();
+        let day = sim_time.day;
+        let population = &mut self.population;
+
+        let columns = population.hosts.iter()
+            .zip(population.immunity.iter_mut())
+            .zip(population.infections.iter_mut());
+        for ((host, immunity), infections) in columns {
+            immunity.wane(day, &params.immunity_waning);
+            for (s, inf) in infections.0.iter_mut().enumerate() {
+                let Some(inf) = inf else { continue };
+                let t0 = immunity.ti_infected[s];
+                let t = day as f32 - t0;
+                if t >= 1.0 {
+                    // Peak CID50 uses the age on the first day after infection, as in the daily engines
+                    let age_in_months = (t0 + 1.0 - host.birth_sim_day) * 12.0 / 365.0;
+                    inf.update_viral_shedding(immunity.prechallenge_immunity[s], age_in_months, t, &kinetics, params);
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,168 @@
+// Online daily summaries of the host population, computed as the simulation runs
+
+use super::disease::N_SEROTYPES;
+
+/// Age band edges in years for shedding totals; the last band is open-ended
+pub const SHEDDING_AGE_BANDS_YEARS: [f32; 4] = [0.0, 1.0, 5.0, 15.0];
+
+/// Quantiles reported for log2 immunity (linear interpolation, as numpy.quantile)
+pub const LOG2_IMMUNITY_QUANTILES: [f64; 5] = [0.025, 0.25, 0.5, 0.75, 0.975];
+
+/// A per-day statistic over all hosts
+#[derive(Debug, Clone, Copy, PartialEq, Eq)]
+pub enum Reducer {
+    /// Fraction of hosts with an active infection of any serotype
+    Prevalence,
+    /// Mean of log2 current immunity (each host's highest over the serotypes)
+    Log2ImmunityMean,
+    /// LOG2_IMMUNITY_QUANTILES of log2 current immunity (as for Log2ImmunityMean)
+    Log2ImmunityQuantiles,
+    /// Total viral shedding of all serotypes in each SHEDDING_AGE_BANDS_YEARS band
+    SheddingByAge,
+}
+
+impl Reducer {
+    pub const ALL: [Reducer; 4] = [
+        Reducer::Prevalence,
+        Reducer::Log2ImmunityMean,
+        Reducer::Log2ImmunityQuantiles,
+        Reducer::SheddingByAge,
+    ];
+
+    pub fn name(&self) -> &'static str {
+        match self {
+            Reducer::Prevalence => "prevalence",
+            Reducer::Log2ImmunityMean => "log2_immunity_mean",
+            Reducer::Log2ImmunityQuantiles => "log2_immunity_quantiles",
+            Reducer::SheddingByAge => "shedding_by_age",
+        }
+    }
+
+    pub fn parse(name: &str) -> Option<Self> {
+        Reducer::ALL.into_iter().find(|r| r.name() == name)
+    }
+
+    /// Number of values recorded per day
+    pub fn width(&self) -> usize {
+        match self {
+            Reducer::Prevalence | Reducer::Log2ImmunityMean => 1,
+            Reducer::Log2ImmunityQuantiles => LOG2_IMMUNITY_QUANTILES.len(),
+            Reducer::SheddingByAge => SHEDDING_AGE_BANDS_YEARS.len(),
+        }
+    }
+}
+
+/// The state of one host on the day being summarized, by serotype
+#[derive(Debug, Clone, Copy)]
+pub struct HostSample {
+    pub age_days: f32,
+    pub current_immunity: [f32; N_SEROTYPES],
+    /// Shedding of each serotype, None where not infected
+    pub viral_shedding: [Option<f32>; N_SEROTYPES],
+}
+
+impl HostSample {
+    /// Highest current immunity over the serotypes; in a run challenging a single serotype,
+    /// that serotype's (the others stay at the naive 1.0)
+    pub fn immunity(&self) -> f32 {
+        self.current_immunity.iter().copied().fold(f32::MIN, f32::max)
+    }
+
+    /// Total viral shedding over the serotypes, None if not infected with any
+    pub fn shedding(&self) -> Option<f32> {
+        self.viral_shedding.iter().flatten().copied().reduce(|a, b| a + b)
+    }
+}
+
+/// Selected reducers, each stored as a (n_days x width) row-major table
+///
+/// Memory grows with the number of days only; the per-host scratch buffer used for
+/// quantiles is reused from day to day.
+pub struct DailySummary {
+    reducers: Vec<Reducer>,
+    n_days: usize,
+    values: Vec<Vec<f64>>,
+    log2_immunity: Vec<f64>,
+}
+
+impl DailySummary {
+    pub fn new(reducers: Vec<Reducer>, n_days: usize) -> Self {
+        let values = reducers.iter().map(|r| vec![0.0; n_days * r.width()]).collect();
+        Self { reducers, n_days, values, log2_immunity: Vec::new() }
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.reducers.is_empty()
+    }
+
+    pub fn n_days(&self) -> usize {
+        self.n_days
+    }
+
+    /// Bytes allocated for the reducer tables and quantile scratch buffer
+    pub fn memory_bytes(&self) -> usize {
+        let values: usize = self.values.iter().map(|v| v.capacity()).sum();
+        (values + self.log2_immunity.capacity()) * std::mem::size_of::<f64>()
+    }
+
+    pub fn record<I: IntoIterator<Item = HostSample>>(&mut self, day: usize, hosts: I) {
+        if self.is_empty() {
+            return;
+        }
+        let keep_log2_immunity = self.reducers.contains(&Reducer::Log2ImmunityQuantiles);
+        self.log2_immunity.clear();
+
+        let mut n_hosts = 0usize;
+        let mut n_infected = 0usize;
+        let mut log2_immunity_sum = 0.0f64;
+        let mut shedding = [0.0f64; SHEDDING_AGE_BANDS_YEARS.len()];
+
+        for host in hosts {
+            n_hosts += 1;
+            let log2_immunity = (host.immunity() as f64).log2();
+            log2_immunity_sum += log2_immunity;
+            if keep_log2_immunity {
+                self.log2_immunity.push(log2_immunity);
+            }
+            if let Some(viral_shedding) = host.shedding() {
+                n_infected += 1;
+                let age_years = host.age_days / 365.0;
+                let band = SHEDDING_AGE_BANDS_YEARS.iter().rposition(|&edge| age_years >= edge).unwrap_or(0);
+                shedding[band] += viral_shedding as f64;
+            }
+        }
+
+        let n = n_hosts.max(1) as f64;
+        for (reducer, values) in self.reducers.iter().zip(self.values.iter_mut()) {
+            let width = reducer.width();
+            let row = &mut values[day * width..(day + 1) * width];
+            match reducer {
+                Reducer::Prevalence => row[0] = n_infected as f64 / n,
+                Reducer::Log2ImmunityMean => row[0] = log2_immunity_sum / n,
+                Reducer::Log2ImmunityQuantiles => {
+                    self.log2_immunity.sort_unstable_by(|a, b| a.total_cmp(b));
+                    for (cell, &q) in row.iter_mut().zip(LOG2_IMMUNITY_QUANTILES.iter()) {
+                        *cell = quantile(&self.log2_immunity, q);
+                    }
+                }
+                Reducer::SheddingByAge => row.copy_from_slice(&shedding),
+            }
+        }
+    }
+
+    /// Each reducer with its (n_days x width) row-major values
+    pub fn into_tables(self) -> Vec<(Reducer, Vec<f64>)> {
+        self.reducers.into_iter().zip(self.values).collect()
+    }
+}
+
+/// Linearly interpolated quantile of sorted values
+fn quantile(sorted: &[f64], q: f64) -> f64 {
+    if sorted.is_empty() {
+        return f64::NAN;
+    }
+    let pos = q * (sorted.len() - 1) as f64;
+    let lo = pos.floor() as usize;
+    let hi = pos.ceil() as usize;
+    sorted[lo] + (sorted[hi] - sorted[lo]) * (pos - lo as f64)
+}
@@ -0,0 +1,74 @@
+// Challenge-study emulation: independent subjects through repeated challenge, shed and wane cycles
+
+use crate::rng::{Draw, DrawKey};
+use super::disease::*;
+use super::params::Params;
+
+/// Challenge days and doses for a trial arm of subjects of the same starting age
+///
+/// A challenge is given on its day whether or not the subject is still shedding, as in the
+/// challenge-study notebooks; a take replaces any ongoing infection.
+#[derive(Debug, Clone)]
+pub struct ChallengeSchedule {
+    /// Strictly increasing challenge days
+    pub days: Vec<u32>,
+    /// Dose given on each challenge day
+    pub doses: Vec<f32>,
+    pub strain: InfectionStrain,
+    pub serotype: InfectionSerotype,
+    /// Subject age on day 0
+    pub age_days: f32,
+}
+
+/// One subject's daily output columns, each n_days long
+pub struct SubjectTrajectory<'a> {
+    /// Probability that the most recent (or, before any, the first) dose would infect
+    pub p_infection: &'a mut [f64],
+    pub immunity: &'a mut [f64],
+    /// Viral shedding, zero when not infected
+    pub shedding: &'a mut [f64],
+    /// A theta NAb draw at the subject's last pre-challenge immunity (the realized boost on infection days)
+    pub theta: &'a mut [f64],
+}
+
+impl ChallengeSchedule {
+    /// Runs one subject from naive immunity; draws are keyed by (seed, subject, day)
+    ///
+    /// Each day wanes immunity, applies that day's challenge, then records shedding (clearing
+    /// the infection once past its shed duration), infection probability, immunity and theta.
+    pub fn simulate_subject(&self, seed: u64, subject: u64, params: &Params, kinetics: &[f32], out: SubjectTrajectory<'_>) {
+        let mut immunity = Immunity::default();
+        let mut infection: Option<Infection> = None;
+        let mut challenges = self.days.iter().zip(&self.doses).peekable();
+        let mut dose = self.doses.first().copied().unwrap_or(0.0);
+
+        for day in 0..out.immunity.len() {
+            if let Some(t0) = immunity.ti_infected {
+                immunity.calculate_waning(day as f32 - t0, &params.immunity_waning);
+            }
+
+            let key = DrawKey::new(seed, subject, day as u32);
+            if let Some((_, &challenge_dose)) = challenges.next_if(|(&d, _)| d as usize == day) {
+                dose = challenge_dose;
+                if let Some(new_inf) = challenge_host(&mut immunity, params, dose, self.strain, self.serotype, &key) {
+                    infection = Some(new_inf);
+                }
+            }
+
+            out.shedding[day] = match (infection.as_mut(), immunity.ti_infected) {
+                (Some(inf), Some(t0)) if !inf.should_clear_infection(day as f32 - t0) => {
+                    let age_in_months = (self.age_days + day as f32) * 12.0 / 365.0;
+                    inf.update_viral_shedding(immunity.prechallenge_immunity, age_in_months, day as f32 - t0, kinetics, params);
+                    inf.viral_shedding as f64
+                }
+                _ => {
+                    infection = None;
+                    0.0
+                }
+            };
+            out.p_infection[day] = immunity.calculate_infection_probability(dose, self.strain, self.serotype, params) as f64;
+            out.immunity[day] = immunity.current_immunity as f64;
+            out.theta[day] = immunity.sample_theta_nab(&params.theta_nabs, &mut key.rng(Draw::ThetaNab)) as f64;
+        }
+    }
+}
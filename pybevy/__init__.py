@@ -1,6 +1,14 @@
 from .pybevy import (
     run_bevy_app,
+    run_ensemble,
+    Simulation,
     parse_infection_type,
+    parse_infection_code,
+    parse_challenge_code,
+    # Batch functions
+    infection_probability_batch,
+    viral_shedding_grid,
+    simulate_challenge_schedule,
     # Parameter classes
     ImmunityWaningParams,
     ThetaNabsParams,
@@ -9,6 +17,8 @@ from .pybevy import (
     PeakCid50Params,
     ProbTransmitParams,
     StrainParams,
+    StrainParamsMap,
+    StrainParamsView,
     Params,
     # State classes
     Host,
@@ -16,4 +26,7 @@ from .pybevy import (
     Infection,
     InfectionStrain,
     InfectionSerotype,
-)
\ No newline at end of file
+)
+
+from .events import reconstruct_trajectories
+from .checkpoint import load_checkpoint
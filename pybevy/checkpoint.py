@@ -0,0 +1,56 @@
+"""
+Memory-mapped reading of population checkpoints written by
+run_bevy_app(..., save_checkpoint=path) or Simulation.save_checkpoint(path).
+"""
+
+import numpy as np
+
+MAGIC = b"PBCKPT\x00\x02"
+HEADER = np.dtype([("magic", "V8"), ("day", "<u4"), ("reserved", "<u4"), ("seed", "<u8"), ("n_hosts", "<u8")])
+
+# Columns in file order: float32 columns followed by the uint8 infection type codes
+FLOAT_COLUMNS = (
+    "birth_sim_day",
+    "prechallenge_immunity",
+    "postchallenge_peak_immunity",
+    "current_immunity",
+    "ti_infected",
+    "shed_duration",
+    "viral_shedding",
+    "peak_cid50",
+)
+
+# Values per host of every column but birth_sim_day, one per serotype (type 1, 2, 3)
+N_SEROTYPES = 3
+
+# infection_type of a serotype without an active infection
+NO_INFECTION = 255
+
+
+def load_checkpoint(path):
+    """Map a checkpoint's columns without reading or parsing them.
+
+    Returns a dict with the checkpoint's "day" and "seed" and one read-only array per
+    column, each a view into the memory-mapped file: birth_sim_day has shape (n_hosts,) and
+    the other columns (n_hosts, N_SEROTYPES). ti_infected and peak_cid50 are NaN where
+    unset, and infection_type holds parse_infection_code values (NO_INFECTION for serotypes
+    without an active infection).
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if len(data) < HEADER.itemsize or bytes(data[:8]) != MAGIC:
+        raise ValueError(f"{path} is not a pybevy checkpoint (or an unsupported version)")
+    header = data[:HEADER.itemsize].view(HEADER)[0]
+    n_hosts = int(header["n_hosts"])
+    host_bytes = 4 + N_SEROTYPES * (4 * (len(FLOAT_COLUMNS) - 1) + 1)
+    if len(data) != HEADER.itemsize + n_hosts * host_bytes:
+        raise ValueError(f"{path}: file size does not match its host count")
+
+    state = {"day": int(header["day"]), "seed": int(header["seed"])}
+    offset = HEADER.itemsize
+    for name in FLOAT_COLUMNS:
+        width = 1 if name == "birth_sim_day" else N_SEROTYPES
+        column = data[offset:offset + 4 * n_hosts * width].view("<f4")
+        state[name] = column if width == 1 else column.reshape(n_hosts, width)
+        offset += 4 * n_hosts * width
+    state["infection_type"] = data[offset:offset + n_hosts * N_SEROTYPES].reshape(n_hosts, N_SEROTYPES)
+    return state
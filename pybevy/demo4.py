@@ -11,7 +11,8 @@ def run_shedding_timeseries(immunity_level, age_years, n_realizations=10, max_da
     polio_params = pb.Params()
     strain, serotype = pb.parse_infection_type("WPV2")
 
-    shedding_data = np.zeros((n_realizations, max_days))
+    prechallenge_immunity = np.zeros(n_realizations)
+    shed_durations = np.zeros(n_realizations)
 
     for realization in range(n_realizations):
 
@@ -23,25 +24,15 @@ def run_shedding_timeseries(immunity_level, age_years, n_realizations=10, max_da
         infection = pb.Infection(0.0, 0.0, strain, serotype)
         infection.set_prognoses(immunity, 0, polio_params)  # sim_day = 0
 
-        # Track shedding over time
-        for day in range(max_days):
-            age_in_months = age_years * 12.0 + day * 12.0 / 365.0  # Base age + days since infection
-            t_since_infection = day
-
-            # Calculate viral shedding
-            shedding = immunity.calculate_viral_shedding(
-                age_in_months,
-                t_since_infection,
-                polio_params
-            )
-
-            shedding_data[realization, day] = shedding
-
-            # Check if infection should clear
-            if infection.should_clear_infection(t_since_infection):
-                # Set remaining days to 0 for this realization
-                shedding_data[realization, day:] = 0.0
-                break
+        prechallenge_immunity[realization] = immunity.prechallenge_immunity
+        shed_durations[realization] = infection.shed_duration
+
+    # Track shedding over time for all realizations at once (host age at infection)
+    days = np.arange(max_days)
+    shedding_data = pb.viral_shedding_grid(prechallenge_immunity, age_years * 12.0, days, polio_params)
+
+    # Set days after infection clears to 0 for each realization
+    shedding_data[days[None, :] > shed_durations[:, None]] = 0.0
 
     return shedding_data
 
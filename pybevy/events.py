@@ -0,0 +1,95 @@
+"""
+Reconstruction of dense trajectories from the sparse event log returned by
+run_bevy_app(..., events=True).
+"""
+
+import numpy as np
+
+from .pybevy import Params, viral_shedding_grid
+
+# Event type codes in the "event_type" column
+INFECTION = 0
+CLEARANCE = 1
+DEATH = 2
+BIRTH = 3
+
+
+def reconstruct_trajectories(events, n_hosts, max_days, hosts=None, params=None, birth_sim_day=0.0,
+                             serotype=None):
+    """Rebuild the dense (host, day, channel) output for the requested hosts.
+
+    Between events immunity and shedding are deterministic: immunity holds at the
+    post-challenge peak for 30 days and then wanes, and shedding follows the peak
+    CID50 and kinetics from the day after infection until clearance. Only the hosts
+    asked for are computed, so single cohorts can be pulled from very large runs.
+
+    Each serotype follows its own events, so for runs challenging several serotypes pass
+    `serotype` (0, 1 or 2 for types 1-3) to rebuild that serotype's channels, as in the
+    by_serotype output.
+
+    With demographics, a Death event leaves the host's row vacant (0 in both channels)
+    and a Birth event starts a naive host born that day. `birth_sim_day` gives the birth
+    day of each row's host at the start, as a scalar or an array over all n_hosts rows
+    (inf for slots that start vacant), e.g. a day-0 final_state's "birth_sim_day".
+    """
+    params = Params() if params is None else params
+    hosts = np.arange(n_hosts) if hosts is None else np.asarray(hosts)
+    initial_birth = np.broadcast_to(np.asarray(birth_sim_day, dtype=np.float64), (n_hosts,))
+    rate = params.immunity_waning.rate
+    days = np.arange(max_days + 1)
+
+    out = np.zeros((len(hosts), max_days + 1, 2))
+
+    event_type = events["event_type"]
+    is_infection = event_type == INFECTION
+    is_clearance = event_type == CLEARANCE
+    is_occupancy = (event_type == DEATH) | (event_type == BIRTH)
+    selected = True if serotype is None else events["serotype"] == serotype
+    for i, host in enumerate(hosts):
+        own = events["host"] == host
+        infection_days = events["day"][own & selected & is_infection].astype(np.int64)
+        infections = np.flatnonzero(own & selected & is_infection)
+        clearances = events["day"][own & selected & is_clearance]
+
+        for start, end, birth in _occupants(events, own & is_occupancy, initial_birth[host], max_days):
+            out[i, start:end, 0] = 1.0
+            lifetime = infections[(infection_days >= start) & (infection_days < end)]
+
+            for j, event in enumerate(lifetime):
+                t0 = int(events["day"][event])
+                pre = float(events["pre_immunity"][event])
+                post = float(events["post_immunity"][event])
+                next_t0 = int(events["day"][lifetime[j + 1]]) if j + 1 < len(lifetime) else end
+
+                # Immunity from this infection until the next one
+                t = days[t0:next_t0] - t0
+                waned = post * (np.maximum(t, 30) / 30.0) ** -rate
+                out[i, t0:next_t0, 0] = np.maximum(np.where(t >= 30, waned, post), 1.0)
+
+                # Shedding from the day after infection until the clearance day (or death)
+                later = clearances[clearances > t0]
+                t_clear = min(int(later.min()), end) if len(later) else end
+                if t_clear > t0 + 1:
+                    t = days[t0 + 1:t_clear] - t0
+                    age_in_months = (t0 + 1 - birth) * 12.0 / 365.0
+                    out[i, t0 + 1:t_clear, 1] = viral_shedding_grid(pre, age_in_months, t, params)[0]
+
+    return out
+
+
+def _occupants(events, occupancy, initial_birth, max_days):
+    """(first day, day after the last, birth day) of each host living in a row."""
+    occupants = []
+    start = 0 if np.isfinite(initial_birth) else None
+    birth = initial_birth
+    for event in np.flatnonzero(occupancy):
+        day = int(events["day"][event])
+        if events["event_type"][event] == DEATH:
+            if start is not None:
+                occupants.append((start, day, birth))
+            start = None
+        else:
+            start, birth = day, float(day)
+    if start is not None:
+        occupants.append((start, max_days + 1, birth))
+    return occupants
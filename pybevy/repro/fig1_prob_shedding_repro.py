@@ -20,8 +20,8 @@ IMMUNITY_COLORS = {
     1024: '#8c564b'  # brown
 }
 
-def generate_survival_curve_for_strain_and_immunity(strain_name, immunity_level, n_realizations=2000):
-    """Generate survival curve using pybevy model with specified strain and immunity level."""
+def generate_survival_curve_for_strain_and_immunity(strain_name, immunity_level):
+    """Exact survival curve of the lognormal shed duration at the specified strain and immunity level."""
 
     # Map strain name to pybevy types
     if strain_name == "WPV":
@@ -35,29 +35,15 @@ def generate_survival_curve_for_strain_and_immunity(strain_name, immunity_level,
     polio_params = pb.Params()
     max_days = 70
 
-    # Track survival across realizations
-    survival_data = np.zeros((n_realizations, max_days))
+    # Immunity state with specified level (challenge uses current immunity as pre-challenge)
+    immunity = pb.Immunity()
+    immunity.current_immunity = immunity_level
 
-    for realization in range(n_realizations):
-        # Create immunity state with specified level
-        immunity = pb.Immunity()
-        immunity.current_immunity = immunity_level
-
-        # Create and initialize infection
-        infection = pb.Infection(0.0, 0.0, strain_enum, serotype_enum)
-        infection.set_prognoses(immunity, 0, polio_params)
-
-        # Track when infection clears
-        for day in range(max_days):
-            if infection.should_clear_infection(day):
-                survival_data[realization, day:] = 0
-                break
-            else:
-                survival_data[realization, day] = 1
-
-    # Calculate survival probability over time
+    # Fraction still shedding on each day since infection
     days = np.arange(max_days)
-    survival_prob = np.mean(survival_data, axis=0)
+    survival_prob = np.array(immunity.shed_duration_survival(
+        days.astype(float).tolist(), strain_enum, serotype_enum, polio_params
+    ))
 
     return days, survival_prob
 
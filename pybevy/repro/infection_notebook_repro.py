@@ -2,100 +2,38 @@
 Reproduction of first four cells from MultiscaleModeling/PopSim/Assets/Infection.ipynb
 Maps the historical ImmunoInfection class to current pybevy API structure.
 """
-from collections import defaultdict
-
 import numpy as np
 import matplotlib.pyplot as plt
 
 import pybevy as pb
 
 
-def reinfection_plots(repetitions, t_before_challenge=120, reinfection_cycles=5, initial_age=2):
+def reinfection_plots(repetitions, t_before_challenge=120, reinfection_cycles=5, initial_age=2, seed=None):
     """
     Reproduce the reinfection_plots function using current pybevy API.
-    Maps ImmunoInfection class behavior to Immunity + Infection + Params structure.
+    Maps ImmunoInfection class behavior to a challenge schedule run by simulate_challenge_schedule.
     """
-    data = defaultdict(lambda: np.zeros((repetitions, t_before_challenge * reinfection_cycles + 1)))
-
     params = pb.Params()
-    strain, serotype = pb.parse_infection_type("OPV2")  # S2 = Sabin-2 = OPV2
-
-    for rep in range(repetitions):
-        immunity = pb.Immunity()
-        immunity.current_immunity = 1.0  # Initially naive immunity
-
-        infection = None
-
-        p_shed = []
-        p_infection = []
-        current_immunity = []
-        shed_virions = []
-        theta = []
-
-        # Initial values (day 0 before any cycles)
-        p_shed.append(0)
-        p_infection.append(1)
-        current_immunity.append(0)
-        shed_virions.append(0)
-
-        # Calculate initial theta_Nab using the Rust implementation
-        theta.append(immunity.calculate_theta_nab(params.theta_nabs))
-
-        t = 0
-
-        # Main cycle loop matching original exactly
-        for cycle in range(reinfection_cycles):
-            # Attempt infection at start of each cycle
-            challenge_dose = 10**6.0
-            p_inf = immunity.calculate_infection_probability(challenge_dose, strain, serotype, params)
-
-            if np.random.random() < p_inf:
-                # Create new infection
-                infection = pb.Infection(0.0, 0.0, strain, serotype)
-                infection.set_prognoses(immunity, t, params)
-                time_since_infection = 0.0
-
-            # Inner timestep loop
-            for tstep in range(0, t_before_challenge):
-                # Check if shedding (equivalent to I.is_shed)
-                is_shedding = False
-                viral_shedding_amount = 0.0
-
-                if infection is not None:
-                    if not infection.should_clear_infection(time_since_infection):
-                        current_age = initial_age + t / 365.  # Age in years
-                        age_in_months = current_age * 12.0
-                        viral_shedding_amount = immunity.calculate_viral_shedding(
-                            age_in_months, time_since_infection, params
-                        )
-                        is_shedding = viral_shedding_amount > 10**2.6
-                    else:
-                        infection = None
-
-                # Store data
-                p_shed.append(1 if is_shedding else 0)
-                p_infection.append(immunity.calculate_infection_probability(challenge_dose, strain, serotype, params))
-                current_immunity.append(immunity.current_immunity)
-                shed_virions.append(viral_shedding_amount)
-                theta.append(immunity.calculate_theta_nab(params.theta_nabs))
-
-                t += 1
-
-                # Update immunity (equivalent to I.update(1/365.))
-                if immunity.ti_infected is not None:
-                    t_since_last_exposure = t - immunity.ti_infected
-                    immunity.calculate_waning(t_since_last_exposure, params.immunity_waning)
-
-                if infection is not None:
-                    time_since_infection += 1.0
-
-        # Store data arrays
-        data['p_shed'][rep] = p_shed
-        data['p_infection'][rep] = p_infection
-        data['current_immunity'][rep] = current_immunity
-        data['shed_virions'][rep] = shed_virions
-        data['theta'][rep] = np.log2(theta)
-
+    challenge_dose = 10**6.0
+    n_days = t_before_challenge * reinfection_cycles
+    challenge_days = list(range(0, n_days, t_before_challenge))
+
+    result = pb.simulate_challenge_schedule(
+        repetitions, challenge_days, [challenge_dose], "OPV2",  # S2 = Sabin-2 = OPV2
+        params, seed=seed, n_days=n_days, age_days=initial_age * 365.0,
+    )
+
+    # Initial values (day 0 before any cycles), then one column per simulated day
+    def with_initial(initial, values):
+        return np.column_stack([np.broadcast_to(initial, repetitions), values])
+
+    data = {
+        'p_shed': with_initial(0, (result['shedding'] > 10**2.6).astype(float)),
+        'p_infection': with_initial(1, result['p_infection']),
+        'current_immunity': with_initial(0, result['immunity']),
+        'shed_virions': with_initial(0, result['shedding']),
+        'theta': np.log2(with_initial(result['theta'][:, 0], result['theta'])),
+    }
     return data
 
 
@@ -62,7 +62,9 @@ def test_viral_shedding_comparison():
     # Calculate shedding values using all three methods
     original_shedding = []
     original_shedding_log10 = []
-    rust_shedding = []
+
+    # Rust calculation (all days in one batched call)
+    rust_shedding = pb.viral_shedding_grid(immunity.prechallenge_immunity, age_months, days.astype(float), params)[0]
 
     for day in days:
         # Original Python calculation (natural log)
@@ -73,10 +75,6 @@ def test_viral_shedding_comparison():
         orig_log10_val = original_viral_shed_log10(prechallenge_immunity, age_months, float(day))
         original_shedding_log10.append(orig_log10_val)
 
-        # Rust calculation
-        rust_val = immunity.calculate_viral_shedding(age_months, float(day), params)
-        rust_shedding.append(rust_val)
-
     # Create comparison plot
     fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(8, 8))
 
@@ -0,0 +1,163 @@
+// Vectorized NumPy entry points for polio model calculations
+
+use ndarray::{arr0, ArrayD, ArrayViewD, Zip};
+use numpy::{AllowTypeChange, PyArray2, PyArrayDyn, PyArrayLikeDyn, PyArrayMethods, PyReadonlyArrayDyn};
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::prelude::*;
+
+use model::polio::{self, InfectionSerotype, InfectionStrain, Params, N_CHALLENGE_TYPES, N_INFECTION_TYPES};
+
+/// Resulting shape of broadcasting several arrays together (NumPy rules)
+pub(crate) fn broadcast_shape(shapes: &[&[usize]]) -> PyResult<Vec<usize>> {
+    let ndim = shapes.iter().map(|s| s.len()).max().unwrap_or(0);
+    let mut out = vec![1; ndim];
+    for shape in shapes {
+        let offset = ndim - shape.len();
+        for (i, &n) in shape.iter().enumerate() {
+            let dim = &mut out[offset + i];
+            if *dim == 1 {
+                *dim = n;
+            } else if n != 1 && n != *dim {
+                return Err(PyValueError::new_err(format!(
+                    "operands could not be broadcast together with shapes {:?}", shapes
+                )));
+            }
+        }
+    }
+    Ok(out)
+}
+
+/// Infection type argument: a single type ("WPV2" or (strain, serotype)) or an array of uint8 codes
+pub(crate) enum InfectionCodes<'py> {
+    Scalar(ArrayD<u8>),
+    Array(PyReadonlyArrayDyn<'py, u8>),
+}
+
+impl<'py> InfectionCodes<'py> {
+    pub(crate) fn extract(infection_type: &Bound<'py, PyAny>) -> PyResult<Self> {
+        Self::extract_with(infection_type, polio::parse_infection_code, N_INFECTION_TYPES,
+            "infection_type must be a string like 'WPV2', a (strain, serotype) tuple or a uint8 array of infection type codes")
+    }
+
+    /// As extract, but also taking multi-serotype challenges such as "tOPV", "bOPV" or
+    /// "OPV13" and their challenge type codes (see polio::parse_challenge_code)
+    pub(crate) fn extract_challenge(challenge_type: &Bound<'py, PyAny>) -> PyResult<Self> {
+        Self::extract_with(challenge_type, polio::parse_challenge_code, N_CHALLENGE_TYPES,
+            "strain must be a string like 'WPV2' or 'tOPV', a (strain, serotype) tuple or a uint8 array of challenge type codes")
+    }
+
+    fn extract_with(value: &Bound<'py, PyAny>, parse: fn(&str) -> Option<u8>, n_codes: usize, type_error: &str) -> PyResult<Self> {
+        if let Ok(s) = value.extract::<String>() {
+            let code = parse(&s)
+                .ok_or_else(|| PyValueError::new_err(format!("Unknown strain type: {}", s)))?;
+            return Ok(InfectionCodes::Scalar(arr0(code).into_dyn()));
+        }
+        if let Ok((strain, serotype)) = value.extract::<(InfectionStrain, InfectionSerotype)>() {
+            return Ok(InfectionCodes::Scalar(arr0(polio::infection_type_code(strain, serotype)).into_dyn()));
+        }
+        let codes = value.extract::<PyReadonlyArrayDyn<'py, u8>>()
+            .map_err(|_| PyTypeError::new_err(type_error.to_string()))?;
+        if let Some(bad) = codes.as_array().iter().find(|&&c| c as usize >= n_codes) {
+            return Err(PyValueError::new_err(format!("Invalid infection type code: {}", bad)));
+        }
+        Ok(InfectionCodes::Array(codes))
+    }
+
+    pub(crate) fn as_array(&self) -> ArrayViewD<'_, u8> {
+        match self {
+            InfectionCodes::Scalar(code) => code.view(),
+            InfectionCodes::Array(codes) => codes.as_array(),
+        }
+    }
+}
+
+/// (sabin_scale, take_modifier) for each infection type code, resolved once per batch
+fn strain_take_table(params: &Params) -> [(f32, f32); N_INFECTION_TYPES] {
+    std::array::from_fn(|code| {
+        let strain_params = &params.strain_params[code];
+        (strain_params.sabin_scale_parameter, strain_params.strain_take_modifier)
+    })
+}
+
+/// Infection probability for arrays of current immunity and dose (broadcast together, GIL released)
+#[pyfunction]
+pub fn infection_probability_batch<'py>(
+    py: Python<'py>,
+    current_immunity: PyReadonlyArrayDyn<'py, f64>,
+    dose: PyReadonlyArrayDyn<'py, f64>,
+    infection_type: &Bound<'py, PyAny>,
+    params: &Params,
+) -> PyResult<Bound<'py, PyArrayDyn<f64>>> {
+    let codes = InfectionCodes::extract(infection_type)?;
+    let codes_view = codes.as_array();
+    let immunity_view = current_immunity.as_array();
+    let dose_view = dose.as_array();
+    let shape = broadcast_shape(&[immunity_view.shape(), dose_view.shape(), codes_view.shape()])?;
+
+    let table = strain_take_table(params);
+    let p_transmit = &params.p_transmit;
+
+    let out = PyArrayDyn::<f64>::zeros_bound(py, shape.as_slice(), false);
+    {
+        let mut out_rw = out.readwrite();
+        let out_view = out_rw.as_array_mut();
+        // Shapes are compatible by construction of `shape`
+        let immunity_b = immunity_view.broadcast(shape.as_slice()).unwrap();
+        let dose_b = dose_view.broadcast(shape.as_slice()).unwrap();
+        let codes_b = codes_view.broadcast(shape.as_slice()).unwrap();
+
+        py.allow_threads(|| {
+            Zip::from(out_view).and(immunity_b).and(dose_b).and(codes_b).for_each(|p, &immunity, &dose, &code| {
+                let (sabin_scale, take_modifier) = table[code as usize];
+                *p = polio::dose_response(immunity as f32, dose as f32, sabin_scale, take_modifier, p_transmit) as f64;
+            });
+        });
+    }
+    Ok(out)
+}
+
+/// Viral shedding for each host (rows) on each day since infection (columns)
+///
+/// Host inputs broadcast together to one row per host; the Rust kernel fills the
+/// returned array directly, evaluating peak CID50 once per row and kinetics once per column.
+#[pyfunction]
+pub fn viral_shedding_grid<'py>(
+    py: Python<'py>,
+    prechallenge_immunity: PyArrayLikeDyn<'py, f64, AllowTypeChange>,
+    age_in_months: PyArrayLikeDyn<'py, f64, AllowTypeChange>,
+    days_since_infection: PyArrayLikeDyn<'py, f64, AllowTypeChange>,
+    params: &Params,
+) -> PyResult<Bound<'py, PyArray2<f64>>> {
+    let immunity_view = prechallenge_immunity.as_array();
+    let age_view = age_in_months.as_array();
+    let days_view = days_since_infection.as_array();
+    let host_shape = broadcast_shape(&[immunity_view.shape(), age_view.shape()])?;
+    if host_shape.len() > 1 || days_view.ndim() > 1 {
+        return Err(PyValueError::new_err("viral_shedding_grid inputs must be scalars or 1-D arrays"));
+    }
+    let n_hosts = host_shape.first().copied().unwrap_or(1);
+    let n_days = days_view.len();
+    let immunity_b = immunity_view.broadcast(n_hosts).unwrap();
+    let age_b = age_view.broadcast(n_hosts).unwrap();
+
+    let peak_cid50 = &params.peak_cid50;
+    let viral_shedding = &params.viral_shedding;
+
+    let out = PyArray2::<f64>::zeros_bound(py, [n_hosts, n_days], false);
+    {
+        let mut out_rw = out.readwrite();
+        let mut out_view = out_rw.as_array_mut();
+
+        py.allow_threads(|| {
+            let kinetics: Vec<f32> = days_view.iter().map(|&t| polio::shedding_kinetics(t as f32, viral_shedding)).collect();
+            let min_shedding = polio::min_viral_shedding();
+            Zip::from(out_view.rows_mut()).and(&immunity_b).and(&age_b).for_each(|mut row, &immunity, &age| {
+                let peak = 10f32.powf(polio::log10_peak_cid50(immunity as f32, age as f32, peak_cid50));
+                for (cell, &k) in row.iter_mut().zip(&kinetics) {
+                    *cell = (peak * k).max(min_shedding) as f64;
+                }
+            });
+        });
+    }
+    Ok(out)
+}
@@ -0,0 +1,143 @@
+// Population state restored by run_bevy_app and Simulation from checkpoint files or NumPy
+// columns, and returned as columns
+
+use std::path::PathBuf;
+
+use bevy::prelude::*;
+use ndarray::{Array2, ArrayViewD};
+use numpy::{AllowTypeChange, IntoPyArray, PyArrayLikeDyn};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+
+use model::{Host, SimRng, SimulationTime, polio};
+
+use crate::{optional_item, OutputRow, SimOptions, SimParams};
+
+/// State read from the "checkpoint" path or the "initial_state" columns (see extract_state),
+/// which must hold `n_hosts` hosts
+///
+/// The restored run starts on the state's day: its first output day is that state, row 0 of
+/// daily exposure arrays applies to the day after it, and event days stay absolute.
+pub(crate) fn extract_initial_state(
+    data: &Bound<'_, PyDict>,
+    n_hosts: u32,
+    options: &SimOptions,
+) -> PyResult<Option<polio::PopulationState>> {
+    let path = optional_item::<PathBuf>(data, "checkpoint")?;
+    let columns = optional_item::<Bound<'_, PyDict>>(data, "initial_state")?;
+    let state = match (path, columns) {
+        (Some(_), Some(_)) => return Err(PyValueError::new_err("checkpoint and initial_state cannot be used together")),
+        (Some(path), None) => polio::PopulationState::load(&path)?,
+        (None, Some(columns)) => extract_state(&columns, n_hosts as usize, options.seed)?,
+        (None, None) => return Ok(None),
+    };
+    if state.len() != n_hosts as usize {
+        return Err(PyValueError::new_err(format!(
+            "initial state has {} hosts but n_hosts is {}", state.len(), n_hosts
+        )));
+    }
+    Ok(Some(state))
+}
+
+/// Population state from a dict of per-host column arrays, like those returned in
+/// "final_state" or by pybevy.load_checkpoint
+///
+/// Columns are copied in one pass each; missing columns take the naive values of
+/// PopulationState::new, "day" defaults to 0 and "seed" to `seed`. birth_sim_day has shape
+/// (n_hosts,) and the other columns (n_hosts, 3), one value per serotype; a (n_hosts,)
+/// column is taken to hold the same value for every serotype, except infection_type, whose
+/// codes then go to their own serotype. ti_infected and peak_cid50 are NaN where unset, and
+/// infection_type holds parse_infection_code values or NO_INFECTION (255) for serotypes
+/// without an active infection.
+pub(crate) fn extract_state(columns: &Bound<'_, PyDict>, n_hosts: usize, seed: u64) -> PyResult<polio::PopulationState> {
+    let day = optional_item::<u32>(columns, "day")?.unwrap_or(0);
+    let seed = optional_item::<u64>(columns, "seed")?.unwrap_or(seed);
+    let mut state = polio::PopulationState::new(n_hosts, day, seed);
+    for (name, column) in state.float_columns_mut() {
+        if let Some(values) = optional_item::<PyArrayLikeDyn<'_, f32, AllowTypeChange>>(columns, name)? {
+            *column = column_values(name, values.as_array(), n_hosts, polio::PopulationState::width(name))?;
+        }
+    }
+    if let Some(values) = optional_item::<PyArrayLikeDyn<'_, u8, AllowTypeChange>>(columns, "infection_type")? {
+        let values = values.as_array();
+        state.infection_type = match values.shape() {
+            [n] if *n == n_hosts => host_infection_types(values.iter().copied())?,
+            _ => column_values("infection_type", values.view(), n_hosts, polio::N_SEROTYPES)?,
+        };
+    }
+    state.validate().map_err(PyValueError::new_err)?;
+    Ok(state)
+}
+
+/// Values of a column `width` values per host, repeating each value of a (n_hosts,) column
+fn column_values<T: Copy>(name: &str, values: ArrayViewD<'_, T>, n_hosts: usize, width: usize) -> PyResult<Vec<T>> {
+    match values.shape() {
+        [n] if *n == n_hosts => Ok(values.iter().flat_map(|&v| std::iter::repeat(v).take(width)).collect()),
+        [n, w] if *n == n_hosts && *w == width => Ok(values.iter().copied().collect()),
+        shape => Err(PyValueError::new_err(format!(
+            "{} has shape {:?}, expected ({},) or ({}, {})", name, shape, n_hosts, n_hosts, width
+        ))),
+    }
+}
+
+/// Per-serotype infection_type column from one code per host, placed in its serotype's lane
+fn host_infection_types(codes: impl Iterator<Item = u8>) -> PyResult<Vec<u8>> {
+    let mut lanes = Vec::new();
+    for (row, code) in codes.enumerate() {
+        let mut host = [polio::NO_INFECTION; polio::N_SEROTYPES];
+        if code != polio::NO_INFECTION {
+            let (_, serotype) = polio::infection_type_from_code(code).ok_or_else(|| PyValueError::new_err(format!(
+                "host {} has unknown infection type code {}", row, code
+            )))?;
+            host[serotype.index()] = code;
+        }
+        lanes.extend(host);
+    }
+    Ok(lanes)
+}
+
+/// Dict of "day", "seed" and one NumPy array per column, handed over without copying;
+/// birth_sim_day has shape (n_hosts,) and the per-serotype columns (n_hosts, 3)
+pub(crate) fn state_to_py(py: Python<'_>, mut state: polio::PopulationState) -> PyResult<Bound<'_, PyDict>> {
+    let n_hosts = state.len();
+    let columns = PyDict::new_bound(py);
+    columns.set_item("day", state.day)?;
+    columns.set_item("seed", state.seed)?;
+    for (name, values) in state.float_columns_mut() {
+        let values = std::mem::take(values);
+        match polio::PopulationState::width(name) {
+            1 => columns.set_item(name, values.into_pyarray_bound(py))?,
+            width => columns.set_item(name, serotype_columns(values, n_hosts, width).into_pyarray_bound(py))?,
+        }
+    }
+    let infection_type = std::mem::take(&mut state.infection_type);
+    columns.set_item("infection_type", serotype_columns(infection_type, n_hosts, polio::N_SEROTYPES).into_pyarray_bound(py))?;
+    Ok(columns)
+}
+
+fn serotype_columns<T>(values: Vec<T>, n_hosts: usize, width: usize) -> Array2<T> {
+    Array2::from_shape_vec((n_hosts, width), values).expect("column length is n_hosts x width")
+}
+
+/// Seed for the run: a restored run keeps its initial state's seed, and so continues the
+/// draws it would have made, unless "seed" is given
+pub(crate) fn run_seed(data: &Bound<'_, PyDict>, state: Option<&polio::PopulationState>, options: &SimOptions) -> PyResult<u64> {
+    Ok(match state {
+        Some(state) if !data.contains("seed")? => state.seed,
+        _ => options.seed,
+    })
+}
+
+/// Every host's state in a Bevy World on its current day
+pub(crate) fn world_state(world: &mut World) -> polio::PopulationState {
+    let day = world.resource::<SimulationTime>().day;
+    let seed = world.resource::<SimRng>().seed;
+    let n_hosts = world.resource::<SimParams>().n_hosts as usize;
+    let mut state = polio::PopulationState::new(n_hosts, day, seed);
+    let mut query = world.query::<(&OutputRow, &Host, &polio::HostImmunity, Option<&polio::Infections>)>();
+    for (row, host, immunity, infections) in query.iter(world) {
+        state.set_host(row.0, host, immunity, infections);
+    }
+    state
+}
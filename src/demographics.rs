@@ -0,0 +1,49 @@
+// Births and deaths read from the run_bevy_app and Simulation dicts
+
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+
+use model::Demographics;
+
+use crate::optional_item;
+
+/// Demographics from the optional "demographics" dict (see model::Demographics)
+///
+/// Keys are "crude_birth_rate" (births per 1000 hosts per year, default 0),
+/// "mortality_ages" and "mortality_rates" (annual death rates in age bins starting at those
+/// ages in years; no deaths by default), and "age_pyramid_edges" and "age_pyramid_weights"
+/// for the initial ages (all 0 by default), and "initial_population", the number of slots
+/// occupied at the start (all `n_hosts` by default). Births only fill slots left vacant, so
+/// n_hosts is the population's capacity: a full population stays at its size whatever the
+/// birth rate, and can only grow into slots beyond initial_population. The initial ages and
+/// occupancy don't apply to runs restored from a checkpoint or initial_state. Rows of vacant
+/// slots are left out of the
+/// reducers and stay 0 in the dense output. With `events=True`, a death logs a Clearance for
+/// each of the host's active infections and then a Death, and a birth logs a Birth.
+pub(crate) fn extract_demographics(data: &Bound<'_, PyDict>, n_hosts: u32) -> PyResult<Option<Demographics>> {
+    let Some(spec) = optional_item::<Bound<'_, PyDict>>(data, "demographics")? else {
+        return Ok(None);
+    };
+    let crude_birth_rate = optional_item::<f32>(&spec, "crude_birth_rate")?.unwrap_or(0.0);
+    let initial_population = optional_item::<usize>(&spec, "initial_population")?;
+    if initial_population.is_some_and(|n| n > n_hosts as usize) {
+        return Err(PyValueError::new_err(format!(
+            "initial_population {} is more than n_hosts {}", initial_population.unwrap(), n_hosts
+        )));
+    }
+    Demographics::new(
+        crude_birth_rate,
+        table(&spec, "mortality_ages")?,
+        table(&spec, "mortality_rates")?,
+        table(&spec, "age_pyramid_edges")?,
+        table(&spec, "age_pyramid_weights")?,
+        initial_population,
+    )
+    .map(Some)
+    .map_err(PyValueError::new_err)
+}
+
+fn table(spec: &Bound<'_, PyDict>, key: &str) -> PyResult<Vec<f32>> {
+    Ok(optional_item::<Vec<f32>>(spec, key)?.unwrap_or_default())
+}
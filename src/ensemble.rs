@@ -0,0 +1,96 @@
+// Replicate and parameter-sweep runs of the struct-of-arrays engine on a Rust thread pool
+
+use ndarray::{ArrayViewMut3, Axis, Ix5};
+use numpy::{PyArray, PyArrayMethods};
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+
+use model::polio;
+
+use crate::exposure::extract_schedule;
+use crate::profile::RunProfile;
+use crate::{run_population, thread_pool, write_output_column, SimParams};
+
+/// Keys a scenario dict may hold: the run size and exposure schedule, as in run_bevy_app
+const SCENARIO_KEYS: [&str; 6] = ["n_hosts", "max_days", "incidence_rate", "log10_dose", "strain", "host_group"];
+
+/// Runs every scenario dict `n_replicates` times and stacks the outputs
+///
+/// Returns an array of shape (scenario, replicate, host, day, channel) with the same channels
+/// as run_bevy_app. All scenarios must share n_hosts and max_days. Replicate r uses the same
+/// seed in every scenario (common random numbers), so scenario differences are not masked by noise.
+/// Every run uses the struct-of-arrays engine from naive hosts on day 0, so scenarios may only
+/// hold "n_hosts", "max_days", "incidence_rate", "log10_dose", "strain" and "host_group";
+/// other run_bevy_app options (engine, seed, reducers, demographics, ...) raise ValueError.
+#[pyfunction]
+#[pyo3(signature = (scenarios, n_replicates, n_threads=None, seed=None))]
+pub fn run_ensemble<'py>(
+    py: Python<'py>,
+    scenarios: Vec<Bound<'py, PyDict>>,
+    n_replicates: usize,
+    n_threads: Option<usize>,
+    seed: Option<u64>,
+) -> PyResult<Bound<'py, PyArray<f64, Ix5>>> {
+    let scenarios = scenarios.iter()
+        .map(|data| {
+            check_scenario_keys(data)?;
+            let params: SimParams = data.extract()?;
+            let schedule = extract_schedule(data, &params)?;
+            Ok((params, schedule))
+        })
+        .collect::<PyResult<Vec<_>>>()?;
+    let Some((first, _)) = scenarios.first() else {
+        return Err(PyValueError::new_err("run_ensemble needs at least one scenario"));
+    };
+    let (n_hosts, max_days) = (first.n_hosts, first.max_days);
+    if scenarios.iter().any(|(s, _)| s.n_hosts != n_hosts || s.max_days != max_days) {
+        return Err(PyValueError::new_err("all scenarios must share n_hosts and max_days"));
+    }
+    if n_threads == Some(0) {
+        return Err(PyValueError::new_err("n_threads must be at least 1"));
+    }
+    let base_seed = seed.unwrap_or_else(rand::random);
+    let run_shape = (n_hosts as usize, max_days as usize + 1, 2);
+    let run_len = run_shape.0 * run_shape.1 * run_shape.2;
+
+    env_logger::try_init().ok(); // Ignore error if already initialized
+
+    let out = PyArray::<f64, Ix5>::zeros_bound(
+        py, [scenarios.len(), n_replicates, run_shape.0, run_shape.1, run_shape.2], false);
+    {
+        let mut out_rw = out.readwrite();
+        let out_slice = out_rw.as_slice_mut().expect("freshly allocated array is contiguous");
+        let pool = thread_pool(n_threads)?;
+
+        py.allow_threads(|| pool.install(|| {
+            // Zero-sized runs leave nothing to fill (chunk size must be non-zero)
+            if run_len == 0 {
+                return;
+            }
+            out_slice.par_chunks_mut(run_len).enumerate().for_each(|(run, chunk)| {
+                let (scenario, replicate) = (run / n_replicates, run % n_replicates);
+                let mut arr = ArrayViewMut3::from_shape(run_shape, chunk).unwrap();
+                let (params, schedule) = &scenarios[scenario];
+                let population = polio::Population::new(params.n_hosts as usize, base_seed.wrapping_add(replicate as u64));
+                run_population(population, 0, params.max_days, schedule, None, &mut RunProfile::default(), |day, population, _events| {
+                    write_output_column(arr.index_axis_mut(Axis(1), day as usize), population.samples(day))
+                });
+            });
+        }));
+    }
+    Ok(out)
+}
+
+fn check_scenario_keys(data: &Bound<'_, PyDict>) -> PyResult<()> {
+    for key in data.keys() {
+        let key: String = key.extract()?;
+        if !SCENARIO_KEYS.contains(&key.as_str()) {
+            return Err(PyValueError::new_err(format!(
+                "run_ensemble scenarios don't support {:?}; supported keys are {}", key, SCENARIO_KEYS.join(", ")
+            )));
+        }
+    }
+    Ok(())
+}
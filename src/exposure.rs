@@ -0,0 +1,126 @@
+// Exposure schedules read from the run_bevy_app dict and resolved before the run starts
+
+use ndarray::ArrayViewD;
+use numpy::{AllowTypeChange, PyArrayLike1, PyArrayLikeDyn};
+use pyo3::exceptions::{PyKeyError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::{PyDict, PyString};
+
+use model::polio::{self, Exposure, ExposureSchedule};
+
+use crate::batch::InfectionCodes;
+use crate::{optional_item, SimParams};
+
+/// Infection type challenged when "strain" isn't given
+const DEFAULT_STRAIN: &str = "WPV2";
+
+/// Builds the exposure schedule from "incidence_rate", "log10_dose", "strain" and "host_group"
+///
+/// Each of the first three is a scalar, an array with one value per day 1..=max_days, or a
+/// (max_days, n_groups) array with one column per host group; "strain" also takes a string
+/// like "WPV2" or a (strain, serotype) tuple, or uint8 challenge type codes. A challenge may
+/// carry several serotypes at once ("tOPV" or "OPV123", "bOPV" or "OPV13"; see
+/// polio::parse_challenge_code): an exposed host is challenged with each of them.
+/// "host_group" assigns each host a column (all hosts are in group 0 by default).
+pub(crate) fn extract_schedule(data: &Bound<'_, PyDict>, params: &SimParams) -> PyResult<ExposureSchedule> {
+    extract_daily_schedule(data, params.n_hosts, Some(params.max_days as usize))
+}
+
+/// As extract_schedule, but with daily arrays of `n_days` rows, or of any common length
+/// (the last row holding for later days) when `n_days` is None
+pub(crate) fn extract_daily_schedule(data: &Bound<'_, PyDict>, n_hosts: u32, n_days: Option<usize>) -> PyResult<ExposureSchedule> {
+    let incidence = required_array(data, "incidence_rate")?;
+    let log10_dose = required_array(data, "log10_dose")?;
+    let strain = match data.get_item("strain")? {
+        Some(strain) => InfectionCodes::extract_challenge(&strain)?,
+        None => InfectionCodes::extract_challenge(PyString::new_bound(data.py(), DEFAULT_STRAIN).as_any())?,
+    };
+    let host_group = optional_item::<PyArrayLike1<'_, i64, AllowTypeChange>>(data, "host_group")?;
+
+    let incidence_view = incidence.as_array();
+    let dose_view = log10_dose.as_array();
+    let strain_view = strain.as_array();
+    if incidence_view.iter().any(|&r| !(r >= 0.0)) {
+        return Err(PyValueError::new_err("incidence_rate must be non-negative"));
+    }
+
+    let views = [("incidence_rate", incidence_view.shape()), ("log10_dose", dose_view.shape()), ("strain", strain_view.shape())];
+    let mut per_day = None;
+    let mut n_groups = None;
+    for (name, shape) in views {
+        let expected_days = n_days.or(per_day);
+        match *shape {
+            [] => {}
+            [n] if expected_days.map_or(true, |days| days == n) => per_day = Some(n),
+            [n, g] if expected_days.map_or(true, |days| days == n) && n_groups.map_or(true, |groups| groups == g) => {
+                per_day = Some(n);
+                n_groups = Some(g);
+            }
+            _ => {
+                let days = n_days.map_or_else(|| "n_days".to_string(), |days| days.to_string());
+                return Err(PyValueError::new_err(format!(
+                    "{} has shape {:?}; expected a scalar, ({},) or ({}, n_groups) with the same n_groups throughout",
+                    name, shape, days, days
+                )));
+            }
+        }
+    }
+    if n_days.is_none() && per_day == Some(0) {
+        return Err(PyValueError::new_err("daily exposure arrays need at least one day"));
+    }
+
+    let host_group = match host_group {
+        Some(groups) => {
+            let groups = groups.as_array();
+            if groups.len() != n_hosts as usize {
+                return Err(PyValueError::new_err(format!(
+                    "host_group has {} entries for {} hosts", groups.len(), n_hosts
+                )));
+            }
+            if groups.iter().any(|&g| g < 0 || g > u32::MAX as i64) {
+                return Err(PyValueError::new_err("host_group entries must be non-negative"));
+            }
+            groups.iter().map(|&g| g as u32).collect()
+        }
+        None => Vec::new(),
+    };
+    let max_group = host_group.iter().max().map_or(0, |&g| g as usize + 1);
+    let n_groups = match n_groups {
+        Some(g) if g < max_group => {
+            return Err(PyValueError::new_err(format!("host_group refers to group {} of {}", max_group - 1, g)));
+        }
+        Some(g) => g,
+        None => max_group.max(1),
+    };
+    let n_rows = per_day.unwrap_or(1);
+    if n_rows == 0 || n_groups == 0 {
+        // Nothing is ever challenged: no days to run, or an empty group axis with no hosts in it
+        let (strain, serotype) = polio::parse_infection_type(DEFAULT_STRAIN).unwrap();
+        return Ok(ExposureSchedule::constant(Exposure::from_incidence(0.0, 0.0, strain, &[serotype])));
+    }
+
+    let mut exposures = Vec::with_capacity(n_rows * n_groups);
+    for row in 0..n_rows {
+        for group in 0..n_groups {
+            // Codes were validated by InfectionCodes::extract_challenge
+            let (strain, serotypes) = polio::challenge_type_from_code(table_value(&strain_view, row, group)).unwrap();
+            let (incidence, log10_dose) = (table_value(&incidence_view, row, group), table_value(&dose_view, row, group));
+            exposures.push(Exposure { serotypes, ..Exposure::from_incidence(incidence, log10_dose, strain, &[]) });
+        }
+    }
+    Ok(ExposureSchedule::new(n_rows, n_groups, exposures, host_group))
+}
+
+fn required_array<'py>(data: &Bound<'py, PyDict>, key: &str) -> PyResult<PyArrayLikeDyn<'py, f32, AllowTypeChange>> {
+    optional_item(data, key)?.ok_or_else(|| PyKeyError::new_err(key.to_string()))
+}
+
+/// Value for (row, group) of a checked scalar, (n_rows,) or (n_rows, n_groups) input
+fn table_value<T: Copy>(view: &ArrayViewD<'_, T>, row: usize, group: usize) -> T {
+    let index: &[usize] = match view.ndim() {
+        0 => &[],
+        1 => &[row],
+        _ => &[row, group],
+    };
+    view[index]
+}
@@ -1,119 +1,737 @@
 use pyo3::prelude::*;
-use pyo3::types::PyDict;
+use pyo3::exceptions::{PyRuntimeError, PyValueError};
+use pyo3::types::{IntoPyDict, PyDict, PyTuple};
 use bevy::prelude::*;
-use bevy::app::AppExit;
 
-use numpy::{PyArray3, IntoPyArray};
+use numpy::{IntoPyArray, PyArray3, PyArrayMethods, PyUntypedArrayMethods};
 use pyo3::Python;
-use ndarray::Array3;
+use ndarray::{Array2, Array3, ArrayViewMut2, ArrayViewMut3, Axis, Ix3, RawArrayViewMut};
+use std::path::PathBuf;
+use std::time::Instant;
 
-use model::{Host, SimulationTime, polio};
-use std::sync::{Arc, Mutex};
+use model::{Demographics, Host, SimRng, SimulationTime, VacantSlots, polio};
 use log::info;
 
+mod batch;
+mod checkpoint;
+mod demographics;
+mod ensemble;
+mod exposure;
+mod npy;
+mod profile;
+mod simulation;
+mod trial;
+
+use npy::NpyDayWriter;
+use profile::RunProfile;
+
 #[derive(Resource)]
 #[derive(FromPyObject)]
 #[pyo3(from_item_all)]  // Converts all Python dict keys to struct fields
 struct SimParams {
     n_hosts: u32,
     max_days: u32,
-    incidence_rate: f32,
-    log10_dose: f32,
 }
 
+/// Optional run settings read from the same dict as SimParams; missing keys take defaults
 #[derive(Resource, Clone)]
+struct SimOptions {
+    engine: Engine,
+    seed: u64,
+    n_threads: Option<usize>,
+    reducers: Vec<polio::Reducer>,
+    dense: bool,
+    output_path: Option<PathBuf>,
+    chunk_days: Option<usize>,
+    events: bool,
+    profile: bool,
+    save_checkpoint: Option<PathBuf>,
+    final_state: bool,
+    by_serotype: bool,
+}
+
+/// Simulation backend: the Bevy ECS schedule, the struct-of-arrays population loop, or the
+/// next-event scheduler
+#[derive(Clone, Copy, PartialEq)]
+enum Engine {
+    Bevy,
+    Soa,
+    Event,
+}
+
+impl SimOptions {
+    fn extract(data: &Bound<'_, PyDict>) -> PyResult<Self> {
+        let engine = match optional_item::<String>(data, "engine")?.as_deref() {
+            None | Some("bevy") => Engine::Bevy,
+            Some("soa") => Engine::Soa,
+            Some("event") => Engine::Event,
+            Some(other) => return Err(PyValueError::new_err(format!("Unknown engine: {}", other))),
+        };
+        let seed = optional_item::<u64>(data, "seed")?.unwrap_or_else(rand::random);
+        let n_threads = optional_item::<usize>(data, "n_threads")?;
+        if n_threads == Some(0) {
+            return Err(PyValueError::new_err("n_threads must be at least 1"));
+        }
+        let reducers = optional_item::<Vec<String>>(data, "reducers")?
+            .unwrap_or_default()
+            .iter()
+            .map(|name| polio::Reducer::parse(name)
+                .ok_or_else(|| PyValueError::new_err(format!("Unknown reducer: {}", name))))
+            .collect::<PyResult<Vec<_>>>()?;
+        let events = optional_item::<bool>(data, "events")?.unwrap_or(false);
+        // The dense (host, day, channel) cube is only built by default when no other output is requested
+        let dense = optional_item::<bool>(data, "dense")?.unwrap_or(reducers.is_empty() && !events);
+        let output_path = optional_item::<PathBuf>(data, "output_path")?;
+        let chunk_days = optional_item::<usize>(data, "chunk_days")?;
+        let profile = optional_item::<bool>(data, "profile")?.unwrap_or(false);
+        let save_checkpoint = optional_item::<PathBuf>(data, "save_checkpoint")?;
+        let final_state = optional_item::<bool>(data, "final_state")?.unwrap_or(false);
+        let by_serotype = optional_item::<bool>(data, "by_serotype")?.unwrap_or(false);
+        Ok(SimOptions {
+            engine, seed, n_threads, reducers, dense, output_path, chunk_days, events, profile, save_checkpoint, final_state,
+            by_serotype,
+        })
+    }
+
+    /// Channels of the dense and file outputs: (immunity, viral shedding) aggregated over
+    /// serotypes, or a pair per serotype with `by_serotype`
+    fn n_channels(&self) -> usize {
+        if self.by_serotype { 2 * polio::N_SEROTYPES } else { 2 }
+    }
+}
+
+fn optional_item<'py, T: FromPyObject<'py>>(data: &Bound<'py, PyDict>, key: &str) -> PyResult<Option<T>> {
+    data.get_item(key)?.map(|value| value.extract()).transpose()
+}
+
+/// Recorded output, owned by the App while it runs and moved out (not copied) afterwards
+#[derive(Resource)]
 struct OutputData {
-    arr: Arc<Mutex<Array3<f64>>>,
-}   
+    dense: Option<DenseOutput>,
+    file: Option<NpyDayWriter>,
+    summary: polio::DailySummary,
+    events: Option<polio::EventLog>,
+    /// Day recorded at index 0 of the dense, file and summary outputs (event days are absolute)
+    first_day: usize,
+    /// Population state at the end of the run, if requested
+    final_state: Option<polio::PopulationState>,
+}
+
+impl OutputData {
+    /// Whether any output needs every host's state every day (rather than only events)
+    fn observes_state(&self) -> bool {
+        self.dense.is_some() || self.file.is_some() || !self.summary.is_empty()
+    }
+
+    /// Records one day: the dense column and/or file slab if kept, and the summary reducers
+    fn record_day<I>(&mut self, day: usize, samples: impl Fn() -> I)
+    where
+        I: Iterator<Item = (usize, polio::HostSample)>,
+    {
+        let day = day - self.first_day;
+        if let Some(dense) = self.dense.as_mut() {
+            write_output_column(dense.view_mut().index_axis_move(Axis(1), day), samples());
+        }
+        if let Some(file) = self.file.as_mut() {
+            let shape = file.slab_shape();
+            file.write_day(|slab| write_output_column(ArrayViewMut2::from_shape(shape, slab).unwrap(), samples()));
+        }
+        self.summary.record(day, samples().map(|(_row, sample)| sample));
+    }
+
+    /// Bytes allocated by the run for its outputs (a caller's `out=` array is not counted)
+    fn buffer_bytes(&self) -> usize {
+        let dense = match &self.dense {
+            Some(DenseOutput::Owned(arr)) => arr.len() * std::mem::size_of::<f64>(),
+            _ => 0,
+        };
+        dense
+            + self.file.as_ref().map_or(0, |file| file.buffer_bytes())
+            + self.summary.memory_bytes()
+            + self.events.as_ref().map_or(0, |log| log.memory_bytes())
+    }
+
+    /// Appends the day's events (if the event log is kept), with hosts mapped to output rows
+    fn record_events<H>(&mut self, events: &[polio::HostEvent<H>], row: impl Fn(&H) -> usize) {
+        if let Some(log) = self.events.as_mut() {
+            for event in events {
+                log.push(row(&event.host) as u64, event);
+            }
+        }
+    }
+}
+
+/// Dense (host, day, channel) output: allocated by the run and handed to NumPy without a copy,
+/// or the caller's `out=` array written in place
+enum DenseOutput {
+    Owned(Array3<f64>),
+    Borrowed(RawArrayViewMut<f64, Ix3>),
+}
+
+// SAFETY: a Borrowed view points into a NumPy array whose PyReadwriteArray borrow is held by
+// run_bevy_app until the simulation owning this value has been dropped
+unsafe impl Send for DenseOutput {}
+unsafe impl Sync for DenseOutput {}
+
+impl DenseOutput {
+    fn view_mut(&mut self) -> ArrayViewMut3<'_, f64> {
+        match self {
+            DenseOutput::Owned(arr) => arr.view_mut(),
+            // SAFETY: see above; &mut self rules out any other live view
+            DenseOutput::Borrowed(raw) => unsafe { raw.clone().deref_into_view_mut() },
+        }
+    }
+}
+
+/// Row of the output array assigned to a host at spawn time
+#[derive(Component)]
+struct OutputRow(usize);
 
 /// This function can be called from Python
+///
+/// Returns the dense (host, day, channel) array, or, when `reducers` are requested, a dict
+/// of per-day reducer arrays (plus the dense array under "dense" if `dense=True`).
+/// If `out` is given (a float64 array or np.memmap of the dense shape), the dense output is
+/// written into it in place and `out` itself is returned. With an `output_path`, the dense
+/// output is instead streamed to a (day, host, channel) .npy file in chunks of `chunk_days`
+/// days and returned as a read-only memory-mapped (host, day, channel) view of that file.
+/// `events=True` adds an "events" dict of infection/clearance (and, with demographics,
+/// death/birth) columns (see pybevy.events).
+/// `incidence_rate`, `log10_dose` and `strain` may vary by day and host group (see
+/// exposure::extract_schedule). With `profile=True` a (result, profile) tuple is returned,
+/// where profile is a dict of wall time per stage, throughput, event counts and output bytes
+/// (see profile::RunProfile). A `checkpoint` path restores hosts, day and seed from a file
+/// written with `save_checkpoint`, and `initial_state` does the same from a dict of column
+/// arrays; the run then continues for max_days more days, with the day axis starting at the
+/// restored day (see checkpoint::extract_initial_state). `final_state=True` adds the hosts'
+/// state at the end as a "final_state" dict of columns in the same form. A `demographics`
+/// dict adds births and deaths, with ages drawn from an age pyramid at the start (see
+/// demographics::extract_demographics); it is not supported by the event engine.
+/// Hosts carry immunity and infections for each serotype: the two channels are immunity
+/// (the highest over serotypes) and viral shedding (summed over active infections), and
+/// `by_serotype=True` instead gives an (immunity, shedding) pair per serotype, in type
+/// 1, 2, 3 order.
 #[pyfunction]
-fn run_bevy_app<'py>(py: Python<'py>, data: &Bound<'py, PyDict>) -> PyResult<Bound<'py, PyArray3<f64>>> {
+#[pyo3(signature = (data, out=None))]
+fn run_bevy_app<'py>(
+    py: Python<'py>,
+    data: &Bound<'py, PyDict>,
+    out: Option<Bound<'py, PyArray3<f64>>>,
+) -> PyResult<Bound<'py, PyAny>> {
 
     let sim_params: SimParams = data.extract()?;
+    let sim_options = SimOptions::extract(data)?;
+    let initial_state = checkpoint::extract_initial_state(data, sim_params.n_hosts, &sim_options)?;
+    let start_day = initial_state.as_ref().map_or(0, |state| state.day);
+    let end_day = start_day.checked_add(sim_params.max_days)
+        .ok_or_else(|| PyValueError::new_err("max_days runs past the last representable day"))?;
+    let schedule = exposure::extract_schedule(data, &sim_params)?.starting_on(start_day + 1);
+    let seed = checkpoint::run_seed(data, initial_state.as_ref(), &sim_options)?;
+    let demographics = demographics::extract_demographics(data, sim_params.n_hosts)?;
+    if demographics.is_some() && sim_options.engine == Engine::Event {
+        return Err(PyValueError::new_err("demographics are not supported by the event engine"));
+    }
 
-    let output_data = OutputData {
-        arr: Arc::new(Mutex::new(Array3::zeros((
-            sim_params.n_hosts as usize, 
-            sim_params.max_days as usize + 1,
-            2))))
+    let n_days = sim_params.max_days as usize + 1;
+    let shape = [sim_params.n_hosts as usize, n_days, sim_options.n_channels()];
+    if out.is_some() && sim_options.output_path.is_some() {
+        return Err(PyValueError::new_err("out and output_path cannot be used together"));
+    }
+    let mut out_rw = match &out {
+        Some(out) if out.shape() != shape => {
+            return Err(PyValueError::new_err(format!(
+                "out has shape {:?}, expected {:?}", out.shape(), shape
+            )));
+        }
+        Some(out) => Some(out.try_readwrite().map_err(|e| PyValueError::new_err(format!("out is not writeable: {}", e)))?),
+        None => None,
     };
-    let output_data_clone = output_data.clone();
+    if demographics.is_some() {
+        // Vacant rows are never written
+        if let Some(out_rw) = out_rw.as_mut() {
+            out_rw.as_array_mut().fill(0.0);
+        }
+    }
+    let file = sim_options.output_path.as_deref()
+        .map(|path| NpyDayWriter::create(path, n_days, shape[0], shape[2], sim_options.chunk_days))
+        .transpose()?;
+    let dense = match out_rw.as_mut() {
+        Some(out_rw) => Some(DenseOutput::Borrowed(out_rw.as_array_mut().raw_view_mut())),
+        None => (sim_options.dense && file.is_none()).then(|| DenseOutput::Owned(Array3::zeros(shape))),
+    };
+    let summary = polio::DailySummary::new(sim_options.reducers.clone(), n_days);
+    let events = sim_options.events.then(polio::EventLog::default);
+    let mut output = OutputData { dense, file, summary, events, first_day: start_day as usize, final_state: None };
 
     env_logger::try_init().ok(); // Ignore error if already initialized
 
-    App::new()
-        .add_plugins(MinimalPlugins)
+    let host_days = sim_params.n_hosts as u64 * sim_params.max_days as u64;
+    let run_start = Instant::now();
+    let save_state = sim_options.save_checkpoint.is_some() || sim_options.final_state;
+    let (mut output, mut profile, final_state) = match sim_options.engine {
+        Engine::Soa => {
+            let pool = thread_pool(sim_options.n_threads)?;
+            let mut profile = RunProfile::default();
+            let final_state = py.allow_threads(|| pool.install(|| {
+                let population = profile.time("setup", || {
+                    initial_population(initial_state.as_ref(), sim_params.n_hosts, seed, demographics.as_ref(), start_day)
+                });
+                let population = run_population(population, start_day, end_day, &schedule, demographics.as_ref(), &mut profile, |day, population, events| {
+                    output.record_events(events, |&row| row);
+                    output.record_day(day as usize, || population.samples(day));
+                });
+                save_state.then(|| polio::PopulationState::from_population(&population, end_day))
+            }));
+            (output, profile, final_state)
+        }
+        Engine::Event => {
+            let mut profile = RunProfile::default();
+            let final_state = py.allow_threads(|| {
+                let population = profile.time("setup", || {
+                    let population = initial_population(initial_state.as_ref(), sim_params.n_hosts, seed, None, start_day);
+                    polio::EventPopulation::from_population(population, schedule, start_day)
+                });
+                let mut population = run_event_population(population, start_day, end_day, &mut output, &mut profile);
+                save_state.then(|| {
+                    // Waning is only applied when observed
+                    population.observe(&polio::Params::default(), &SimulationTime { day: end_day, ..default() });
+                    polio::PopulationState::from_population(&population.population, end_day)
+                })
+            });
+            (output, profile, final_state)
+        }
+        Engine::Bevy => {
+            let sim_params = SimParams { n_hosts: sim_params.n_hosts, max_days: end_day };
+            run_app(sim_params, schedule, seed, output, initial_state, demographics, save_state)
+        }
+    };
+    if let (Some(path), Some(state)) = (&sim_options.save_checkpoint, &final_state) {
+        profile.time("save_checkpoint", || state.save(path))?;
+    }
+    if sim_options.final_state {
+        output.final_state = final_state;
+    }
+    let run_time = run_start.elapsed();
+
+    if !sim_options.profile {
+        return output_to_py(py, output, out);
+    }
+    let peak_output_bytes = output.buffer_bytes();
+    let result = profile.time("output_to_py", || output_to_py(py, output, out))?;
+    let profile = profile.into_py_dict(py, run_time, host_days, peak_output_bytes)?;
+    Ok(PyTuple::new_bound(py, [result, profile.into_any()]).into_any())
+}
+
+/// Runs the Bevy App from `initial_state` (or new hosts on day 0) until `sim_params.max_days`
+/// and returns its output, profile and, if `save_state`, the final population state
+fn run_app(
+    sim_params: SimParams,
+    schedule: polio::ExposureSchedule,
+    seed: u64,
+    output: OutputData,
+    initial_state: Option<polio::PopulationState>,
+    demographics: Option<Demographics>,
+    save_state: bool,
+) -> (OutputData, RunProfile, Option<polio::PopulationState>) {
+    let build_start = Instant::now();
+    let start_day = initial_state.as_ref().map_or(0, |state| state.day);
+    let mut app = App::new();
+    app.add_plugins(MinimalPlugins)
         .insert_resource(sim_params)
-        .insert_resource(output_data)
-        .insert_resource(SimulationTime::default())
+        .insert_resource(output)
+        .insert_resource(schedule)
+        .insert_resource(RunProfile::default())
+        .insert_resource(SimulationTime { day: start_day, ..default() })
         .insert_resource(polio::Params::default())
-        .add_systems(Startup, setup)
-        .add_systems(Update, (step_loop, exit_system))
-        .run();
+        .insert_resource(SimRng::new(seed))
+        .add_systems(Startup, (setup, record_output).chain())
+        .add_systems(Update, (step_loop, step_demographics, record_output).chain());
+    if let Some(state) = initial_state {
+        app.insert_resource(state);
+    }
+    if let Some(demographics) = demographics {
+        app.insert_resource(demographics);
+    }
 
-    let arr = output_data_clone.arr.lock().unwrap();
-    let py_array = arr.to_owned().into_pyarray_bound(py);
-    Ok(py_array)
+    // Drive the schedule directly so the App, and the output it owns, outlive the run
+    app.finish();
+    app.cleanup();
+    app.world.resource_mut::<RunProfile>().add("app_build", build_start.elapsed());
+    let max_days = app.world.resource::<SimParams>().max_days;
+    loop {
+        app.update();
+        if app.world.resource::<SimulationTime>().day >= max_days {
+            break;
+        }
+    }
+
+    let final_state = save_state.then(|| checkpoint::world_state(&mut app.world));
+    let output = app.world.remove_resource::<OutputData>().unwrap();
+    let profile = app.world.remove_resource::<RunProfile>().unwrap();
+    (output, profile, final_state)
 }
 
-fn setup(
-    mut commands: Commands,
-    params: Res<SimParams>,
-) {
-    for _ in 0..params.n_hosts {
-        commands.spawn((
-            Host{birth_sim_day: 0.0},
-            polio::Immunity::default(),
-        ));
+/// Converts run outputs to the array or dict returned by run_bevy_app
+fn output_to_py<'py>(
+    py: Python<'py>,
+    output: OutputData,
+    out: Option<Bound<'py, PyArray3<f64>>>,
+) -> PyResult<Bound<'py, PyAny>> {
+    let OutputData { dense, file, summary, events, final_state, .. } = output;
+    let dense = match (dense, out, file) {
+        (Some(DenseOutput::Owned(arr)), _, _) => Some(arr.into_pyarray_bound(py).into_any()),
+        (Some(DenseOutput::Borrowed(_)), Some(out), _) => Some(out.into_any()),
+        (_, _, Some(file)) => {
+            let path = file.finish()?;
+            let numpy = py.import_bound("numpy")?;
+            let mapped = numpy.call_method("load", (path,), Some(&[("mmap_mode", "r")].into_py_dict_bound(py)))?;
+            Some(mapped.call_method1("transpose", (1, 0, 2))?)
+        }
+        _ => None,
+    };
+    if summary.is_empty() && events.is_none() && final_state.is_none() {
+        if let Some(dense) = dense {
+            return Ok(dense);
+        }
+    }
+    let n_days = summary.n_days();
+    let result = PyDict::new_bound(py);
+    for (reducer, values) in summary.into_tables() {
+        if reducer.width() == 1 {
+            result.set_item(reducer.name(), values.into_pyarray_bound(py))?;
+        } else {
+            let table = Array2::from_shape_vec((n_days, reducer.width()), values).unwrap();
+            result.set_item(reducer.name(), table.into_pyarray_bound(py))?;
+        }
+    }
+    if let Some(dense) = dense {
+        result.set_item("dense", dense)?;
+    }
+    if let Some(log) = events {
+        let columns = PyDict::new_bound(py);
+        columns.set_item("host", log.host.into_pyarray_bound(py))?;
+        columns.set_item("day", log.day.into_pyarray_bound(py))?;
+        columns.set_item("event_type", log.event_type.into_pyarray_bound(py))?;
+        columns.set_item("strain", log.strain.into_pyarray_bound(py))?;
+        columns.set_item("serotype", log.serotype.into_pyarray_bound(py))?;
+        columns.set_item("pre_immunity", log.pre_immunity.into_pyarray_bound(py))?;
+        columns.set_item("post_immunity", log.post_immunity.into_pyarray_bound(py))?;
+        columns.set_item("shed_duration", log.shed_duration.into_pyarray_bound(py))?;
+        result.set_item("events", columns)?;
+    }
+    if let Some(state) = final_state {
+        result.set_item("final_state", checkpoint::state_to_py(py, state)?)?;
     }
+    Ok(result.into_any())
 }
 
-fn exit_system(
-    sim_time: Res<SimulationTime>,
+/// Rayon pool with the requested number of threads (all cores when None)
+fn thread_pool(n_threads: Option<usize>) -> PyResult<rayon::ThreadPool> {
+    rayon::ThreadPoolBuilder::new()
+        .num_threads(n_threads.unwrap_or(0))
+        .build()
+        .map_err(|e| PyRuntimeError::new_err(e.to_string()))
+}
+
+/// Struct-of-arrays population restored from `initial_state`, or naive hosts born on day 0
+/// (or with ages drawn from the demographics' age pyramid on `start_day`)
+fn initial_population(
+    initial_state: Option<&polio::PopulationState>,
+    n_hosts: u32,
+    seed: u64,
+    demographics: Option<&Demographics>,
+    start_day: u32,
+) -> polio::Population {
+    match (initial_state, demographics) {
+        (Some(state), _) => state.to_population(seed),
+        (None, Some(demographics)) => {
+            let mut population = polio::Population::new(n_hosts as usize, seed);
+            for (row, host) in population.hosts.iter_mut().enumerate() {
+                host.birth_sim_day = demographics.initial_birth_day(seed, row as u64, start_day);
+            }
+            population
+        }
+        (None, None) => polio::Population::new(n_hosts as usize, seed),
+    }
+}
+
+/// Runs the same daily step_state/challenge loop as the Bevy app over a struct-of-arrays population
+///
+/// Hosts are stepped on the current rayon pool; output depends only on the seed, not the thread count.
+/// All three engines order a day the same way: infections due to clear that day clear first,
+/// then hosts are challenged, so a host can be re-infected with a serotype on the day it
+/// clears it (the next-event engine handles the day's clearances before its challenges).
+/// The Bevy and struct-of-arrays engines give identical output for the same seed.
+/// `record` is called with each day's population and the events that fired that day,
+/// from the starting state on `start_day` through `end_day`; the final population is returned.
+/// With `demographics`, deaths and births follow each day's challenge.
+fn run_population(
+    mut population: polio::Population,
+    start_day: u32,
+    end_day: u32,
+    schedule: &polio::ExposureSchedule,
+    demographics: Option<&Demographics>,
+    profile: &mut RunProfile,
+    mut record: impl FnMut(u32, &polio::Population, &[polio::HostEvent<usize>]),
+) -> polio::Population {
+    let polio_params = polio::Params::default();
+    let mut sim_time = SimulationTime { day: start_day, ..default() };
+    let mut vacant = VacantSlots::from_hosts(&population.hosts);
+
+    let mut events = Vec::new();
+    loop {
+        profile.time("record_output", || record(sim_time.day, &population, &events));
+
+        if sim_time.day >= end_day {
+            break;
+        }
+        sim_time.day += 1;
+        info!("...Advancing to day {}", sim_time.day);
+        events = profile.time("step_state", || population.step_state(&polio_params, &sim_time));
+        events.extend(profile.time("challenge", || population.challenge(&polio_params, &sim_time, schedule)));
+        if let Some(demographics) = demographics {
+            let vital = profile.time("demographics", || population.step_demographics(demographics, &mut vacant, sim_time.day));
+            info!("Day {}: {} births, {} deaths", sim_time.day,
+                polio::count_events(&vital, polio::EventKind::Birth), polio::count_events(&vital, polio::EventKind::Death));
+            events.extend(vital);
+        }
+        profile.count_events(&events);
+        polio::log_day_totals(sim_time.day,
+            polio::count_events(&events, polio::EventKind::Infection), polio::count_events(&events, polio::EventKind::Clearance),
+            || population.immunity.iter().map(|immunity| immunity.max_current_immunity()));
+    }
+    population
+}
+
+/// Runs the next-event engine from `start_day` through `end_day`; with only the event log
+/// kept, days without events are skipped
+fn run_event_population(
+    mut population: polio::EventPopulation,
+    start_day: u32,
+    end_day: u32,
+    output: &mut OutputData,
+    profile: &mut RunProfile,
+) -> polio::EventPopulation {
+    let polio_params = polio::Params::default();
+    let observe = output.observes_state();
+    let mut sim_time = SimulationTime { day: start_day, ..default() };
+
+    loop {
+        let events = profile.time("advance_to", || population.advance_to(sim_time.day, &polio_params));
+        profile.count_events(&events);
+        if observe {
+            profile.time("observe", || population.observe(&polio_params, &sim_time));
+        }
+        profile.time("record_output", || {
+            output.record_events(&events, |&row| row);
+            if observe {
+                let day = sim_time.day;
+                output.record_day(day as usize, || population.population.samples(day));
+            }
+        });
+        // Immunity is only brought up to date when observed
+        polio::log_day_totals(sim_time.day,
+            polio::count_events(&events, polio::EventKind::Infection), polio::count_events(&events, polio::EventKind::Clearance),
+            || population.population.immunity.iter().map(|immunity| immunity.max_current_immunity()));
+
+        if sim_time.day >= end_day {
+            break;
+        }
+        sim_time.day = if observe {
+            sim_time.day + 1
+        } else {
+            population.next_event_day().map_or(end_day, |day| day.min(end_day))
+        };
+        info!("...Advancing to day {}", sim_time.day);
+    }
+    population
+}
+
+/// Writes one day's column of the dense output in a single pass: (immunity, viral shedding)
+/// aggregated over serotypes (see polio::HostSample), or per serotype when the column has a
+/// pair of channels for each
+fn write_output_column(mut column: ArrayViewMut2<'_, f64>, samples: impl Iterator<Item = (usize, polio::HostSample)>) {
+    let by_serotype = column.ncols() == 2 * polio::N_SEROTYPES;
+    for (row, sample) in samples {
+        if by_serotype {
+            for s in 0..polio::N_SEROTYPES {
+                column[[row, 2 * s]] = sample.current_immunity[s] as f64;
+                column[[row, 2 * s + 1]] = sample.viral_shedding[s].map_or(0.0, |v| v as f64);
+            }
+        } else {
+            column[[row, 0]] = sample.immunity() as f64;
+            column[[row, 1]] = sample.shedding().map_or(0.0, |v| v as f64);
+        }
+    }
+}
+
+/// Spawns the hosts, restoring them from a PopulationState resource if one was inserted,
+/// and collects the vacant slots
+fn setup(
+    mut commands: Commands,
     params: Res<SimParams>,
-    mut exit: EventWriter<AppExit>
+    initial_state: Option<Res<polio::PopulationState>>,
+    demographics: Option<Res<Demographics>>,
+    sim_rng: Res<SimRng>,
+    sim_time: Res<SimulationTime>,
+    mut profile: ResMut<RunProfile>,
 ) {
-    if sim_time.day > params.max_days {
-        exit.send(AppExit);
+    let start = Instant::now();
+    let mut vacant = VacantSlots::default();
+    for row in 0..params.n_hosts as usize {
+        match initial_state.as_deref().map(|state| state.host(row)) {
+            Some((host, immunity, infections)) => {
+                if host.is_vacant() {
+                    vacant.push(row);
+                }
+                let mut entity = commands.spawn((host, immunity, OutputRow(row)));
+                if let Some(infections) = infections {
+                    entity.insert(infections);
+                }
+            }
+            None => {
+                let birth_sim_day = demographics.as_deref()
+                    .map_or(0.0, |demographics| demographics.initial_birth_day(sim_rng.seed, row as u64, sim_time.day));
+                let host = Host{birth_sim_day};
+                // Slots beyond the demographics' initial population
+                if host.is_vacant() {
+                    vacant.push(row);
+                }
+                commands.spawn((
+                    host,
+                    polio::HostImmunity::default(),
+                    OutputRow(row),
+                ));
+            }
+        }
+    }
+    if initial_state.is_some() {
+        commands.remove_resource::<polio::PopulationState>();
     }
+    commands.insert_resource(vacant);
+    profile.add("setup", start.elapsed());
 }
 
 fn step_loop(
     mut commands: Commands,
-    mut host_query: Query<(Entity, &Host, &mut polio::Immunity, Option<&mut polio::Infection>)>,
+    mut host_query: Query<(Entity, &Host, &mut polio::HostImmunity, Option<&mut polio::Infections>)>,
     mut sim_time: ResMut<SimulationTime>,
     polio_params: Res<polio::Params>,
-    params: Res<SimParams>,
-    ouput_data: ResMut<OutputData>,
+    sim_rng: Res<SimRng>,
+    schedule: Res<polio::ExposureSchedule>,
+    rows: Query<&OutputRow>,
+    mut output_data: ResMut<OutputData>,
+    mut profile: ResMut<RunProfile>,
 ) {
     let duration = sim_time.timer.duration();
     sim_time.timer.tick(duration);
     sim_time.day += 1;
     info!("...Advancing to day {}", sim_time.day);
-    polio::step_state(&mut commands, &mut host_query, &polio_params, &sim_time);
+    let cleared = profile.time("step_state", || polio::step_state(&mut host_query, &polio_params, &sim_time));
 
-    let prob = 1.0 - (-params.incidence_rate).exp();
-    let dose = 10f32.powf(params.log10_dose);
-    polio::challenge(&mut commands, &mut host_query, &polio_params, &sim_time, prob, dose, "WPV2");
+    let row = |entity: &Entity| rows.get(*entity).map_or(0, |row| row.0);
+    let day = sim_time.day;
+    let infected = profile.time("challenge", || polio::challenge(&mut commands, &mut host_query, &polio_params, &sim_rng, &sim_time,
+        |entity| row(&entity), |row| *schedule.host_exposure(day, row)));
+    profile.count_events(&cleared);
+    profile.count_events(&infected);
+    polio::log_day_totals(day, infected.len(), cleared.len(),
+        || host_query.iter().map(|(_, _, immunity, _)| immunity.max_current_immunity()));
 
-    for (entity, _host, immunity, infection) in host_query.iter_mut() {
-        if sim_time.day < params.max_days {
-            let mut arr = ouput_data.arr.lock().unwrap();
-            arr[[entity.index() as usize, sim_time.day as usize, 0]] = immunity.current_immunity as f64;
-            arr[[entity.index() as usize, sim_time.day as usize, 1]] = if let Some(inf) = infection {
-                inf.viral_shedding as f64
-            } else {
-                0.0
-            };
+    output_data.record_events(&cleared, row);
+    output_data.record_events(&infected, row);
+}
+
+/// Deaths vacate host slots, then the day's births refill vacant slots lowest row first
+/// (see polio::Population::step_demographics, which this matches draw for draw, logging the
+/// same events)
+fn step_demographics(
+    mut commands: Commands,
+    mut host_query: Query<(Entity, &OutputRow, &mut Host, &mut polio::HostImmunity, Option<&polio::Infections>)>,
+    demographics: Option<Res<Demographics>>,
+    mut vacant: ResMut<VacantSlots>,
+    sim_time: Res<SimulationTime>,
+    sim_rng: Res<SimRng>,
+    mut output_data: ResMut<OutputData>,
+    mut profile: ResMut<RunProfile>,
+) {
+    let Some(demographics) = demographics else {
+        return;
+    };
+    let start = Instant::now();
+    let day = sim_time.day;
+    let mut n_births = 0;
+    let mut deaths = Vec::new();
+    for (entity, row, mut host, mut immunity, infections) in host_query.iter_mut() {
+        let (dies, gives_birth) = demographics.fate(&sim_rng.key(row.0 as u64, day), &host);
+        n_births += gives_birth as usize;
+        if dies {
+            let mut events: Vec<_> = infections.iter().flat_map(|infections| infections.0.iter().flatten())
+                .map(|inf| polio::HostEvent::new(row.0, day, polio::EventKind::Clearance, &immunity, inf))
+                .collect();
+            events.push(polio::HostEvent::occupancy(row.0, day, polio::EventKind::Death));
+            deaths.push(events);
+            host.birth_sim_day = Host::VACANT;
+            *immunity = polio::HostImmunity::default();
+            if infections.is_some() {
+                commands.entity(entity).remove::<polio::Infections>();
+            }
+            vacant.push(row.0);
+        }
+    }
+    // Popped in ascending row order
+    let born: Vec<usize> = std::iter::from_fn(|| vacant.pop()).take(n_births).collect();
+    if !born.is_empty() {
+        for (_, row, mut host, mut immunity, _) in host_query.iter_mut() {
+            if born.binary_search(&row.0).is_ok() {
+                host.birth_sim_day = day as f32;
+                *immunity = polio::HostImmunity::default();
+            }
         }
     }
+    info!("Day {}: {} births, {} deaths", day, born.len(), deaths.len());
+    // In the struct-of-arrays order: deaths by row, then births
+    deaths.sort_by_key(|events| events[0].host);
+    let mut events: Vec<_> = deaths.into_iter().flatten().collect();
+    events.extend(born.iter().map(|&row| polio::HostEvent::occupancy(row, day, polio::EventKind::Birth)));
+    profile.count_events(&events);
+    output_data.record_events(&events, |&row| row);
+    profile.add("demographics", start.elapsed());
+}
+
+/// Records the day's state once step_loop's commands (new and cleared infections) are applied
+fn record_output(
+    host_query: Query<(&OutputRow, &Host, &polio::HostImmunity, Option<&polio::Infections>)>,
+    sim_time: Res<SimulationTime>,
+    params: Res<SimParams>,
+    mut output_data: ResMut<OutputData>,
+    mut profile: ResMut<RunProfile>,
+) {
+    if sim_time.day > params.max_days {
+        return;
+    }
+    let start = Instant::now();
+    output_data.record_day(sim_time.day as usize, || host_query.iter()
+        .filter(|(_, host, _, _)| !host.is_vacant())
+        .map(|(row, host, immunity, infections)| (row.0, host_sample(sim_time.day, host, immunity, infections))));
+    profile.add("record_output", start.elapsed());
+}
+
+/// One host's output sample on `day`
+fn host_sample(day: u32, host: &Host, immunity: &polio::HostImmunity, infections: Option<&polio::Infections>) -> polio::HostSample {
+    polio::HostSample {
+        age_days: day as f32 - host.birth_sim_day,
+        current_immunity: immunity.current_immunity,
+        viral_shedding: infections.map_or([None; polio::N_SEROTYPES], |infections| infections.viral_shedding()),
+    }
 }
 
 /// A Python module implemented in Rust
 #[pymodule]
 fn pybevy(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(run_bevy_app, m)?)?;
+    m.add_function(wrap_pyfunction!(ensemble::run_ensemble, m)?)?;
+    m.add_class::<simulation::Simulation>()?;
     
     // Core classes
     m.add_class::<Host>()?;
@@ -133,8 +751,17 @@ fn pybevy(_py: Python<'_>, m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_class::<polio::PeakCid50Params>()?;
     m.add_class::<polio::ProbTransmitParams>()?;
     m.add_class::<polio::StrainParams>()?;
+    m.add_class::<polio::StrainParamsMap>()?;
+    m.add_class::<polio::StrainParamsView>()?;
 
     m.add_function(wrap_pyfunction!(polio::parse_infection_type, m)?)?;
+    m.add_function(wrap_pyfunction!(polio::parse_infection_code, m)?)?;
+    m.add_function(wrap_pyfunction!(polio::parse_challenge_code, m)?)?;
+
+    // Batch functions over NumPy arrays
+    m.add_function(wrap_pyfunction!(batch::infection_probability_batch, m)?)?;
+    m.add_function(wrap_pyfunction!(batch::viral_shedding_grid, m)?)?;
+    m.add_function(wrap_pyfunction!(trial::simulate_challenge_schedule, m)?)?;
     
     Ok(())
 }
@@ -0,0 +1,116 @@
+// Streaming .npy writer for day-major simulation output
+
+use std::fs::File;
+use std::io::{self, BufWriter, Write};
+use std::path::{Path, PathBuf};
+
+/// Target size of the in-memory chunk buffer when the caller doesn't choose one
+const DEFAULT_CHUNK_BYTES: usize = 64 << 20;
+
+/// Writes a float64 .npy array of shape (n_days, n_hosts, n_channels) one day's slab at a time
+///
+/// Days are buffered in a fixed-size chunk and appended to the file when it fills, so resident
+/// memory is one chunk regardless of run length. I/O errors are kept and reported by `finish`,
+/// letting recording systems that can't return errors keep calling `write_day`.
+pub(crate) struct NpyDayWriter {
+    path: PathBuf,
+    file: BufWriter<File>,
+    slab_shape: (usize, usize),
+    chunk: Vec<f64>,
+    chunk_days: usize,
+    buffered_days: usize,
+    days_written: usize,
+    n_days: usize,
+    error: Option<io::Error>,
+}
+
+impl NpyDayWriter {
+    pub(crate) fn create(path: &Path, n_days: usize, n_hosts: usize, n_channels: usize, chunk_days: Option<usize>) -> io::Result<Self> {
+        let slab_len = n_hosts * n_channels;
+        let chunk_days = chunk_days
+            .unwrap_or(DEFAULT_CHUNK_BYTES / (8 * slab_len.max(1)))
+            .clamp(1, n_days.max(1));
+
+        let mut file = BufWriter::new(File::create(path)?);
+        file.write_all(&npy_header(&[n_days, n_hosts, n_channels]))?;
+
+        Ok(Self {
+            path: path.to_path_buf(),
+            file,
+            slab_shape: (n_hosts, n_channels),
+            chunk: vec![0.0; chunk_days * slab_len],
+            chunk_days,
+            buffered_days: 0,
+            days_written: 0,
+            n_days,
+            error: None,
+        })
+    }
+
+    /// (n_hosts, n_channels) shape of the row-major slab passed to `write_day`
+    pub(crate) fn slab_shape(&self) -> (usize, usize) {
+        self.slab_shape
+    }
+
+    /// Bytes held by the in-memory chunk buffer
+    pub(crate) fn buffer_bytes(&self) -> usize {
+        self.chunk.capacity() * std::mem::size_of::<f64>()
+    }
+
+    /// Appends the next day; `fill` receives a zeroed (n_hosts, n_channels) row-major slab
+    pub(crate) fn write_day(&mut self, fill: impl FnOnce(&mut [f64])) {
+        if self.error.is_some() || self.days_written + self.buffered_days >= self.n_days {
+            return;
+        }
+        let slab_len = self.slab_shape.0 * self.slab_shape.1;
+        let slab = &mut self.chunk[self.buffered_days * slab_len..(self.buffered_days + 1) * slab_len];
+        slab.fill(0.0);
+        fill(slab);
+        self.buffered_days += 1;
+        if self.buffered_days == self.chunk_days {
+            self.flush_chunk();
+        }
+    }
+
+    fn flush_chunk(&mut self) {
+        let slab_len = self.slab_shape.0 * self.slab_shape.1;
+        let values = &self.chunk[..self.buffered_days * slab_len];
+        if let Err(e) = values.iter().try_for_each(|v| self.file.write_all(&v.to_le_bytes())) {
+            self.error = Some(e);
+        }
+        self.days_written += self.buffered_days;
+        self.buffered_days = 0;
+    }
+
+    /// Flushes buffered days, zero-fills any days never written and returns the file path
+    pub(crate) fn finish(mut self) -> io::Result<PathBuf> {
+        self.flush_chunk();
+        if let Some(e) = self.error.take() {
+            return Err(e);
+        }
+        let file = self.file.into_inner().map_err(|e| e.into_error())?;
+        let header_len = npy_header(&[self.n_days, self.slab_shape.0, self.slab_shape.1]).len() as u64;
+        let data_len = (self.n_days * self.slab_shape.0 * self.slab_shape.1 * 8) as u64;
+        file.set_len(header_len + data_len)?;
+        Ok(self.path)
+    }
+}
+
+/// Version 1.0 .npy header for a little-endian float64 C-order array, padded to 64 bytes
+fn npy_header(shape: &[usize]) -> Vec<u8> {
+    let dims: Vec<String> = shape.iter().map(|n| n.to_string()).collect();
+    let shape = if dims.len() == 1 { format!("({},)", dims[0]) } else { format!("({})", dims.join(", ")) };
+    let mut dict = format!("{{'descr': '<f8', 'fortran_order': False, 'shape': {}, }}", shape);
+
+    // magic (6) + version (2) + header length (2) + dict, newline-terminated
+    let unpadded = 10 + dict.len() + 1;
+    dict.push_str(&" ".repeat((64 - unpadded % 64) % 64));
+    dict.push('\n');
+
+    let mut header = Vec::with_capacity(10 + dict.len());
+    header.extend_from_slice(b"\x93NUMPY");
+    header.extend_from_slice(&[1, 0]);
+    header.extend_from_slice(&(dict.len() as u16).to_le_bytes());
+    header.extend_from_slice(dict.as_bytes());
+    header
+}
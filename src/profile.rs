@@ -0,0 +1,67 @@
+// Wall-time and throughput instrumentation for run_bevy_app(profile=True)
+
+use std::time::{Duration, Instant};
+
+use bevy::prelude::Resource;
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+
+/// Accumulated wall time per stage of a run, plus event counts
+///
+/// Stages are timed with one Instant pair per stage per day, so the cost is the same
+/// whether or not the profile is returned.
+#[derive(Resource, Default)]
+pub(crate) struct RunProfile {
+    stages: Vec<(&'static str, Duration)>,
+    pub(crate) n_infections: usize,
+    pub(crate) n_clearances: usize,
+}
+
+impl RunProfile {
+    /// Adds `elapsed` to `stage`, keeping stages in the order first seen
+    pub(crate) fn add(&mut self, stage: &'static str, elapsed: Duration) {
+        match self.stages.iter_mut().find(|(name, _)| *name == stage) {
+            Some((_, total)) => *total += elapsed,
+            None => self.stages.push((stage, elapsed)),
+        }
+    }
+
+    /// Runs `f`, charging its wall time to `stage`
+    pub(crate) fn time<T>(&mut self, stage: &'static str, f: impl FnOnce() -> T) -> T {
+        let start = Instant::now();
+        let value = f();
+        self.add(stage, start.elapsed());
+        value
+    }
+
+    /// Counts the infection and clearance events in `events`
+    pub(crate) fn count_events<H>(&mut self, events: &[model::polio::HostEvent<H>]) {
+        self.n_infections += model::polio::count_events(events, model::polio::EventKind::Infection);
+        self.n_clearances += model::polio::count_events(events, model::polio::EventKind::Clearance);
+    }
+
+    /// Dict of "wall_time" seconds per stage, "total_time", "host_days_per_second",
+    /// "n_infections", "n_clearances" and "peak_output_bytes"
+    pub(crate) fn into_py_dict<'py>(
+        self,
+        py: Python<'py>,
+        run_time: Duration,
+        host_days: u64,
+        peak_output_bytes: usize,
+    ) -> PyResult<Bound<'py, PyDict>> {
+        let wall_time = PyDict::new_bound(py);
+        let mut total = Duration::ZERO;
+        for (stage, elapsed) in &self.stages {
+            wall_time.set_item(*stage, elapsed.as_secs_f64())?;
+            total += *elapsed;
+        }
+        let profile = PyDict::new_bound(py);
+        profile.set_item("wall_time", wall_time)?;
+        profile.set_item("total_time", total.as_secs_f64())?;
+        profile.set_item("host_days_per_second", host_days as f64 / run_time.as_secs_f64().max(f64::MIN_POSITIVE))?;
+        profile.set_item("n_infections", self.n_infections)?;
+        profile.set_item("n_clearances", self.n_clearances)?;
+        profile.set_item("peak_output_bytes", peak_output_bytes)?;
+        Ok(profile)
+    }
+}
@@ -0,0 +1,177 @@
+// Persistent Bevy simulation advanced incrementally from Python
+
+use std::path::PathBuf;
+
+use bevy::ecs::system::RunSystemOnce;
+use bevy::prelude::*;
+use ndarray::{Array2, Array3};
+use numpy::{IntoPyArray, PyArray2};
+use pyo3::exceptions::{PyKeyError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+
+use model::{Host, SimRng, SimulationTime, polio};
+
+use crate::checkpoint::{extract_initial_state, run_seed, state_to_py, world_state};
+use crate::demographics::extract_demographics;
+use crate::exposure::extract_daily_schedule;
+use crate::profile::RunProfile;
+use crate::{
+    host_sample, output_to_py, record_output, setup, step_demographics, step_loop, write_output_column,
+    DenseOutput, Engine, OutputData, OutputRow, SimOptions, SimParams,
+};
+
+/// A population kept alive between calls, so a warmed-up state can be run further,
+/// re-challenged and inspected without re-simulating from day 0
+///
+/// Takes the same dict as run_bevy_app, except that max_days isn't needed and daily exposure
+/// arrays may have any length (row r applies to day r + 1, the last row holding for later
+/// days). A `checkpoint` path or `initial_state` columns start it from a saved state and
+/// day, as in run_bevy_app, and `demographics` adds births and deaths.
+/// Only the bevy engine is supported, and outputs are returned by each call rather than
+/// written to `out` or `output_path`.
+#[pyclass(unsendable)]
+pub struct Simulation {
+    app: App,
+    n_hosts: u32,
+    options: SimOptions,
+}
+
+#[pymethods]
+impl Simulation {
+    #[new]
+    fn new(data: &Bound<'_, PyDict>) -> PyResult<Self> {
+        let n_hosts: u32 = data.get_item("n_hosts")?
+            .ok_or_else(|| PyKeyError::new_err("n_hosts"))?
+            .extract()?;
+        let options = SimOptions::extract(data)?;
+        if options.engine != Engine::Bevy {
+            return Err(PyValueError::new_err("Simulation only supports the bevy engine"));
+        }
+        if options.output_path.is_some() {
+            return Err(PyValueError::new_err("output_path is not supported by Simulation"));
+        }
+        let initial_state = extract_initial_state(data, n_hosts, &options)?;
+        let seed = run_seed(data, initial_state.as_ref(), &options)?;
+        let start_day = initial_state.as_ref().map_or(0, |state| state.day);
+        let schedule = extract_daily_schedule(data, n_hosts, None)?.starting_on(start_day + 1);
+        let demographics = extract_demographics(data, n_hosts)?;
+
+        env_logger::try_init().ok(); // Ignore error if already initialized
+
+        let mut app = App::new();
+        app.add_plugins(MinimalPlugins)
+            .insert_resource(SimParams { n_hosts, max_days: start_day })
+            .insert_resource(schedule)
+            .insert_resource(RunProfile::default())
+            .insert_resource(SimulationTime { day: start_day, ..default() })
+            .insert_resource(polio::Params::default())
+            .insert_resource(SimRng::new(seed))
+            .add_systems(Update, (step_loop, step_demographics, record_output).chain());
+        if let Some(state) = initial_state {
+            app.insert_resource(state);
+        }
+        if let Some(demographics) = demographics {
+            app.insert_resource(demographics);
+        }
+        app.finish();
+        app.cleanup();
+        // Hosts are spawned up front (not by a Startup system) so the first day can be inspected
+        app.world.run_system_once(setup);
+        Ok(Simulation { app, n_hosts, options })
+    }
+
+    /// Current simulation day (0, or the checkpoint's day, until the first step)
+    #[getter]
+    fn day(&self) -> u32 {
+        self.app.world.resource::<SimulationTime>().day
+    }
+
+    #[getter]
+    fn n_hosts(&self) -> u32 {
+        self.n_hosts
+    }
+
+    /// Advances `n_days` days and returns their outputs (see run_until)
+    #[pyo3(signature = (n_days=1))]
+    fn step<'py>(&mut self, py: Python<'py>, n_days: u32) -> PyResult<Bound<'py, PyAny>> {
+        let day = self.day().checked_add(n_days)
+            .ok_or_else(|| PyValueError::new_err("n_days runs past the last representable day"))?;
+        self.run_until(py, day)
+    }
+
+    /// Advances to `day` and returns the outputs of the new days only
+    ///
+    /// The result takes the same form as run_bevy_app's, with the day axis covering the
+    /// days after the current one up to and including `day` (a dense array has shape
+    /// (n_hosts, day - self.day, n_channels)). Event days are absolute.
+    fn run_until<'py>(&mut self, py: Python<'py>, day: u32) -> PyResult<Bound<'py, PyAny>> {
+        let start_day = self.day();
+        if day < start_day {
+            return Err(PyValueError::new_err(format!("cannot run back to day {} from day {}", day, start_day)));
+        }
+        let n_days = (day - start_day) as usize;
+        let dense = self.options.dense.then(|| DenseOutput::Owned(Array3::zeros((self.n_hosts as usize, n_days, self.options.n_channels()))));
+        let summary = polio::DailySummary::new(self.options.reducers.clone(), n_days);
+        let events = self.options.events.then(polio::EventLog::default);
+        self.app.insert_resource(OutputData { dense, file: None, summary, events, first_day: start_day as usize + 1, final_state: None });
+        self.app.world.resource_mut::<SimParams>().max_days = day;
+
+        for _ in start_day..day {
+            self.app.update();
+        }
+
+        let output = self.app.world.remove_resource::<OutputData>().unwrap();
+        output_to_py(py, output, None)
+    }
+
+    /// Replaces the exposure schedule from the next day on
+    ///
+    /// Arguments are as in the constructor's dict, with row 0 of daily arrays applied on
+    /// day + 1; hosts are all in group 0 unless `host_group` is given again.
+    #[pyo3(signature = (incidence_rate, log10_dose, strain=None, host_group=None))]
+    fn set_incidence(
+        &mut self,
+        incidence_rate: &Bound<'_, PyAny>,
+        log10_dose: &Bound<'_, PyAny>,
+        strain: Option<&Bound<'_, PyAny>>,
+        host_group: Option<&Bound<'_, PyAny>>,
+    ) -> PyResult<()> {
+        let data = PyDict::new_bound(incidence_rate.py());
+        data.set_item("incidence_rate", incidence_rate)?;
+        data.set_item("log10_dose", log10_dose)?;
+        if let Some(strain) = strain {
+            data.set_item("strain", strain)?;
+        }
+        if let Some(host_group) = host_group {
+            data.set_item("host_group", host_group)?;
+        }
+        let schedule = extract_daily_schedule(&data, self.n_hosts, None)?.starting_on(self.day() + 1);
+        self.app.insert_resource(schedule);
+        Ok(())
+    }
+
+    /// Writes every host's state, the day and the seed to a checkpoint file
+    fn save_checkpoint(&mut self, path: PathBuf) -> PyResult<()> {
+        world_state(&mut self.app.world).save(&path)?;
+        Ok(())
+    }
+
+    /// Every host's current state as a dict of column arrays (see run_bevy_app's final_state)
+    fn state<'py>(&mut self, py: Python<'py>) -> PyResult<Bound<'py, PyDict>> {
+        state_to_py(py, world_state(&mut self.app.world))
+    }
+
+    /// Current immunity and viral shedding: the dense output's (n_hosts, n_channels) column
+    /// for today (0 for vacant slots)
+    fn snapshot<'py>(&mut self, py: Python<'py>) -> Bound<'py, PyArray2<f64>> {
+        let day = self.day();
+        let mut state = Array2::zeros((self.n_hosts as usize, self.options.n_channels()));
+        let world = &mut self.app.world;
+        let mut query = world.query::<(&OutputRow, &Host, &polio::HostImmunity, Option<&polio::Infections>)>();
+        write_output_column(state.view_mut(), query.iter(world)
+            .filter(|(_, host, _, _)| !host.is_vacant())
+            .map(|(row, host, immunity, infections)| (row.0, host_sample(day, host, immunity, infections))));
+        state.into_pyarray_bound(py)
+    }
+}
@@ -0,0 +1,92 @@
+// Vectorized challenge-study emulation across subjects
+
+use ndarray::Array2;
+use numpy::IntoPyArray;
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::prelude::*;
+use pyo3::types::PyDict;
+use rayon::prelude::*;
+
+use model::polio::{self, ChallengeSchedule, InfectionSerotype, InfectionStrain, Params, SubjectTrajectory};
+
+use crate::thread_pool;
+
+/// Days followed after the last challenge when n_days isn't given
+const DEFAULT_FOLLOW_UP_DAYS: u32 = 120;
+
+/// Runs `n_subjects` naive subjects through a challenge schedule, in parallel
+///
+/// `doses` holds one dose per challenge day, or a single dose for all of them; `strain` is a
+/// string like "OPV2" or a (strain, serotype) tuple. Returns a dict of (n_subjects, n_days)
+/// arrays "p_infection", "immunity", "shedding" and "theta" (see ChallengeSchedule).
+/// Subject s uses the same draws for a given seed regardless of n_threads.
+#[pyfunction]
+#[pyo3(signature = (n_subjects, challenge_days, doses, strain, params, seed=None, n_days=None, age_days=0.0, n_threads=None))]
+#[allow(clippy::too_many_arguments)]
+pub fn simulate_challenge_schedule<'py>(
+    py: Python<'py>,
+    n_subjects: usize,
+    challenge_days: Vec<u32>,
+    doses: Vec<f32>,
+    strain: &Bound<'py, PyAny>,
+    params: &Params,
+    seed: Option<u64>,
+    n_days: Option<u32>,
+    age_days: f32,
+    n_threads: Option<usize>,
+) -> PyResult<Bound<'py, PyDict>> {
+    if challenge_days.windows(2).any(|w| w[0] >= w[1]) {
+        return Err(PyValueError::new_err("challenge_days must be strictly increasing"));
+    }
+    let doses = match doses.len() {
+        1 => vec![doses[0]; challenge_days.len()],
+        n if n == challenge_days.len() => doses,
+        n => return Err(PyValueError::new_err(format!(
+            "doses has {} values for {} challenge days", n, challenge_days.len()
+        ))),
+    };
+    if n_threads == Some(0) {
+        return Err(PyValueError::new_err("n_threads must be at least 1"));
+    }
+    let (strain, serotype) = extract_infection_type(strain)?;
+    let n_days = n_days.unwrap_or_else(|| challenge_days.last().map_or(0, |&d| d + 1) + DEFAULT_FOLLOW_UP_DAYS) as usize;
+    let seed = seed.unwrap_or_else(rand::random);
+    let schedule = ChallengeSchedule { days: challenge_days, doses, strain, serotype, age_days };
+
+    let len = n_subjects * n_days;
+    let (mut p_infection, mut immunity, mut shedding, mut theta) = (vec![0.0; len], vec![0.0; len], vec![0.0; len], vec![0.0; len]);
+    let pool = thread_pool(n_threads)?;
+
+    py.allow_threads(|| pool.install(|| {
+        // Zero-length runs leave nothing to fill (chunk size must be non-zero)
+        if n_days == 0 {
+            return;
+        }
+        let kinetics = params.shedding_kinetics_table();
+        p_infection.par_chunks_mut(n_days)
+            .zip(immunity.par_chunks_mut(n_days))
+            .zip(shedding.par_chunks_mut(n_days).zip(theta.par_chunks_mut(n_days)))
+            .enumerate()
+            .for_each(|(subject, ((p_infection, immunity), (shedding, theta)))| {
+                let out = SubjectTrajectory { p_infection, immunity, shedding, theta };
+                schedule.simulate_subject(seed, subject as u64, params, &kinetics, out);
+            });
+    }));
+
+    let result = PyDict::new_bound(py);
+    for (name, values) in [("p_infection", p_infection), ("immunity", immunity), ("shedding", shedding), ("theta", theta)] {
+        let table = Array2::from_shape_vec((n_subjects, n_days), values).unwrap();
+        result.set_item(name, table.into_pyarray_bound(py))?;
+    }
+    Ok(result)
+}
+
+/// A single infection type given as "WPV2" or (strain, serotype)
+fn extract_infection_type(strain: &Bound<'_, PyAny>) -> PyResult<(InfectionStrain, InfectionSerotype)> {
+    if let Ok(s) = strain.extract::<String>() {
+        return polio::parse_infection_type(&s)
+            .ok_or_else(|| PyValueError::new_err(format!("Unknown strain type: {}", s)));
+    }
+    strain.extract::<(InfectionStrain, InfectionSerotype)>()
+        .map_err(|_| PyTypeError::new_err("strain must be a string like 'OPV2' or a (strain, serotype) tuple"))
+}
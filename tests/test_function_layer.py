@@ -4,6 +4,7 @@ Tests for Function Layer - Pure calculation methods on Immunity and Infection cl
 
 import pytest
 import pybevy
+import numpy as np
 
 
 class TestImmunityCalculationMethods:
@@ -107,6 +108,73 @@ class TestImmunityCalculationMethods:
         
         assert isinstance(duration, float)
         assert duration > 0.0
+    
+    def test_seeded_draws_reproducible(self, test_immunity, shed_duration_params, theta_nabs_params):
+        """Test passing a seed makes random draws reproducible."""
+        assert (test_immunity.calculate_shed_duration(shed_duration_params, seed=7)
+                == test_immunity.calculate_shed_duration(shed_duration_params, seed=7))
+        assert (test_immunity.calculate_theta_nab(theta_nabs_params, seed=7)
+                == test_immunity.calculate_theta_nab(theta_nabs_params, seed=7))
+
+
+class TestClosedFormDistributions:
+    """Test exact shed duration and post-challenge immunity distributions."""
+
+    @pytest.mark.parametrize("immunity_level", [1.0, 16.0, 1024.0])
+    def test_shed_duration_survival_monotone(self, immunity_level, default_params):
+        """Test survival starts at one and never increases."""
+        immunity = pybevy.Immunity.with_values(immunity_level, immunity_level, immunity_level, None)
+        strain, serotype = pybevy.parse_infection_type("WPV2")
+        survival = np.array(immunity.shed_duration_survival(
+            np.arange(0.0, 120.0).tolist(), strain, serotype, default_params))
+
+        assert survival[0] == 1.0
+        assert np.all(np.diff(survival) <= 0.0)
+        assert survival[-1] < 0.5
+
+    def test_shed_duration_quantiles_match_survival(self, default_params):
+        """Test survival at each quantile is one minus its probability."""
+        immunity = pybevy.Immunity.with_values(8.0, 8.0, 8.0, None)
+        strain, serotype = pybevy.parse_infection_type("OPV2")
+        probs = [0.1, 0.5, 0.9]
+        quantiles = immunity.shed_duration_quantiles(probs, strain, serotype, default_params)
+        survival = immunity.shed_duration_survival(quantiles, strain, serotype, default_params)
+
+        assert np.all(np.diff(quantiles) > 0.0)
+        np.testing.assert_allclose(survival, 1.0 - np.array(probs), atol=1e-5)
+
+    def test_shed_duration_survival_matches_monte_carlo(self, default_params):
+        """Test the exact survival curve agrees with sampled prognoses."""
+        strain, serotype = pybevy.parse_infection_type("WPV2")
+        durations = []
+        for seed in range(2000):
+            immunity = pybevy.Immunity.with_values(4.0, 4.0, 4.0, None)
+            infection = pybevy.Infection(0.0, 0.0, strain, serotype)
+            infection.set_prognoses(immunity, 0.0, default_params, seed=seed)
+            durations.append(infection.shed_duration)
+
+        immunity = pybevy.Immunity.with_values(4.0, 4.0, 4.0, None)
+        days = [10.0, 20.0, 30.0, 45.0]
+        survival = immunity.shed_duration_survival(days, strain, serotype, default_params)
+        empirical = [np.mean(np.array(durations) >= d) for d in days]
+        np.testing.assert_allclose(survival, empirical, atol=0.05)
+
+    def test_postchallenge_peak_distribution(self, theta_nabs_params):
+        """Test peak immunity quantiles and mean bracket sampled boosts."""
+        immunity = pybevy.Immunity.with_values(256.0, 256.0, 256.0, None)
+        quantiles = immunity.postchallenge_peak_quantiles([0.05, 0.5, 0.95], theta_nabs_params)
+        mean = immunity.postchallenge_peak_mean(theta_nabs_params)
+
+        assert quantiles[0] >= 256.0
+        assert quantiles[0] <= quantiles[1] <= quantiles[2]
+
+        peaks = []
+        for seed in range(2000):
+            sampled = pybevy.Immunity.with_values(256.0, 256.0, 256.0, None)
+            sampled.update_peak_immunity(theta_nabs_params, seed=seed)
+            peaks.append(sampled.postchallenge_peak_immunity)
+        assert np.median(peaks) == pytest.approx(quantiles[1], rel=0.1)
+        assert np.mean(peaks) == pytest.approx(mean, rel=0.1)
 
 
 class TestInfectionCalculationMethods:
@@ -224,4 +292,107 @@ class TestMethodIntegration:
                     serotype=serotype
                 )
                 should_clear = infection.should_clear_infection(50.0)
-                assert isinstance(should_clear, bool)
\ No newline at end of file
+                assert isinstance(should_clear, bool)
+
+class TestBatchCalculations:
+    """Test vectorized batch functions over NumPy arrays."""
+    
+    def test_infection_probability_batch_matches_scalar(self, default_params, immunity_levels, test_doses):
+        """Test batch infection probability agrees with the scalar method."""
+        immunity = np.array(immunity_levels)
+        doses = np.array(test_doses)
+        
+        probs = pybevy.infection_probability_batch(immunity[:, None], doses[None, :], "WPV2", default_params)
+        
+        assert probs.shape == (len(immunity_levels), len(test_doses))
+        for i, immunity_level in enumerate(immunity_levels):
+            for j, dose in enumerate(test_doses):
+                expected = pybevy.Immunity.with_values(1.0, 1.0, immunity_level, None).calculate_infection_probability(
+                    dose=dose,
+                    strain=pybevy.InfectionStrain.WPV,
+                    serotype=pybevy.InfectionSerotype.Type2,
+                    params=default_params
+                )
+                assert probs[i, j] == pytest.approx(expected, rel=1e-6)
+    
+    def test_infection_probability_batch_infection_codes(self, default_params):
+        """Test per-element infection type codes match string and tuple forms."""
+        codes = np.array([pybevy.parse_infection_code(s) for s in ["WPV1", "OPV2", "OPV3"]], dtype=np.uint8)
+        immunity = np.full(3, 4.0)
+        doses = np.full(3, 1e5)
+        
+        probs = pybevy.infection_probability_batch(immunity, doses, codes, default_params)
+        
+        assert probs.shape == (3,)
+        assert probs[0] == pytest.approx(pybevy.infection_probability_batch(immunity, doses, "WPV1", default_params)[0])
+        opv2 = pybevy.parse_infection_type("OPV2")
+        assert probs[1] == pytest.approx(pybevy.infection_probability_batch(immunity, doses, opv2, default_params)[1])
+    
+    def test_infection_probability_batch_invalid_inputs(self, default_params):
+        """Test batch infection probability rejects bad strains and shapes."""
+        with pytest.raises(ValueError):
+            pybevy.infection_probability_batch(np.ones(3), np.ones(3), "XPV9", default_params)
+        with pytest.raises(ValueError):
+            pybevy.infection_probability_batch(np.ones(3), np.ones(4), "WPV2", default_params)
+        with pytest.raises(ValueError):
+            pybevy.infection_probability_batch(np.ones(2), np.ones(2), np.array([0, 6], dtype=np.uint8), default_params)
+    
+    def test_viral_shedding_grid_matches_scalar(self, default_params):
+        """Test shedding grid agrees with the scalar method for every (host, day) cell."""
+        prechallenge = np.array([1.0, 8.0, 256.0])
+        ages = np.array([3.0, 24.0, 240.0])
+        days = np.arange(1, 31, dtype=float)
+        
+        grid = pybevy.viral_shedding_grid(prechallenge, ages, days, default_params)
+        
+        assert grid.shape == (3, 30)
+        for i in range(3):
+            immunity = pybevy.Immunity.with_values(prechallenge[i], 0.0, 1.0, None)
+            for j, day in enumerate(days):
+                expected = immunity.calculate_viral_shedding(ages[i], day, default_params)
+                assert grid[i, j] == pytest.approx(expected, rel=1e-5)
+    
+    def test_viral_shedding_grid_broadcasts_scalars(self, default_params):
+        """Test scalar host inputs broadcast to a single row."""
+        grid = pybevy.viral_shedding_grid(1.0, 24.0, np.arange(1, 11), default_params)
+        assert grid.shape == (1, 10)
+        assert np.all(grid >= 10**2.6 * (1 - 1e-6))
+        
+        with pytest.raises(ValueError):
+            pybevy.viral_shedding_grid(np.ones(2), np.ones(3), np.arange(1, 11), default_params)
+
+
+class TestChallengeSchedule:
+    """Test the vectorized challenge-study simulator."""
+
+    def test_output_shapes_and_reproducibility(self, default_params):
+        """Test per-subject arrays have the requested shape and depend only on the seed."""
+        kwargs = dict(seed=3, n_days=240)
+        result = pybevy.simulate_challenge_schedule(50, [0, 120], [1e6], "OPV2", default_params, **kwargs)
+        again = pybevy.simulate_challenge_schedule(50, [0, 120], [1e6], "OPV2", default_params, n_threads=1, **kwargs)
+
+        assert set(result) == {"p_infection", "immunity", "shedding", "theta"}
+        for name, values in result.items():
+            assert values.shape == (50, 240)
+            np.testing.assert_array_equal(values, again[name])
+
+    def test_challenge_boosts_immunity_and_reduces_take(self, default_params):
+        """Test a high-dose challenge infects naive subjects and protects against the next one."""
+        result = pybevy.simulate_challenge_schedule(
+            200, [0, 120], [1e6, 1e6], (pybevy.InfectionStrain.OPV, pybevy.InfectionSerotype.Type2),
+            default_params, seed=11, n_days=121)
+
+        immunity = result["immunity"]
+        assert np.all(immunity[:, 0] >= 1.0)
+        assert np.mean(immunity[:, 119] > 1.0) > 0.5
+        assert np.mean(result["p_infection"][:, 120]) < np.mean(result["p_infection"][:, 0])
+        assert np.mean(result["shedding"][:, 1] > 0.0) > 0.5
+
+    def test_invalid_schedule(self, default_params):
+        """Test unsorted days, mismatched doses and unknown strains are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.simulate_challenge_schedule(1, [10, 0], [1e6], "OPV2", default_params)
+        with pytest.raises(ValueError):
+            pybevy.simulate_challenge_schedule(1, [0, 10], [1e6, 1e6, 1e6], "OPV2", default_params)
+        with pytest.raises(ValueError):
+            pybevy.simulate_challenge_schedule(1, [0], [1e6], "XPV9", default_params)
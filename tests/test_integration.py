@@ -37,6 +37,37 @@ class TestHighLevelSimulation:
         shedding_data = result[:, :, 1]  # Viral shedding is metric 1
         assert np.all(shedding_data >= 0.0)
     
+    def test_run_bevy_app_seeded(self):
+        """Test runs with the same seed are identical."""
+        params = {
+            'n_hosts': 50,
+            'max_days': 60,
+            'incidence_rate': 0.05,
+            'log10_dose': 6.0,
+            'seed': 123
+        }
+
+        first = pybevy.run_bevy_app(params)
+        second = pybevy.run_bevy_app(params)
+
+        np.testing.assert_array_equal(first, second)
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_run_bevy_app_records_every_day(self, engine):
+        """Test output covers the initial state on day 0 through max_days."""
+        result = pybevy.run_bevy_app({
+            'n_hosts': 10,
+            'max_days': 20,
+            'incidence_rate': 0.05,
+            'log10_dose': 5.0,
+            'engine': engine
+        })
+        
+        # Every host starts naive and recorded immunity never drops below 1
+        np.testing.assert_array_equal(result[:, 0, 0], 1.0)
+        np.testing.assert_array_equal(result[:, 0, 1], 0.0)
+        assert np.all(result[:, :, 0] >= 1.0)
+    
     @pytest.mark.parametrize("n_hosts", [1, 5, 20])
     def test_run_bevy_app_population_sizes(self, n_hosts):
         """Test simulation with different population sizes."""
@@ -100,6 +131,762 @@ class TestHighLevelSimulation:
         assert np.all(shedding_data >= 0.0)
 
 
+class TestPopulationEngine:
+    """Test the struct-of-arrays engine selected with engine="soa"."""
+    
+    def test_soa_engine_output_structure(self):
+        """Test SoA engine returns the same output layout as the Bevy engine."""
+        params = {
+            'n_hosts': 20,
+            'max_days': 60,
+            'incidence_rate': 0.1,
+            'log10_dose': 6.0,
+            'engine': 'soa'
+        }
+        
+        result = pybevy.run_bevy_app(params)
+        
+        assert isinstance(result, np.ndarray)
+        assert result.shape == (20, 61, 2)
+        assert result.dtype == np.float64
+        assert np.all(result[:, :, 0] >= 0.0)
+        assert np.all(result[:, :, 1] >= 0.0)
+        # High incidence and dose over two months should infect someone
+        assert np.any(result[:, :, 1] > 0)
+    
+    def test_unknown_engine(self):
+        """Test unknown engine names are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({
+                'n_hosts': 5,
+                'max_days': 10,
+                'incidence_rate': 0.05,
+                'log10_dose': 5.0,
+                'engine': 'gpu'
+            })
+
+    def test_event_engine_output_structure(self):
+        """Test the next-event engine returns the usual dense layout and is reproducible."""
+        params = {
+            'n_hosts': 50,
+            'max_days': 90,
+            'incidence_rate': 0.02,
+            'log10_dose': 6.0,
+            'engine': 'event',
+            'seed': 8
+        }
+        
+        result = pybevy.run_bevy_app(params)
+        
+        assert result.shape == (50, 91, 2)
+        assert np.all(result[:, :, 0] >= 1.0)
+        assert np.all(result[:, :, 1] >= 0.0)
+        np.testing.assert_array_equal(result, pybevy.run_bevy_app(params))
+    
+    def test_event_engine_events_only(self):
+        """Test an events-only run of the next-event engine at low incidence."""
+        result = pybevy.run_bevy_app({
+            'n_hosts': 1000,
+            'max_days': 365,
+            'incidence_rate': 0.002,
+            'log10_dose': 6.0,
+            'engine': 'event',
+            'seed': 2,
+            'events': True
+        })
+        
+        events = result['events']
+        assert np.all(np.diff(events['day'].astype(np.int64)) >= 0)
+        assert np.all(events['day'] <= 365)
+    
+    @pytest.mark.parametrize("strain", ["WPV2", "tOPV"])
+    def test_bevy_matches_soa(self, strain):
+        """Test seeded bevy and soa runs match, including hosts re-infected on their clearance day."""
+        params = {
+            'n_hosts': 100,
+            'max_days': 180,
+            'incidence_rate': 0.5,
+            'log10_dose': 8.0,
+            'strain': strain,
+            'seed': 12,
+            'events': True,
+            'dense': True,
+            'by_serotype': True
+        }
+        
+        bevy, soa = (pybevy.run_bevy_app({**params, 'engine': engine}) for engine in ("bevy", "soa"))
+        
+        np.testing.assert_array_equal(bevy['dense'], soa['dense'])
+        assert len(bevy['events']['host']) == len(soa['events']['host'])
+        # Some host clears a serotype and is infected with it again on the same day
+        events = soa['events']
+        keyed = list(zip(events['event_type'], zip(events['host'], events['day'], events['serotype'])))
+        infected = {key for kind, key in keyed if kind == pybevy.events.INFECTION}
+        cleared = {key for kind, key in keyed if kind == pybevy.events.CLEARANCE}
+        assert infected & cleared
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa", "event"])
+    def test_reinfection_on_clearance_day(self, engine):
+        """Test every engine clears the day's infections before challenging hosts again."""
+        result = pybevy.run_bevy_app({
+            'n_hosts': 100,
+            'max_days': 180,
+            'incidence_rate': 0.5,
+            'log10_dose': 8.0,
+            'engine': engine,
+            'seed': 12,
+            'events': True
+        })
+        
+        events = result['events']
+        is_infection = events['event_type'] == pybevy.events.INFECTION
+        infected = set(zip(events['host'][is_infection], events['day'][is_infection]))
+        cleared = set(zip(events['host'][~is_infection], events['day'][~is_infection]))
+        assert infected & cleared
+        # A host is never infected on a day while its earlier infection is still active
+        for host in np.unique(events['host']):
+            own = events['event_type'][events['host'] == host]
+            assert np.all(own[1:] != own[:-1])
+    
+    def test_soa_engine_thread_count_invariant(self):
+        """Test a seeded SoA run gives identical output for any number of threads."""
+        params = {
+            'n_hosts': 200,
+            'max_days': 90,
+            'incidence_rate': 0.05,
+            'log10_dose': 6.0,
+            'engine': 'soa',
+            'seed': 42
+        }
+
+        single = pybevy.run_bevy_app({**params, 'n_threads': 1})
+        multi = pybevy.run_bevy_app({**params, 'n_threads': 4})
+
+        np.testing.assert_array_equal(single, multi)
+
+
+class TestOutputBuffers:
+    """Test writing simulation output into caller-provided arrays with out=."""
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_out_array_filled_in_place(self, engine):
+        """Test out= is filled in place and returned, matching a normal run."""
+        params = {
+            'n_hosts': 15,
+            'max_days': 30,
+            'incidence_rate': 0.1,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 3
+        }
+        out = np.full((15, 31, 2), -1.0)
+        
+        result = pybevy.run_bevy_app(params, out=out)
+        
+        assert result is out
+        np.testing.assert_array_equal(out, pybevy.run_bevy_app(params))
+    
+    def test_out_memmap(self, tmp_path):
+        """Test output can be written straight into a memory-mapped file."""
+        out = np.memmap(tmp_path / "output.dat", dtype=np.float64, mode="w+", shape=(10, 21, 2))
+        
+        pybevy.run_bevy_app({
+            'n_hosts': 10,
+            'max_days': 20,
+            'incidence_rate': 0.05,
+            'log10_dose': 5.0,
+            'engine': 'soa'
+        }, out=out)
+        out.flush()
+        
+        reloaded = np.memmap(tmp_path / "output.dat", dtype=np.float64, mode="r", shape=(10, 21, 2))
+        np.testing.assert_array_equal(reloaded[:, 0, 0], 1.0)
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_output_path_streams_npy(self, engine, tmp_path):
+        """Test output_path streams a .npy file and returns a memory-mapped view of it."""
+        params = {
+            'n_hosts': 12,
+            'max_days': 40,
+            'incidence_rate': 0.1,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 11
+        }
+        path = tmp_path / "trajectories.npy"
+        
+        result = pybevy.run_bevy_app({**params, 'output_path': str(path), 'chunk_days': 7})
+        
+        assert result.shape == (12, 41, 2)
+        assert np.load(path, mmap_mode="r").shape == (41, 12, 2)
+        np.testing.assert_array_equal(result, pybevy.run_bevy_app(params))
+    
+    def test_out_wrong_shape(self):
+        """Test out= arrays of the wrong shape are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({
+                'n_hosts': 10,
+                'max_days': 20,
+                'incidence_rate': 0.05,
+                'log10_dose': 5.0
+            }, out=np.zeros((10, 20, 2)))
+
+
+class TestOutputReducers:
+    """Test per-day summary reducers requested with the reducers key."""
+    
+    def test_reducers_replace_dense_output(self):
+        """Test requesting reducers returns a dict of per-day arrays."""
+        params = {
+            'n_hosts': 50,
+            'max_days': 60,
+            'incidence_rate': 0.1,
+            'log10_dose': 6.0,
+            'reducers': ['prevalence', 'log2_immunity_mean', 'log2_immunity_quantiles', 'shedding_by_age']
+        }
+        
+        result = pybevy.run_bevy_app(params)
+        
+        assert isinstance(result, dict)
+        assert 'dense' not in result
+        assert result['prevalence'].shape == (61,)
+        assert result['log2_immunity_mean'].shape == (61,)
+        assert result['log2_immunity_quantiles'].shape == (61, 5)
+        assert result['shedding_by_age'].shape == (61, 4)
+        assert np.all((result['prevalence'] >= 0.0) & (result['prevalence'] <= 1.0))
+        assert np.all(np.diff(result['log2_immunity_quantiles'], axis=1) >= 0.0)
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_reducers_match_dense(self, engine):
+        """Test reducers agree with the same statistics computed from the dense array."""
+        params = {
+            'n_hosts': 40,
+            'max_days': 45,
+            'incidence_rate': 0.1,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 9,
+            'reducers': ['prevalence', 'log2_immunity_mean'],
+            'dense': True
+        }
+        
+        result = pybevy.run_bevy_app(params)
+        dense = result['dense']
+        
+        assert dense.shape == (40, 46, 2)
+        np.testing.assert_allclose(result['prevalence'], (dense[:, :, 1] > 0).mean(axis=0))
+        np.testing.assert_allclose(result['log2_immunity_mean'],
+                                   np.log2(dense[:, :, 0]).mean(axis=0), rtol=1e-5)
+    
+    def test_unknown_reducer(self):
+        """Test unknown reducer names are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({
+                'n_hosts': 5,
+                'max_days': 10,
+                'incidence_rate': 0.05,
+                'log10_dose': 5.0,
+                'reducers': ['median_titer']
+            })
+
+
+class TestEventLog:
+    """Test sparse infection/clearance event output."""
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa", "event"])
+    def test_events_reconstruct_dense(self, engine):
+        """Test dense trajectories rebuilt from the event log match the dense output."""
+        params = {
+            'n_hosts': 30,
+            'max_days': 120,
+            'incidence_rate': 0.05,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 21,
+            'events': True,
+            'dense': True
+        }
+        
+        result = pybevy.run_bevy_app(params)
+        events = result['events']
+        
+        assert set(events) == {'host', 'day', 'event_type', 'strain', 'serotype',
+                               'pre_immunity', 'post_immunity', 'shed_duration'}
+        assert np.any(events['event_type'] == pybevy.events.INFECTION)
+        rebuilt = pybevy.reconstruct_trajectories(events, 30, 120)
+        np.testing.assert_allclose(rebuilt, result['dense'], rtol=1e-4)
+    
+    def test_events_replace_dense_output(self):
+        """Test requesting events alone skips the dense array."""
+        result = pybevy.run_bevy_app({
+            'n_hosts': 10,
+            'max_days': 20,
+            'incidence_rate': 0.05,
+            'log10_dose': 5.0,
+            'events': True
+        })
+        
+        assert isinstance(result, dict)
+        assert 'dense' not in result
+        assert len(result['events']['host']) == len(result['events']['day'])
+
+
+class TestExposureSchedules:
+    """Test daily and per-group incidence, dose and strain inputs."""
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa", "event"])
+    def test_daily_incidence_window(self, engine):
+        """Test infections only happen on days with non-zero incidence."""
+        incidence = np.zeros(60)
+        incidence[19:30] = 0.3  # days 20..30
+        result = pybevy.run_bevy_app({
+            'n_hosts': 50,
+            'max_days': 60,
+            'incidence_rate': incidence,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 4,
+            'events': True
+        })
+        
+        events = result['events']
+        infection_days = events['day'][events['event_type'] == pybevy.events.INFECTION]
+        assert len(infection_days) > 0
+        assert np.all((infection_days >= 20) & (infection_days <= 30))
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa", "event"])
+    def test_host_groups_and_strain_codes(self, engine):
+        """Test per-group columns apply to each host's group, including strain codes."""
+        host_group = np.arange(40) % 2
+        result = pybevy.run_bevy_app({
+            'n_hosts': 40,
+            'max_days': 50,
+            'incidence_rate': np.tile([0.2, 0.0], (50, 1)),
+            'log10_dose': 6.0,
+            'strain': np.tile(np.array([pybevy.parse_infection_code("OPV1")], dtype=np.uint8), (50, 2)),
+            'host_group': host_group,
+            'engine': engine,
+            'seed': 8,
+            'events': True
+        })
+        
+        events = result['events']
+        assert len(events['host']) > 0
+        assert np.all(host_group[events['host']] == 0)
+        assert np.all(events['strain'] == 1) and np.all(events['serotype'] == 0)
+    
+    def test_constant_arrays_match_scalars(self):
+        """Test a per-day array of a constant matches the scalar input."""
+        params = {'n_hosts': 20, 'max_days': 40, 'log10_dose': 6.0, 'engine': 'soa', 'seed': 2}
+        scalar = pybevy.run_bevy_app({**params, 'incidence_rate': 0.05})
+        daily = pybevy.run_bevy_app({**params, 'incidence_rate': np.full(40, 0.05)})
+        np.testing.assert_array_equal(scalar, daily)
+    
+    def test_invalid_schedules(self):
+        """Test wrong lengths, group counts and negative incidence are rejected."""
+        params = {'n_hosts': 10, 'max_days': 30, 'log10_dose': 6.0}
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'incidence_rate': np.full(29, 0.05)})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'incidence_rate': -0.1})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'incidence_rate': np.full((30, 2), 0.05),
+                                 'host_group': np.full(10, 2)})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'incidence_rate': 0.05, 'strain': 'XPV1'})
+
+
+class TestRunProfile:
+    """Test per-stage timing returned with profile=True."""
+    
+    @pytest.mark.parametrize("engine,stage", [("bevy", "step_state"), ("soa", "step_state"), ("event", "advance_to")])
+    def test_profile_dict(self, engine, stage):
+        """Test the profile reports stage times, event counts and output bytes."""
+        params = {
+            'n_hosts': 25,
+            'max_days': 60,
+            'incidence_rate': 0.05,
+            'log10_dose': 6.0,
+            'engine': engine,
+            'seed': 13
+        }
+        
+        result, profile = pybevy.run_bevy_app({**params, 'profile': True})
+        
+        np.testing.assert_array_equal(result, pybevy.run_bevy_app(params))
+        assert set(profile) == {'wall_time', 'total_time', 'host_days_per_second',
+                                'n_infections', 'n_clearances', 'peak_output_bytes'}
+        assert stage in profile['wall_time'] and 'record_output' in profile['wall_time']
+        assert all(t >= 0.0 for t in profile['wall_time'].values())
+        assert profile['host_days_per_second'] > 0
+        assert profile['n_infections'] > 0
+        assert profile['peak_output_bytes'] >= result.nbytes
+
+
+class TestSimulation:
+    """Test the persistent Simulation object stepped from Python."""
+    
+    def test_steps_match_single_run(self):
+        """Test consecutive steps reproduce a run_bevy_app run with the same seed."""
+        params = {'n_hosts': 30, 'incidence_rate': 0.05, 'log10_dose': 6.0, 'seed': 17}
+        full = pybevy.run_bevy_app({**params, 'max_days': 60})
+        
+        sim = pybevy.Simulation(params)
+        np.testing.assert_array_equal(sim.snapshot(), full[:, 0, :])
+        first = sim.step(20)
+        second = sim.run_until(60)
+        
+        assert first.shape == (30, 20, 2) and second.shape == (30, 40, 2)
+        assert sim.day == 60
+        np.testing.assert_array_equal(np.concatenate([first, second], axis=1), full[:, 1:, :])
+        np.testing.assert_array_equal(sim.snapshot(), full[:, 60, :])
+    
+    def test_set_incidence(self):
+        """Test a new schedule applies from the next day, with daily rows counted from there."""
+        sim = pybevy.Simulation({'n_hosts': 40, 'incidence_rate': 0.0, 'log10_dose': 6.0,
+                                 'seed': 3, 'events': True})
+        assert len(sim.step(10)['events']['day']) == 0
+        
+        sim.set_incidence(np.array([0.0] * 5 + [0.5]), 6.0, strain="OPV2")
+        events = sim.step(20)['events']
+        infected = events['event_type'] == pybevy.events.INFECTION
+        assert np.any(infected)
+        assert np.all(events['day'][infected] >= 16)
+        assert np.all(events['strain'][infected] == 1) and np.all(events['serotype'][infected] == 1)
+    
+    def test_invalid_calls(self):
+        """Test running backwards and unsupported options are rejected."""
+        sim = pybevy.Simulation({'n_hosts': 5, 'incidence_rate': 0.01, 'log10_dose': 5.0})
+        sim.step(5)
+        with pytest.raises(ValueError):
+            sim.run_until(3)
+        assert sim.run_until(5).shape == (5, 0, 2)
+        with pytest.raises(ValueError):
+            pybevy.Simulation({'n_hosts': 5, 'incidence_rate': 0.01, 'log10_dose': 5.0, 'engine': 'soa'})
+        with pytest.raises(ValueError):
+            sim.set_incidence(np.array([]), 5.0)
+
+
+class TestCheckpoint:
+    """Test saving population state and branching runs from it."""
+    
+    PARAMS = {'n_hosts': 30, 'incidence_rate': 0.05, 'log10_dose': 6.0, 'seed': 23}
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_restored_run_continues(self, engine, tmp_path):
+        """Test a run restored from day 60 matches the uninterrupted run from day 60 on."""
+        path = tmp_path / "day60.ckpt"
+        params = {**self.PARAMS, 'engine': engine}
+        full = pybevy.run_bevy_app({**params, 'max_days': 100})
+        
+        first = pybevy.run_bevy_app({**params, 'max_days': 60, 'save_checkpoint': str(path)})
+        rest = pybevy.run_bevy_app({**params, 'max_days': 40, 'checkpoint': str(path)})
+        
+        np.testing.assert_array_equal(first, full[:, :61, :])
+        assert rest.shape == (30, 41, 2)
+        np.testing.assert_array_equal(rest, full[:, 60:, :])
+    
+    def test_load_checkpoint_columns(self, tmp_path):
+        """Test the memory-mapped columns hold the saved state, day and seed."""
+        path = tmp_path / "state.ckpt"
+        result = pybevy.run_bevy_app({**self.PARAMS, 'max_days': 50, 'save_checkpoint': str(path)})
+        
+        state = pybevy.load_checkpoint(path)
+        assert state['day'] == 50 and state['seed'] == 23
+        assert state['current_immunity'].shape == (30, 3) and state['birth_sim_day'].shape == (30,)
+        np.testing.assert_array_equal(state['current_immunity'].max(axis=1), result[:, 50, 0])
+        infected = state['infection_type'] != pybevy.checkpoint.NO_INFECTION
+        assert np.all(np.isfinite(state['ti_infected'][infected]))
+        assert np.all(result[~infected.any(axis=1), 50, 1] == 0)
+    
+    def test_event_engine_and_simulation(self, tmp_path):
+        """Test the event engine and Simulation start from a checkpoint's day and state."""
+        path = tmp_path / "state.ckpt"
+        saved = pybevy.run_bevy_app({**self.PARAMS, 'max_days': 30, 'save_checkpoint': str(path)})
+        
+        events = pybevy.run_bevy_app({**self.PARAMS, 'max_days': 20, 'engine': 'event',
+                                      'checkpoint': str(path), 'events': True})['events']
+        assert np.all(events['day'] > 30)
+        
+        sim = pybevy.Simulation({**self.PARAMS, 'checkpoint': str(path)})
+        assert sim.day == 30
+        np.testing.assert_array_equal(sim.snapshot(), saved[:, 30, :])
+        sim.step(10)
+        sim.save_checkpoint(str(tmp_path / "day40.ckpt"))
+        assert pybevy.load_checkpoint(tmp_path / "day40.ckpt")['day'] == 40
+    
+    def test_host_count_mismatch(self, tmp_path):
+        """Test restoring into a different number of hosts is rejected."""
+        path = tmp_path / "state.ckpt"
+        pybevy.run_bevy_app({**self.PARAMS, 'max_days': 5, 'save_checkpoint': str(path)})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**self.PARAMS, 'n_hosts': 31, 'max_days': 5, 'checkpoint': str(path)})
+
+
+class TestPopulationState:
+    """Test building populations from column arrays and reading final state back."""
+    
+    PARAMS = {'n_hosts': 40, 'incidence_rate': 0.05, 'log10_dose': 6.0, 'seed': 31}
+    
+    def test_initial_state_columns(self):
+        """Test initial columns set day-0 immunity, and immune hosts are infected less."""
+        immunity = np.where(np.arange(40) < 20, 1.0, 2.0 ** 11).astype(np.float32)
+        result = pybevy.run_bevy_app({**self.PARAMS, 'max_days': 120, 'engine': 'soa', 'events': True,
+                                      'dense': True, 'initial_state': {
+                                          'prechallenge_immunity': immunity,
+                                          'current_immunity': immunity,
+                                          'birth_sim_day': np.full(40, -365.0)}})
+        
+        np.testing.assert_array_equal(result['dense'][:, 0, 0], immunity)
+        events = result['events']
+        infected_hosts = events['host'][events['event_type'] == pybevy.events.INFECTION]
+        assert np.sum(infected_hosts < 20) > np.sum(infected_hosts >= 20)
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_final_state_round_trip(self, engine):
+        """Test feeding final_state back in continues the run exactly."""
+        params = {**self.PARAMS, 'engine': engine}
+        full = pybevy.run_bevy_app({**params, 'max_days': 90})
+        
+        first = pybevy.run_bevy_app({**params, 'max_days': 50, 'final_state': True})
+        state = first['final_state']
+        assert state['day'] == 50 and state['seed'] == 31
+        assert state['current_immunity'].dtype == np.float32 and len(state['current_immunity']) == 40
+        rest = pybevy.run_bevy_app({**params, 'max_days': 40, 'initial_state': state})
+        
+        np.testing.assert_array_equal(first['dense'], full[:, :51, :])
+        np.testing.assert_array_equal(rest, full[:, 50:, :])
+    
+    def test_checkpoint_columns_and_simulation_state(self, tmp_path):
+        """Test load_checkpoint columns are accepted as initial_state and Simulation.state matches."""
+        path = tmp_path / "state.ckpt"
+        pybevy.run_bevy_app({**self.PARAMS, 'max_days': 30, 'save_checkpoint': str(path)})
+        columns = pybevy.load_checkpoint(path)
+        
+        sim = pybevy.Simulation({**self.PARAMS, 'initial_state': columns})
+        state = sim.state()
+        assert sim.day == state['day'] == 30
+        for name in ('prechallenge_immunity', 'current_immunity', 'ti_infected', 'infection_type'):
+            np.testing.assert_array_equal(state[name], columns[name])
+    
+    def test_invalid_initial_state(self, tmp_path):
+        """Test wrong column lengths, infections without an infection day and mixed sources."""
+        params = {**self.PARAMS, 'max_days': 5}
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'initial_state': {'current_immunity': np.ones(39)}})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'initial_state': {
+                'infection_type': np.full(40, pybevy.parse_infection_code("WPV1"), dtype=np.uint8)}})
+        path = tmp_path / "state.ckpt"
+        pybevy.run_bevy_app({**params, 'save_checkpoint': str(path)})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'checkpoint': str(path), 'initial_state': {}})
+
+
+class TestDemographics:
+    """Test births, deaths and initial ages from the demographics dict."""
+    
+    DEMOGRAPHICS = {
+        'crude_birth_rate': 40.0,
+        'mortality_ages': [0.0, 1.0, 5.0, 40.0],
+        'mortality_rates': [0.05, 0.01, 0.005, 0.05],
+        'age_pyramid_edges': [0.0, 5.0, 15.0, 60.0],
+        'age_pyramid_weights': [0.2, 0.3, 0.5],
+    }
+    PARAMS = {'n_hosts': 500, 'max_days': 730, 'incidence_rate': 0.0, 'log10_dose': 6.0,
+              'seed': 5, 'demographics': DEMOGRAPHICS}
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_turnover(self, engine):
+        """Test hosts start with pyramid ages, and deaths and births recycle slots."""
+        result = pybevy.run_bevy_app({**self.PARAMS, 'engine': engine, 'final_state': True,
+                                      'dense': True})
+        birth_sim_day = result['final_state']['birth_sim_day']
+        
+        born = (birth_sim_day > 0) & np.isfinite(birth_sim_day)
+        assert np.any(born) and np.all(birth_sim_day[born] <= 730)
+        started = birth_sim_day <= 0
+        assert np.all(birth_sim_day[started] >= -60 * 365)
+        # Vacant slots read 0 in the dense output
+        vacant = np.isinf(birth_sim_day)
+        np.testing.assert_array_equal(result['dense'][vacant, -1, :], 0.0)
+    
+    def test_engines_match(self):
+        """Test the bevy and soa engines draw the same births and deaths."""
+        states = [pybevy.run_bevy_app({**self.PARAMS, 'engine': engine, 'final_state': True})['final_state']
+                  for engine in ("bevy", "soa")]
+        np.testing.assert_array_equal(states[0]['birth_sim_day'], states[1]['birth_sim_day'])
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_events_reconstruct_dense(self, engine):
+        """Test deaths close open infections and births restart rows in the rebuilt trajectories."""
+        demographics = {**self.DEMOGRAPHICS, 'crude_birth_rate': 300.0,
+                        'mortality_ages': [0.0], 'mortality_rates': [0.3]}
+        params = {**self.PARAMS, 'n_hosts': 300, 'max_days': 365, 'incidence_rate': 0.05,
+                  'engine': engine, 'demographics': demographics}
+        # Initial ages are drawn the same way by both engines
+        initial = pybevy.run_bevy_app({**params, 'engine': 'soa', 'max_days': 0, 'final_state': True})['final_state']
+        result = pybevy.run_bevy_app({**params, 'events': True, 'dense': True})
+        events = result['events']
+        
+        deaths = events['event_type'] == pybevy.events.DEATH
+        assert np.any(deaths) and np.any(events['event_type'] == pybevy.events.BIRTH)
+        assert np.all(events['serotype'][deaths] == 255)
+        cleared = set(zip(events['host'][events['event_type'] == pybevy.events.CLEARANCE],
+                          events['day'][events['event_type'] == pybevy.events.CLEARANCE]))
+        assert cleared & set(zip(events['host'][deaths], events['day'][deaths]))
+        rebuilt = pybevy.reconstruct_trajectories(events, 300, 365, birth_sim_day=initial['birth_sim_day'])
+        np.testing.assert_allclose(rebuilt, result['dense'], rtol=1e-4)
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_initial_population_grows(self, engine):
+        """Test a population started below n_hosts grows into the vacant slots."""
+        demographics = {**self.DEMOGRAPHICS, 'initial_population': 200}
+        initial = pybevy.run_bevy_app({**self.PARAMS, 'engine': 'soa', 'max_days': 0, 'final_state': True,
+                                       'demographics': demographics})['final_state']
+        result = pybevy.run_bevy_app({**self.PARAMS, 'engine': engine, 'final_state': True,
+                                      'demographics': demographics})
+        
+        assert np.all(np.isfinite(initial['birth_sim_day'][:200]))
+        assert np.all(np.isinf(initial['birth_sim_day'][200:]))
+        assert np.sum(np.isfinite(result['final_state']['birth_sim_day'])) > 200
+    
+    def test_no_demographics_keeps_day_zero_births(self):
+        """Test hosts are all born on day 0 and never replaced without demographics."""
+        params = {k: v for k, v in self.PARAMS.items() if k != 'demographics'}
+        result = pybevy.run_bevy_app({**params, 'max_days': 30, 'final_state': True})
+        np.testing.assert_array_equal(result['final_state']['birth_sim_day'], 0.0)
+    
+    def test_invalid_demographics(self):
+        """Test mismatched tables and the event engine are rejected."""
+        params = {**self.PARAMS, 'max_days': 5}
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'demographics': {'mortality_ages': [0.0, 5.0],
+                                                           'mortality_rates': [0.01]}})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'demographics': {'age_pyramid_edges': [0.0, 5.0],
+                                                           'age_pyramid_weights': [1.0, 1.0]}})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'engine': 'event'})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**params, 'demographics': {'initial_population': 501}})
+
+
+class TestSerotypes:
+    """Test per-serotype immunity and infections with multi-serotype challenges."""
+    
+    PARAMS = {'n_hosts': 60, 'max_days': 90, 'incidence_rate': 0.05, 'log10_dose': 6.0, 'seed': 17}
+    
+    def test_parse_challenge_code(self):
+        """Test vaccine names and serotype lists map to challenge codes."""
+        assert pybevy.parse_challenge_code("tOPV") == pybevy.parse_challenge_code("OPV123")
+        assert pybevy.parse_challenge_code("bOPV") == pybevy.parse_challenge_code("OPV13")
+        assert pybevy.parse_challenge_code("WPV2") == pybevy.parse_infection_code("WPV2")
+        assert pybevy.parse_challenge_code("OPV11") is None
+        assert pybevy.parse_challenge_code("OPV") is None
+    
+    @pytest.mark.parametrize("engine", ["bevy", "soa"])
+    def test_serotypes_are_independent(self, engine):
+        """Test each serotype of a tOPV run matches the run challenged with that serotype alone."""
+        params = {**self.PARAMS, 'engine': engine, 'by_serotype': True}
+        combined = pybevy.run_bevy_app({**params, 'strain': 'tOPV'})
+        assert combined.shape == (60, 91, 6)
+        
+        for s in range(3):
+            alone = pybevy.run_bevy_app({**params, 'strain': f'OPV{s + 1}'})
+            np.testing.assert_array_equal(combined[:, :, 2 * s:2 * s + 2], alone[:, :, 2 * s:2 * s + 2])
+        # Hosts can shed more than one serotype at once
+        assert np.any((combined[:, :, 1::2] > 0).sum(axis=2) > 1)
+    
+    def test_default_channels_aggregate(self):
+        """Test the default channels are the highest immunity and the summed shedding."""
+        by_serotype = pybevy.run_bevy_app({**self.PARAMS, 'strain': 'bOPV', 'by_serotype': True})
+        result = pybevy.run_bevy_app({**self.PARAMS, 'strain': 'bOPV'})
+        
+        assert result.shape == (60, 91, 2)
+        np.testing.assert_array_equal(by_serotype[:, :, 2:4], [1.0, 0.0])
+        np.testing.assert_allclose(result[:, :, 0], by_serotype[:, :, 0::2].max(axis=2))
+        np.testing.assert_allclose(result[:, :, 1], by_serotype[:, :, 1::2].sum(axis=2), rtol=1e-6)
+    
+    @pytest.mark.parametrize("engine", ["soa", "event"])
+    def test_events_by_serotype(self, engine):
+        """Test events carry their serotype and rebuild each serotype's channels."""
+        result = pybevy.run_bevy_app({**self.PARAMS, 'strain': 'tOPV', 'engine': engine,
+                                      'events': True, 'dense': True, 'by_serotype': True})
+        events = result['events']
+        
+        assert set(events['serotype']) == {0, 1, 2}
+        for s in range(3):
+            rebuilt = pybevy.reconstruct_trajectories(events, 60, 90, serotype=s)
+            np.testing.assert_allclose(rebuilt, result['dense'][:, :, 2 * s:2 * s + 2], rtol=1e-4)
+    
+    def test_state_columns_per_serotype(self, tmp_path):
+        """Test final state and checkpoints hold one value per host and serotype."""
+        path = tmp_path / "state.ckpt"
+        result = pybevy.run_bevy_app({**self.PARAMS, 'strain': 'tOPV', 'final_state': True,
+                                      'save_checkpoint': str(path)})
+        state = result['final_state']
+        columns = pybevy.load_checkpoint(path)
+        
+        assert state['birth_sim_day'].shape == (60,)
+        for name in ('current_immunity', 'ti_infected', 'infection_type'):
+            assert state[name].shape == (60, 3)
+            np.testing.assert_array_equal(state[name], columns[name])
+        np.testing.assert_array_equal(state['current_immunity'].max(axis=1), result['dense'][:, -1, 0])
+    
+    def test_invalid_strain(self):
+        """Test unknown challenge names and codes are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**self.PARAMS, 'strain': 'OPV4'})
+        with pytest.raises(ValueError):
+            pybevy.run_bevy_app({**self.PARAMS, 'strain': np.full(90, 200, dtype=np.uint8)})
+
+
+class TestEnsembleRunner:
+    """Test replicate and parameter-sweep runs with run_ensemble."""
+    
+    def test_ensemble_output_shape(self):
+        """Test output is stacked as (scenario, replicate, host, day, channel)."""
+        scenarios = [
+            {'n_hosts': 10, 'max_days': 30, 'incidence_rate': 0.05, 'log10_dose': dose}
+            for dose in (4.0, 6.0, 8.0)
+        ]
+        
+        result = pybevy.run_ensemble(scenarios, 4, n_threads=2, seed=1)
+        
+        assert isinstance(result, np.ndarray)
+        assert result.shape == (3, 4, 10, 31, 2)
+        assert result.dtype == np.float64
+        assert np.all(result >= 0.0)
+    
+    def test_ensemble_reproducible(self):
+        """Test seeded ensembles are identical and match single seeded runs."""
+        scenario = {'n_hosts': 20, 'max_days': 40, 'incidence_rate': 0.1, 'log10_dose': 6.0}
+        
+        first = pybevy.run_ensemble([scenario], 3, n_threads=1, seed=5)
+        second = pybevy.run_ensemble([scenario], 3, n_threads=4, seed=5)
+        np.testing.assert_array_equal(first, second)
+        
+        single = pybevy.run_bevy_app({**scenario, 'engine': 'soa', 'seed': 6})
+        np.testing.assert_array_equal(first[0, 1], single)
+    
+    def test_ensemble_mismatched_scenarios(self):
+        """Test scenarios with different shapes are rejected."""
+        with pytest.raises(ValueError):
+            pybevy.run_ensemble([
+                {'n_hosts': 10, 'max_days': 30, 'incidence_rate': 0.05, 'log10_dose': 5.0},
+                {'n_hosts': 20, 'max_days': 30, 'incidence_rate': 0.05, 'log10_dose': 5.0},
+            ], 2)
+    
+    @pytest.mark.parametrize("option", [{'engine': 'bevy'}, {'seed': 3}, {'events': True},
+                                        {'demographics': {'crude_birth_rate': 30.0}}])
+    def test_ensemble_rejects_run_options(self, option):
+        """Test run_bevy_app options that run_ensemble doesn't apply are rejected, not ignored."""
+        scenario = {'n_hosts': 10, 'max_days': 30, 'incidence_rate': 0.05, 'log10_dose': 5.0}
+        with pytest.raises(ValueError, match="supported keys"):
+            pybevy.run_ensemble([{**scenario, **option}], 2)
+
+
 class TestThreeLayerApiIntegration:
     """Test integration across all three API layers."""
     
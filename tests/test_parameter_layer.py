@@ -190,4 +190,56 @@ class TestMainParams:
         # Test that nested objects exist and have expected structure
         assert hasattr(default_params.immunity_waning, 'rate')
         assert hasattr(default_params.theta_nabs, 'a')
-        assert hasattr(default_params.viral_shedding, 'eta')
\ No newline at end of file
+        assert hasattr(default_params.viral_shedding, 'eta')
+    
+    def test_strain_params_dict(self, default_params):
+        """Test strain parameters are readable for every infection type."""
+        strain_params = default_params.strain_params
+        assert set(strain_params) == {'WPV1', 'WPV2', 'WPV3', 'OPV1', 'OPV2', 'OPV3'}
+        assert strain_params['OPV2'].sabin_scale_parameter == pytest.approx(8.0)
+        assert strain_params['WPV1'].shed_duration.u == pytest.approx(43.0)
+    
+    def test_strain_params_modification(self, default_params):
+        """Test strain parameters set from Python are used by calculations."""
+        strain, serotype = pybevy.parse_infection_type("OPV2")
+        immunity = pybevy.Immunity()
+        assert immunity.calculate_infection_probability(1e6, strain, serotype, default_params) > 0.0
+        
+        opv2 = default_params.get_strain_params("OPV2")
+        opv2.strain_take_modifier = 0.0
+        default_params.set_strain_params("OPV2", opv2)
+        assert default_params.get_strain_params("OPV2").strain_take_modifier == 0.0
+        assert immunity.calculate_infection_probability(1e6, strain, serotype, default_params) == 0.0
+        
+        wpv3 = default_params.strain_params['WPV3']
+        wpv3.sabin_scale_parameter = 5.0
+        default_params.strain_params = {'WPV3': wpv3}
+        assert default_params.strain_params['WPV3'].sabin_scale_parameter == pytest.approx(5.0)
+        assert default_params.strain_params['WPV1'].sabin_scale_parameter == pytest.approx(2.3)
+        
+        with pytest.raises(KeyError):
+            default_params.get_strain_params("XPV1")
+    
+    def test_strain_params_write_through(self, default_params):
+        """Test item and attribute assignments on strain_params change the Params."""
+        default_params.strain_params['OPV2'].strain_take_modifier = 0.0
+        assert default_params.get_strain_params("OPV2").strain_take_modifier == 0.0
+        
+        opv1 = pybevy.StrainParams()
+        opv1.sabin_scale_parameter = 3.0
+        default_params.strain_params['OPV1'] = opv1
+        assert default_params.strain_params['OPV1'].sabin_scale_parameter == pytest.approx(3.0)
+        
+        # Views follow later changes; copy() detaches the current values
+        wpv1 = default_params.strain_params['WPV1']
+        saved = wpv1.copy()
+        default_params.set_strain_params("WPV1", opv1)
+        assert wpv1.sabin_scale_parameter == pytest.approx(3.0)
+        assert saved.sabin_scale_parameter == pytest.approx(2.3)
+        
+        default_params.strain_params['WPV2'] = default_params.strain_params['OPV2']
+        assert default_params.strain_params['WPV2'].strain_take_modifier == 0.0
+        assert dict(default_params.strain_params.items()).keys() == set(default_params.strain_params)
+        
+        with pytest.raises(KeyError):
+            default_params.strain_params['XPV1'] = opv1
@@ -91,6 +91,8 @@ class TestInfection:
         assert infection.viral_shedding == 1000.0
         assert infection.strain == pybevy.InfectionStrain.WPV
         assert infection.serotype == pybevy.InfectionSerotype.Type2
+        # Peak CID50 is cached by the simulation on the first shedding update
+        assert infection.peak_cid50 is None
     
     def test_property_modification(self, test_infection):
         """Test infection properties can be modified."""